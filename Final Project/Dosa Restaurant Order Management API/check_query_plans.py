@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+
+def run_checks():
+    """
+    Calls every API endpoint against a scratch database with the query-plan guard on.
+
+    The guard in main.py runs EXPLAIN QUERY PLAN before each statement and raises
+    FullScanError when a statement would scan or sort a whole orders or ticket table.
+
+    Returns:
+        list: (method, path, error) for every request that failed the check.
+    """
+    from fastapi.testclient import TestClient
+    import main
+
+    # Each request is (method, path, JSON body); the ids refer to the rows created above them
+    requests = [
+        ("post", "/customers", {"name": "Damodhar", "phone": "732-555-5509"}),
+        ("post", "/customers/batch", [{"name": "Tom", "phone": "609-555-2301"}]),
+        ("get", "/customers/1", None),
+        ("get", "/customers?after=0&limit=10", None),
+        ("put", "/customers/1", {"name": "Damodhar", "phone": "732-555-5500"}),
+        ("post", "/items", {"name": "Sada Dosa", "price": 9.95}),
+        ("post", "/items/batch", [{"name": "Butter Masala Dosa", "price": 12.95}]),
+        ("get", "/items/1", None),
+        ("get", "/items?after=0&limit=10", None),
+        ("put", "/items/1", {"name": "Sada Dosa", "price": 10.95}),
+        ("post", "/orders", {"customer_id": 1, "item_id": 1, "quantity": 1, "timestamp": 1700000000, "notes": "extra spicy"}),
+        ("post", "/orders/batch", [{"customer_id": 2, "item_id": 2, "quantity": 2, "timestamp": 1700003600}]),
+        ("get", "/orders/1", None),
+        ("get", "/orders?after=0&limit=10", None),
+        ("get", "/orders?customer_id=1", None),
+        ("get", "/orders?item_id=1", None),
+        ("get", "/orders?from=1700000000&to=1700086400", None),
+        ("get", "/orders?customer_id=1&from=1700000000&to=1700086400", None),
+        ("get", "/orders?item_id=1&after=1700000000:1", None),
+        ("post", "/orders/tickets", {"customer_id": 2, "timestamp": 1700000000, "items": [{"item_id": 2}, {"item_id": 2}]}),
+        ("get", "/orders/tickets/1", None),
+        ("put", "/orders/tickets/1", {"customer_id": 2, "timestamp": 1700003600, "items": [{"item_id": 2}, {"item_id": 1}]}),
+        ("get", "/analytics/items?sort=revenue&top=5", None),
+        ("get", "/analytics/sales?from=1699999200&to=1702592000&bucket=hour", None),
+        ("get", "/analytics/sales?from=1699920000&to=1702592000&bucket=day&item_id=1", None),
+        ("get", "/customers/by-phone/609-555-2301", None),
+        ("get", "/search?q=dos&limit=5", None),
+        ("get", "/export/orders?format=csv", None),
+        ("get", "/export/orders?from=1700000000&to=1700086400&gzip=true", None),
+        ("put", "/orders/1", {"customer_id": 1, "item_id": 2, "quantity": 3, "timestamp": 1700000000}),
+        ("delete", "/orders/1", None),
+        ("delete", "/orders/2", None),
+        ("delete", "/orders/tickets/1", None),
+        ("delete", "/items/1", None),
+        ("delete", "/customers/1", None),
+    ]
+
+    failures = []
+    with TestClient(main.app, raise_server_exceptions=True) as client:
+        for method, path, body in requests:
+            try:
+                response = client.request(method.upper(), path, json=body)
+                error = None if response.status_code < 400 else f"HTTP {response.status_code}: {response.text}"
+            except main.FullScanError as e:
+                error = str(e)
+            print(f"{'FAIL' if error else 'ok  '} {method.upper()} {path}")
+            if error:
+                failures.append((method, path, error))
+    return failures
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'db.sqlite')}"
+        os.environ["DOSA_QUERY_PLAN_GUARD"] = "1"
+        failures = run_checks()
+
+    for method, path, error in failures:
+        print(f"\n{method.upper()} {path}\n  {error}")
+    sys.exit(1 if failures else 0)
@@ -1,16 +1,193 @@
+import argparse
 import json
 import sqlite3
+import time
 
-def initialize_database(json_file):
+# Number of rows sent to SQLite per executemany() call in bulk mode
+BULK_BATCH_SIZE = 50000
+
+# Load-time PRAGMAs used by the bulk loader; the previous values are restored afterwards
+BULK_PRAGMAS = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'cache_size': -262144,  # Negative values are KiB, i.e. a 256 MiB page cache
+}
+
+# Tables the bulk loader writes; their triggers are dropped for the load and reinstalled before the commit
+BULK_TABLES = ('customers', 'items', 'orders')
+
+# Every sale: the flat orders plus the ticket lines at their header's timestamp (as SALE_ROWS in main.py)
+SALE_ROWS = """
+    SELECT item_id, quantity, unit_price, timestamp FROM orders
+    UNION ALL
+    SELECT l.item_id, l.quantity, l.unit_price, h.timestamp
+    FROM order_lines l JOIN order_headers h ON h.id = l.order_id"""
+
+# Sales rollup tables of main.py, with their bucket size in seconds
+SALES_ROLLUPS = {'sales_hourly': 3600, 'sales_daily': 86400}
+
+# FTS5 tables of main.py over the tables the bulk loader writes
+SEARCH_INDEXES = ('customers_fts', 'items_fts', 'orders_fts')
+
+# Columns added to the orders table over time, with the DDL that adds them to an older database
+ADDED_ORDER_COLUMNS = {
+    'unit_price': 'REAL',
+}
+
+def create_tables(cursor):
+    """
+    Creates the customers, items and orders tables if they do not exist.
+
+    Their ids are AUTOINCREMENT, so the id of a deleted row (and the ETag the
+    API derived from it) is never given to a new row. The orders table holds
+    flat orders (one item each); a ticket is stored as one order_headers row
+    plus its order_lines, and is not written to orders.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the target database.
+    """
+    cursor.execute('''CREATE TABLE IF NOT EXISTS customers (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL,
+                        phone TEXT NOT NULL UNIQUE,
+                        version INTEGER NOT NULL DEFAULT 1
+                    )''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS items (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL,
+                        price REAL NOT NULL,
+                        version INTEGER NOT NULL DEFAULT 1
+                    )''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS orders (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        customer_id INTEGER NOT NULL,
+                        item_id INTEGER NOT NULL,
+                        quantity INTEGER NOT NULL,
+                        timestamp INTEGER NOT NULL,
+                        notes TEXT,
+                        unit_price REAL,
+                        version INTEGER NOT NULL DEFAULT 1,
+                        FOREIGN KEY (customer_id) REFERENCES customers (id),
+                        FOREIGN KEY (item_id) REFERENCES items (id)
+                    )''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS order_headers (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        customer_id INTEGER NOT NULL,
+                        timestamp INTEGER NOT NULL,
+                        notes TEXT,
+                        version INTEGER NOT NULL DEFAULT 1,
+                        FOREIGN KEY (customer_id) REFERENCES customers (id)
+                    )''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS order_lines (
+                        id INTEGER PRIMARY KEY,
+                        order_id INTEGER NOT NULL,
+                        item_id INTEGER NOT NULL,
+                        quantity INTEGER NOT NULL,
+                        unit_price REAL NOT NULL,
+                        FOREIGN KEY (order_id) REFERENCES order_headers (id) ON DELETE CASCADE,
+                        FOREIGN KEY (item_id) REFERENCES items (id)
+                    )''')
+
+def add_missing_columns(cursor):
+    """
+    Adds the columns of ADDED_ORDER_COLUMNS to an orders table created before them.
+
+    Rows that get a new unit_price column are valued at the current item price.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the target database.
+    """
+    existing = {column[1] for column in cursor.execute("PRAGMA table_info(orders)")}
+    for name, ddl in ADDED_ORDER_COLUMNS.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE orders ADD COLUMN {name} {ddl}")
+    if 'unit_price' not in existing:
+        cursor.execute("UPDATE orders SET unit_price = (SELECT price FROM items WHERE id = orders.item_id)")
+
+def drop_triggers(cursor, tables):
+    """
+    Drops the triggers on some tables.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor inside the bulk-load transaction.
+        tables (tuple): Names of the tables.
+
+    Returns:
+        list: The CREATE TRIGGER statements of the dropped triggers, to reinstall them.
+    """
+    placeholders = ', '.join('?' * len(tables))
+    triggers = cursor.execute(f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({placeholders})",
+                              tables).fetchall()
+    for name, _ in triggers:
+        cursor.execute(f"DROP TRIGGER {name}")
+    return [sql for _, sql in triggers]
+
+def rebuild_derived_tables(cursor):
+    """
+    Recomputes the analytics and search tables of main.py that exist in the database.
+
+    item_stats and the sales rollups are recomputed as rebuild_item_stats and
+    rebuild_sales_rollups in main.py do, and the FTS5 tables are rebuilt from
+    their content tables.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor inside the bulk-load transaction.
+    """
+    tables = {name for (name,) in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'item_stats' in tables:
+        cursor.execute("DELETE FROM item_stats")
+        cursor.execute(f"""INSERT INTO item_stats (item_id, order_count, units, revenue)
+                           SELECT item_id, COUNT(*), SUM(quantity), SUM(quantity * COALESCE(unit_price, 0))
+                           FROM ({SALE_ROWS})
+                           GROUP BY item_id""")
+    for table, size in SALES_ROLLUPS.items():
+        if table in tables:
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(f"""INSERT INTO {table} (bucket, item_id, order_count, units, revenue)
+                               SELECT (timestamp / {size}) * {size}, item_id, COUNT(*), SUM(quantity),
+                                      SUM(quantity * COALESCE(unit_price, 0))
+                               FROM ({SALE_ROWS})
+                               GROUP BY 1, 2""")
+    for fts_table in SEARCH_INDEXES:
+        if fts_table in tables:
+            cursor.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+def create_indexes(cursor):
+    """
+    Creates the secondary indexes on the order tables if they do not exist.
+
+    These match the indexes declared on the Order model in main.py.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the target database.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_orders_customer_id_timestamp ON orders (customer_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_orders_item_id_timestamp ON orders (item_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_orders_timestamp ON orders (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_order_headers_customer_id_timestamp ON order_headers (customer_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_order_headers_timestamp ON order_headers (timestamp)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_order_lines_order_id_item_id ON order_lines (order_id, item_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_order_lines_item_id ON order_lines (item_id)")
+
+def initialize_database(json_file, bulk=False):
     """
     Initializes the SQLite database with data from a JSON file.
 
     Args:
         json_file (str): Path to the JSON file containing the orders data.
+        bulk (bool): Use the single-transaction bulk loader (see bulk_load_database).
 
     Raises:
         Exception: If an error occurs during database initialization.
     """
+    if bulk:
+        return bulk_load_database(json_file)
+
+    conn = None
     try:
         # Load data from the JSON file
         with open(json_file, 'r') as file:
@@ -20,29 +197,10 @@ def initialize_database(json_file):
         conn = sqlite3.connect('db.sqlite')
         cursor = conn.cursor()
 
-        # Create tables if they do not exist
-        cursor.execute('''CREATE TABLE IF NOT EXISTS customers (
-                            id INTEGER PRIMARY KEY,
-                            name TEXT NOT NULL,
-                            phone TEXT NOT NULL UNIQUE
-                        )''')
-
-        cursor.execute('''CREATE TABLE IF NOT EXISTS items (
-                            id INTEGER PRIMARY KEY,
-                            name TEXT NOT NULL,
-                            price REAL NOT NULL
-                        )''')
-
-        cursor.execute('''CREATE TABLE IF NOT EXISTS orders (
-                            id INTEGER PRIMARY KEY,
-                            customer_id INTEGER NOT NULL,
-                            item_id INTEGER NOT NULL,
-                            quantity INTEGER NOT NULL,
-                            timestamp INTEGER NOT NULL,
-                            notes TEXT,
-                            FOREIGN KEY (customer_id) REFERENCES customers (id),
-                            FOREIGN KEY (item_id) REFERENCES items (id)
-                        )''')
+        # Create tables and indexes if they do not exist
+        create_tables(cursor)
+        add_missing_columns(cursor)
+        create_indexes(cursor)
 
         # Insert data into the database
         for order in orders:
@@ -67,9 +225,10 @@ def initialize_database(json_file):
                 else:
                     item_id = item_data[0]
 
-                # Insert order with customer_id, item_id, and other details
-                cursor.execute('''INSERT INTO orders (customer_id, item_id, quantity, timestamp, notes) 
-                                  VALUES (?, ?, 1, ?, ?)''', (customer_id, item_id, order['timestamp'], order['notes']))
+                # Insert order with customer_id, item_id, the price it was sold at, and other details
+                cursor.execute('''INSERT INTO orders (customer_id, item_id, quantity, timestamp, notes, unit_price) 
+                                  VALUES (?, ?, 1, ?, ?, ?)''',
+                               (customer_id, item_id, order['timestamp'], order['notes'], item['price']))
 
         # Commit the transaction
         conn.commit()
@@ -82,5 +241,230 @@ def initialize_database(json_file):
         if conn:
             conn.close()
 
+def bulk_load_database(json_file, db_path='db.sqlite', batch_size=BULK_BATCH_SIZE):
+    """
+    Loads orders from a JSON file in a single transaction.
+
+    Customer and item IDs are resolved from in-memory maps built once from the
+    existing tables instead of a SELECT per order and per line item. New
+    customers and items get their IDs assigned here, so every table can be
+    filled with executemany() in batches of ``batch_size`` rows. The load-time
+    PRAGMAs in BULK_PRAGMAS are applied for the duration of the load and the
+    previous values are restored afterwards.
+
+    In a database the API has already set up, the analytics and search
+    triggers on BULK_TABLES are dropped for the load, so no trigger runs per
+    row. The analytics and search tables are then rebuilt in one pass each
+    and the triggers reinstalled, all inside the load transaction.
+
+    Args:
+        json_file (str): Path to the JSON file containing the orders data.
+        db_path (str): Path to the SQLite database file.
+        batch_size (int): Number of rows per executemany() call.
+
+    Returns:
+        int or None: Number of rows inserted, None if the load failed.
+    """
+    conn = None
+    saved_pragmas = {}
+    try:
+        # Load data from the JSON file
+        with open(json_file, 'r') as file:
+            orders = json.load(file)
+
+        # isolation_level=None lets us control the transaction explicitly
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        cursor = conn.cursor()
+
+        # Remember the current PRAGMA values, then switch to the load-time ones
+        for pragma, value in BULK_PRAGMAS.items():
+            saved_pragmas[pragma] = cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+        create_tables(cursor)
+        add_missing_columns(cursor)
+
+        start = time.perf_counter()
+        cursor.execute("BEGIN")
+        triggers = drop_triggers(cursor, BULK_TABLES)
+
+        # Build the lookup maps once from what is already in the database
+        customer_ids = dict(cursor.execute("SELECT phone, id FROM customers"))
+        item_ids = {}
+        for item_id, name in cursor.execute("SELECT id, name FROM items ORDER BY id"):
+            item_ids.setdefault(name, item_id)  # Keep the first match, like the row-by-row loader
+        next_customer_id = next_row_id(cursor, 'customers')
+        next_item_id = next_row_id(cursor, 'items')
+
+        new_customers = []
+        new_items = []
+        order_rows = []
+        rows = 0
+
+        for order in orders:
+            customer_id = customer_ids.get(order['phone'])
+            if customer_id is None:
+                customer_id = customer_ids[order['phone']] = next_customer_id
+                new_customers.append((customer_id, order['name'], order['phone']))
+                next_customer_id += 1
+
+            for item in order['items']:
+                item_id = item_ids.get(item['name'])
+                if item_id is None:
+                    item_id = item_ids[item['name']] = next_item_id
+                    new_items.append((item_id, item['name'], item['price']))
+                    next_item_id += 1
+
+                order_rows.append((customer_id, item_id, order['timestamp'], order['notes'], item['price']))
+
+            if len(order_rows) >= batch_size:
+                rows += flush_bulk_rows(cursor, new_customers, new_items, order_rows)
+
+        rows += flush_bulk_rows(cursor, new_customers, new_items, order_rows)
+
+        # Building the indexes once after the load is cheaper than maintaining them per row
+        create_indexes(cursor)
+        rebuild_derived_tables(cursor)
+        for sql in triggers:
+            cursor.execute(sql)
+        cursor.execute("COMMIT")
+
+        elapsed = time.perf_counter() - start
+        rate = rows / elapsed if elapsed > 0 else float('inf')
+        print(f"Loaded {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+        return rows
+
+    except Exception as e:
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+        print(f"An error occurred: {e}")
+        return None
+
+    finally:
+        if conn is not None:
+            # Restore the PRAGMAs that were in effect before the load
+            for pragma, value in saved_pragmas.items():
+                conn.execute(f"PRAGMA {pragma} = {value}")
+            conn.close()
+
+def next_row_id(cursor, table):
+    """
+    Returns the id SQLite would give the next row of a table.
+
+    With AUTOINCREMENT that is past every id ever used, including the ids of
+    deleted rows recorded in sqlite_sequence.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the target database.
+        table (str): Table name.
+
+    Returns:
+        int: The next id.
+    """
+    last_id = cursor.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+        sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        last_id = max(last_id, sequence[0] if sequence else 0)
+    return last_id + 1
+
+def flush_bulk_rows(cursor, customers, items, orders):
+    """
+    Inserts the pending bulk-load rows with executemany() and clears the buffers.
+
+    Customers and items are written first so the orders batch never refers to a
+    row that has not been inserted yet.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor inside the bulk-load transaction.
+        customers (list): Pending (id, name, phone) tuples.
+        items (list): Pending (id, name, price) tuples.
+        orders (list): Pending (customer_id, item_id, timestamp, notes, unit_price) tuples.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    cursor.executemany("INSERT INTO customers (id, name, phone) VALUES (?, ?, ?)", customers)
+    cursor.executemany("INSERT INTO items (id, name, price) VALUES (?, ?, ?)", items)
+    cursor.executemany('''INSERT INTO orders (customer_id, item_id, quantity, timestamp, notes, unit_price)
+                          VALUES (?, ?, 1, ?, ?, ?)''', orders)
+    rows = len(customers) + len(items) + len(orders)
+    customers.clear()
+    items.clear()
+    orders.clear()
+    return rows
+
+def migrate_to_tickets(db_path='db.sqlite'):
+    """
+    Moves the flat orders table into order_headers and order_lines.
+
+    Flat rows that share a customer, timestamp and notes become one ticket, and
+    repeated items within a ticket are collapsed into a single line whose
+    quantity is the sum of the rows and whose unit price is their average sale
+    price. The flat rows are then deleted, so every sale is stored once. Only
+    new tickets take rows, so the migration can be run again to move the flat
+    orders written since.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+
+    Returns:
+        int or None: Number of tickets created, None if the migration failed.
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        create_tables(cursor)
+        add_missing_columns(cursor)
+        create_indexes(cursor)  # The lines query joins on the header index
+        first_ticket = next_row_id(cursor, 'order_headers')
+
+        # One header per (customer, timestamp, notes) group, in the order the groups first appear
+        cursor.execute('''INSERT INTO order_headers (customer_id, timestamp, notes)
+                          SELECT customer_id, timestamp, notes FROM orders
+                          GROUP BY customer_id, timestamp, notes
+                          ORDER BY MIN(id)''')
+        tickets = cursor.rowcount
+
+        # One line per item of each ticket, with the flat rows' quantities summed
+        cursor.execute('''INSERT INTO order_lines (order_id, item_id, quantity, unit_price)
+                          SELECT h.id, o.item_id, SUM(o.quantity),
+                                 COALESCE(SUM(o.quantity * o.unit_price) / SUM(o.quantity), i.price)
+                          FROM orders o
+                          JOIN order_headers h
+                            ON h.customer_id = o.customer_id AND h.timestamp = o.timestamp AND h.notes IS o.notes
+                          LEFT JOIN items i ON i.id = o.item_id
+                          WHERE h.id >= ?
+                          GROUP BY h.id, o.item_id
+                          ORDER BY h.id, MIN(o.id)''', (first_ticket,))
+        lines = cursor.rowcount
+
+        # The lines are the record of these sales now
+        cursor.execute("DELETE FROM orders")
+
+        conn.commit()
+        print(f"Migrated {tickets} tickets with {lines} lines")
+        return tickets
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+    finally:
+        if conn is not None:
+            conn.close()
+
 if __name__ == "__main__":
-    initialize_database('C:\\Users\\user\\Desktop\\Web_System_Final_project\\dosa_restaurant\\example_orders.json')
+    parser = argparse.ArgumentParser(description="Initialize the SQLite database from a JSON orders file.")
+    parser.add_argument('json_file', nargs='?',
+                        default='C:\\Users\\user\\Desktop\\Web_System_Final_project\\dosa_restaurant\\example_orders.json',
+                        help="Path to the JSON file containing the orders data")
+    parser.add_argument('--bulk', action='store_true', help="Use the single-transaction bulk loader")
+    parser.add_argument('--migrate', action='store_true',
+                        help="Move the flat orders table into order_headers/order_lines instead of loading a file")
+    args = parser.parse_args()
+
+    if args.migrate:
+        migrate_to_tickets()
+    else:
+        initialize_database(args.json_file, bulk=args.bulk)
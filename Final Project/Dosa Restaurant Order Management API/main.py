@@ -1,20 +1,133 @@
-from fastapi import FastAPI, HTTPException, Depends
+import csv
+import heapq
+import inspect
+import io
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey
+from typing import List, Optional, Union
+from sqlalchemy import case, create_engine, event, func, insert, null, select, update, delete, inspect as sa_inspect, text, table as sa_table, column as sa_column, literal_column, tuple_, Column, Index, Integer, String, Float, ForeignKey
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.pool import StaticPool
 
 # Database URL
-DATABASE_URL = "sqlite:///./db.sqlite"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./db.sqlite")
+
+# Serve the CRUD endpoints as async handlers on an aiosqlite engine (DOSA_ASYNC_DB=1)
+ASYNC_DB = os.getenv("DOSA_ASYNC_DB", "0").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("uvicorn.error")
+
+# SQLite performance profile, applied to every new connection (DOSA_SQLITE_PROFILE=default disables it).
+# Each PRAGMA can be overridden with DOSA_SQLITE_<NAME>, e.g. DOSA_SQLITE_BUSY_TIMEOUT=10000.
+SQLITE_PROFILE = os.getenv("DOSA_SQLITE_PROFILE", "performance")
+SQLITE_PRAGMAS = {
+    name: os.getenv(f"DOSA_SQLITE_{name.upper()}", default)
+    for name, default in {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": "268435456",  # 256 MiB
+        "cache_size": "-65536",  # Negative values are KiB, i.e. a 64 MiB page cache
+        "temp_store": "MEMORY",
+        "busy_timeout": "5000",  # Milliseconds to wait for a lock before "database is locked"
+        "foreign_keys": "ON",
+    }.items()
+} if SQLITE_PROFILE == "performance" else {}
+
+# Connection pool settings
+DB_POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DOSA_DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DOSA_DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": float(os.getenv("DOSA_DB_POOL_TIMEOUT", "30")),
+}
+# An in-memory database only exists inside its connection, so every session shares one connection
+# instead of a pool (a pool would hand each session its own empty database)
+IN_MEMORY_DB = make_url(DATABASE_URL).database in (None, "", ":memory:")
+if IN_MEMORY_DB:
+    DB_POOL_SETTINGS = {"poolclass": StaticPool}
+# Page size limits for the GET /customers, /items and /orders list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# In-process item (menu) cache: maximum number of items and optional TTL in seconds (0 = no expiry)
+ITEM_CACHE_SIZE = int(os.getenv("DOSA_ITEM_CACHE_SIZE", "1024"))
+ITEM_CACHE_TTL = float(os.getenv("DOSA_ITEM_CACHE_TTL", "0"))
+
+# Largest list accepted by the POST /.../batch endpoints
+MAX_BATCH_SIZE = int(os.getenv("DOSA_MAX_BATCH_SIZE", "1000"))
+
+# Rows fetched from the server-side cursor (and written) per chunk by GET /export/orders
+EXPORT_CHUNK_ROWS = int(os.getenv("DOSA_EXPORT_CHUNK_ROWS", "1000"))
+
+SQLITE_CHECK_SAME_THREAD = os.getenv("DOSA_SQLITE_CHECK_SAME_THREAD", "0").lower() in ("1", "true", "yes") and not IN_MEMORY_DB
 
 # SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
+engine = create_engine(
+    DATABASE_URL, connect_args={"check_same_thread": SQLITE_CHECK_SAME_THREAD}, **DB_POOL_SETTINGS
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Applies SQLITE_PRAGMAS to each new DBAPI connection."""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+event.listen(engine, "connect", set_sqlite_pragmas)
+
+if ASYNC_DB:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **DB_POOL_SETTINGS)
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine, class_=AsyncSession, autocommit=False, autoflush=False
+    )
+
+def log_database_settings():
+    """Logs the effective PRAGMA values and pool settings of a fresh connection."""
+    with engine.connect() as conn:
+        pragmas = {
+            name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("journal_mode", "synchronous", "mmap_size", "cache_size",
+                         "temp_store", "busy_timeout", "foreign_keys")
+        }
+    logger.info(
+        "Database %s (profile=%s, async=%s): %s, %s, check_same_thread=%s",
+        DATABASE_URL, SQLITE_PROFILE, ASYNC_DB,
+        " ".join(f"{name}={value}" for name, value in pragmas.items()),
+        " ".join(f"{name}={value}" for name, value in DB_POOL_SETTINGS.items()),
+        SQLITE_CHECK_SAME_THREAD,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    log_database_settings()
+    warm_item_cache()
+    yield
+
+
 # FastAPI instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Database models
 class Customer(Base):
@@ -22,6 +135,10 @@ class Customer(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     phone = Column(String, unique=True, index=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+    __table_args__ = {"sqlite_autoincrement": True}  # Never reuse an id, so an ETag names one row for good
 
 
 class Item(Base):
@@ -29,9 +146,18 @@ class Item(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     price = Column(Float)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+    __table_args__ = {"sqlite_autoincrement": True}
 
 
 class Order(Base):
+    """One flat order: a single item sold on its own.
+
+    Tickets (several items sold together) are stored in order_headers and
+    order_lines only; the analytics and the export read both tables.
+    """
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
@@ -39,14 +165,373 @@ class Order(Base):
     quantity = Column(Integer)
     timestamp = Column(Integer)
     notes = Column(String, nullable=True)
+    unit_price = Column(Float, nullable=True)  # Item price at the time of sale
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    customer = relationship("Customer")
+    item = relationship("Item")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        Index("ix_orders_customer_id_timestamp", "customer_id", "timestamp"),
+        Index("ix_orders_item_id_timestamp", "item_id", "timestamp"),
+        Index("ix_orders_timestamp", "timestamp"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+# Models referenced by the foreign-key columns of orders and tickets
+REFERENCED_MODELS = {"customer_id": Customer, "item_id": Item}
+
+
+class OrderHeader(Base):
+    """One ticket: who ordered, when, and the notes, stored once per order."""
+    __tablename__ = "order_headers"
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    timestamp = Column(Integer, nullable=False)
+    notes = Column(String, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     customer = relationship("Customer")
+    lines = relationship("OrderLine", order_by="OrderLine.item_id")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        Index("ix_order_headers_customer_id_timestamp", "customer_id", "timestamp"),
+        Index("ix_order_headers_timestamp", "timestamp"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class OrderLine(Base):
+    """One item of a ticket; repeated items are collapsed into the quantity."""
+    __tablename__ = "order_lines"
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("order_headers.id", ondelete="CASCADE"), nullable=False)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)  # Item price at the time of sale
+
+    item = relationship("Item")
+
+    __table_args__ = (
+        Index("ix_order_lines_order_id_item_id", "order_id", "item_id", unique=True),
+        Index("ix_order_lines_item_id", "item_id"),
+    )
+
+
+class ItemStats(Base):
+    """Per-item popularity totals over the orders table, maintained by triggers."""
+    __tablename__ = "item_stats"
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
     item = relationship("Item")
 
 
+# A ticket's lines are deleted before its header, so their analytics triggers can still read the ticket's timestamp
+TICKET_TRIGGERS = {
+    "trg_order_headers_delete_lines": """
+        CREATE TRIGGER IF NOT EXISTS trg_order_headers_delete_lines BEFORE DELETE ON order_headers
+        BEGIN
+            DELETE FROM order_lines WHERE order_id = OLD.id;
+        END""",
+}
+
+# Triggers of the earlier layout, where every ticket line was also written to orders
+OBSOLETE_TRIGGERS = ("trg_orders_ticket_update", "trg_orders_ticket_delete")
+
+
+# Tables of sale rows counted by the analytics: the timestamp of a row, and the columns whose update moves its sale.
+# A ticket line has its ticket's timestamp, which only changes when PUT /orders/tickets rewrites the lines.
+SALE_TABLES = {
+    "orders": ("{row}.timestamp", "item_id, quantity, timestamp, unit_price"),
+    "order_lines": ("(SELECT timestamp FROM order_headers WHERE id = {row}.order_id)", "order_id, item_id, quantity, unit_price"),
+}
+
+# Every sale row, flat orders and ticket lines alike, for the rebuilds
+SALE_ROWS = """
+            SELECT item_id, quantity, unit_price, timestamp FROM orders
+            UNION ALL
+            SELECT l.item_id, l.quantity, l.unit_price, h.timestamp
+            FROM order_lines l JOIN order_headers h ON h.id = l.order_id"""
+
+# Triggers that keep item_stats (and the sales rollups below) current in the same transaction as every write to a
+# sale table. Revenue uses the unit_price stored on the row, so what an update or delete subtracts is exactly what
+# the insert added, whatever the item costs now.
+ITEM_STATS_UPSERT = """
+            INSERT INTO item_stats (item_id, order_count, units, revenue)
+            VALUES (NEW.item_id, 1, NEW.quantity, NEW.quantity * COALESCE(NEW.unit_price, 0))
+            ON CONFLICT (item_id) DO UPDATE SET
+                order_count = order_count + excluded.order_count,
+                units = units + excluded.units,
+                revenue = revenue + excluded.revenue;"""
+ITEM_STATS_SUBTRACT = """
+            UPDATE item_stats SET
+                order_count = order_count - 1,
+                units = units - OLD.quantity,
+                revenue = revenue - OLD.quantity * COALESCE(OLD.unit_price, 0)
+            WHERE item_id = OLD.item_id;
+            DELETE FROM item_stats WHERE item_id = OLD.item_id AND order_count = 0;"""
+ANALYTICS_TRIGGERS = {}
+for source in SALE_TABLES:
+    ANALYTICS_TRIGGERS.update({
+        f"trg_{source}_item_stats_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{source}_item_stats_insert AFTER INSERT ON {source}
+        BEGIN{ITEM_STATS_UPSERT}
+        END""",
+        f"trg_{source}_item_stats_update": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{source}_item_stats_update AFTER UPDATE OF item_id, quantity, unit_price ON {source}
+        BEGIN{ITEM_STATS_SUBTRACT}{ITEM_STATS_UPSERT}
+        END""",
+        f"trg_{source}_item_stats_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{source}_item_stats_delete AFTER DELETE ON {source}
+        BEGIN{ITEM_STATS_SUBTRACT}
+        END""",
+    })
+
+
+def rebuild_item_stats(conn):
+    """Recomputes item_stats from scratch with one pass over orders and order_lines."""
+    conn.exec_driver_sql("DELETE FROM item_stats")
+    conn.exec_driver_sql(f"""
+        INSERT INTO item_stats (item_id, order_count, units, revenue)
+        SELECT item_id, COUNT(*), SUM(quantity), SUM(quantity * COALESCE(unit_price, 0))
+        FROM ({SALE_ROWS})
+        GROUP BY item_id""")
+
+
+class SalesHourly(Base):
+    """Orders, units and revenue per item per hour (bucket = timestamp rounded down to the hour)."""
+    __tablename__ = "sales_hourly"
+    bucket = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+class SalesDaily(Base):
+    """Orders, units and revenue per item per day (bucket = timestamp rounded down to the UTC day)."""
+    __tablename__ = "sales_daily"
+    bucket = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+# Rollup tables and their bucket size in seconds
+SALES_ROLLUPS = {"hour": (SalesHourly, 3600), "day": (SalesDaily, 86400)}
+
+
+def sales_rollup_triggers(table, size, source):
+    """Returns the DDL of the triggers that keep one sales rollup table current over one sale table, at the stored sale prices."""
+    timestamp, moved_by = SALE_TABLES[source]
+    new_timestamp, old_timestamp = timestamp.format(row="NEW"), timestamp.format(row="OLD")
+    upsert = f"""
+            INSERT INTO {table} (bucket, item_id, order_count, units, revenue)
+            VALUES (({new_timestamp} / {size}) * {size}, NEW.item_id, 1, NEW.quantity,
+                    NEW.quantity * COALESCE(NEW.unit_price, 0))
+            ON CONFLICT (bucket, item_id) DO UPDATE SET
+                order_count = order_count + excluded.order_count,
+                units = units + excluded.units,
+                revenue = revenue + excluded.revenue;"""
+    subtract = f"""
+            UPDATE {table} SET
+                order_count = order_count - 1,
+                units = units - OLD.quantity,
+                revenue = revenue - OLD.quantity * COALESCE(OLD.unit_price, 0)
+            WHERE bucket = ({old_timestamp} / {size}) * {size} AND item_id = OLD.item_id;
+            DELETE FROM {table}
+            WHERE bucket = ({old_timestamp} / {size}) * {size} AND item_id = OLD.item_id AND order_count = 0;"""
+    return {
+        f"trg_{source}_{table}_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{source}_{table}_insert AFTER INSERT ON {source}
+        BEGIN{upsert}
+        END""",
+        f"trg_{source}_{table}_update": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{source}_{table}_update AFTER UPDATE OF {moved_by} ON {source}
+        BEGIN{subtract}{upsert}
+        END""",
+        f"trg_{source}_{table}_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{source}_{table}_delete AFTER DELETE ON {source}
+        BEGIN{subtract}
+        END""",
+    }
+
+
+for source in SALE_TABLES:
+    for model, size in SALES_ROLLUPS.values():
+        ANALYTICS_TRIGGERS.update(sales_rollup_triggers(model.__tablename__, size, source))
+
+
+def rebuild_sales_rollups(conn):
+    """Recomputes the hourly and daily sales rollups from scratch with one pass over orders and order_lines each."""
+    for model, size in SALES_ROLLUPS.values():
+        conn.exec_driver_sql(f"DELETE FROM {model.__tablename__}")
+        conn.exec_driver_sql(f"""
+            INSERT INTO {model.__tablename__} (bucket, item_id, order_count, units, revenue)
+            SELECT (timestamp / {size}) * {size}, item_id, COUNT(*), SUM(quantity),
+                   SUM(quantity * COALESCE(unit_price, 0))
+            FROM ({SALE_ROWS})
+            GROUP BY 1, 2""")
+
+
+# Full-text search: external-content FTS5 tables over these columns, kept in sync by triggers
+SEARCH_INDEXES = {
+    "customers_fts": ("customers", "name"),
+    "items_fts": ("items", "name"),
+    "orders_fts": ("orders", "notes"),
+    "order_headers_fts": ("order_headers", "notes"),
+}
+
+
+def search_index_ddl(fts_table, table, column):
+    """Returns the DDL of an FTS5 table over ``table.column`` and the triggers that keep it in sync."""
+    delete = f"INSERT INTO {fts_table} ({fts_table}, rowid, {column}) VALUES ('delete', OLD.id, OLD.{column});"
+    insert = f"INSERT INTO {fts_table} (rowid, {column}) VALUES (NEW.id, NEW.{column});"
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column}, content='{table}', content_rowid='id', prefix='2 3')""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_insert AFTER INSERT ON {table}
+        BEGIN {insert} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_delete AFTER DELETE ON {table}
+        BEGIN {delete} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_update AFTER UPDATE OF {column} ON {table}
+        BEGIN {delete} {insert} END""",
+    ]
+
+
 # Create the database tables
+search_indexes_existed = {fts_table: sa_inspect(engine).has_table(fts_table) for fts_table in SEARCH_INDEXES}
+item_stats_existed = sa_inspect(engine).has_table("item_stats")
+sales_rollups_existed = all(
+    sa_inspect(engine).has_table(model.__tablename__) for model, size in SALES_ROLLUPS.values()
+)
 Base.metadata.create_all(bind=engine)
 
+# Columns added to existing tables over time, with the DDL that adds them to an older database
+ADDED_COLUMNS = {
+    "version": "INTEGER NOT NULL DEFAULT 1",
+    "unit_price": "FLOAT",
+}
+
+# create_all() skips tables that already exist, so add any missing columns and indexes to older databases
+with engine.begin() as conn:
+    added_columns = set()
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {column["name"] for column in sa_inspect(conn).get_columns(table.name)}
+        for name, ddl in ADDED_COLUMNS.items():
+            if name in table.columns and name not in existing_columns:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {ddl}"))
+                added_columns.add((table.name, name))
+    if ("orders", "unit_price") in added_columns:
+        # Older rows have no sale price: value them at the current price, then recount the analytics with it
+        conn.exec_driver_sql("UPDATE orders SET unit_price = (SELECT price FROM items WHERE id = orders.item_id)")
+        item_stats_existed = sales_rollups_existed = False
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+# AUTOINCREMENT cannot be added to an existing table: older databases can still reuse the id of the last deleted row
+with engine.connect() as conn:
+    reused_ids = [
+        name for name, sql in conn.exec_driver_sql("SELECT name, sql FROM sqlite_master WHERE type = 'table'")
+        if Base.metadata.tables.get(name) is not None
+        and Base.metadata.tables[name].kwargs.get("sqlite_autoincrement")
+        and "AUTOINCREMENT" not in sql.upper()
+    ]
+if reused_ids:
+    logger.warning(
+        "Tables %s were created without AUTOINCREMENT; a new row can get the id and ETag of a deleted one. "
+        "Recreate the database with init_db.py to fix this.", ", ".join(reused_ids)
+    )
+
+# Install the ticket and analytics triggers, replacing older definitions, and backfill the tables that are new
+with engine.begin() as conn:
+    for name in OBSOLETE_TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    if conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'ix_orders_ticket_id'").first():
+        # The earlier layout also wrote each ticket line to orders (ticket_id set); order_lines already holds those sales
+        conn.exec_driver_sql("DELETE FROM orders WHERE ticket_id IS NOT NULL")
+        conn.exec_driver_sql("DROP INDEX ix_orders_ticket_id")
+    installed_triggers = {name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    if not set(ANALYTICS_TRIGGERS) <= installed_triggers:
+        item_stats_existed = sales_rollups_existed = False  # Writes to a table without its triggers were not counted
+    for name, trigger in [*TICKET_TRIGGERS.items(), *ANALYTICS_TRIGGERS.items()]:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(trigger)
+    if not item_stats_existed:
+        rebuild_item_stats(conn)
+    if not sales_rollups_existed:
+        rebuild_sales_rollups(conn)
+
+# Install the full-text search tables and triggers, indexing the existing rows of new tables
+with engine.begin() as conn:
+    for fts_table, (table, column) in SEARCH_INDEXES.items():
+        for statement in search_index_ddl(fts_table, table, column):
+            conn.exec_driver_sql(statement)
+        if not search_indexes_existed[fts_table]:
+            conn.exec_driver_sql(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+
+class FullScanError(RuntimeError):
+    """Raised by the query-plan guard when a statement would scan or sort a whole guarded table."""
+
+
+# Tables that grow with every sale, which no API statement may read in full
+GUARDED_TABLES = ("orders", "order_headers", "order_lines")
+
+# A guarded table in a statement, with the alias it is read under if any
+GUARDED_TABLE_PATTERN = re.compile(rf"\b({'|'.join(GUARDED_TABLES)})\b(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+
+# Words that can follow a table name in a FROM clause without being its alias
+SQL_KEYWORDS = {
+    "where", "join", "left", "inner", "cross", "natural", "on", "using", "set", "group", "order", "limit",
+    "union", "values", "returning", "indexed", "not",
+}
+
+# EXPLAIN QUERY PLAN rows that read every row of a table (table or index scan) or sort rows in a temp B-tree
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+TEMP_SORT_PATTERN = re.compile(r"^USE TEMP B-TREE FOR")
+
+
+def guarded_names(statement):
+    """Returns the names under which a statement reads the guarded tables (table names and aliases)."""
+    names = set()
+    for table, alias in GUARDED_TABLE_PATTERN.findall(statement):
+        names.add(table.lower())
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            names.add(alias.lower())
+    return names
+
+
+def check_query_plan(conn, cursor, statement, parameters, context, executemany):
+    """Runs EXPLAIN QUERY PLAN on a statement and raises FullScanError when it scans or sorts a guarded table."""
+    if executemany or not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+        return
+    names = guarded_names(statement)
+    if not names:
+        return
+    cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    for row in cursor.fetchall():
+        scan = FULL_SCAN_PATTERN.match(row[-1])
+        if (scan and scan.group(1).lower() in names) or TEMP_SORT_PATTERN.match(row[-1]):
+            raise FullScanError(f"Full scan or sort of {', '.join(sorted(names))} ({row[-1]}) in: {statement}")
+
+
+# Opt-in guard used by check_query_plans.py; it doubles the cost of every query
+if os.getenv("DOSA_QUERY_PLAN_GUARD", "0").lower() in ("1", "true", "yes"):
+    event.listen(engine, "before_cursor_execute", check_query_plan)
+    if ASYNC_DB:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", check_query_plan)
+
 # Pydantic schemas
 class CustomerCreate(BaseModel):
     name: str
@@ -101,10 +586,102 @@ class OrderOut(BaseModel):
     quantity: int
     timestamp: int
     notes: Optional[str] = None
+    unit_price: Optional[float] = None
 
     class Config:
         orm_mode = True
 
+class TicketLineCreate(BaseModel):
+    item_id: int
+    quantity: int = 1
+
+class TicketCreate(BaseModel):
+    customer_id: int
+    timestamp: int
+    notes: Optional[str] = None
+    items: List[TicketLineCreate]
+
+class TicketUpdate(BaseModel):
+    customer_id: int
+    timestamp: int
+    notes: Optional[str] = None
+    items: List[TicketLineCreate]
+
+class TicketLineOut(BaseModel):
+    item_id: int
+    quantity: int
+    unit_price: float
+
+    class Config:
+        orm_mode = True
+
+class TicketHeaderOut(BaseModel):
+    id: int
+    customer_id: int
+    timestamp: int
+    notes: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class TicketOut(BaseModel):
+    id: int
+    customer_id: int
+    timestamp: int
+    notes: Optional[str] = None
+    lines: List[TicketLineOut]
+
+    class Config:
+        orm_mode = True
+
+class ItemStatsOut(BaseModel):
+    item_id: int
+    name: str
+    price: float
+    order_count: int
+    units: int
+    revenue: float
+
+class SalesBucketOut(BaseModel):
+    bucket: int
+    order_count: int
+    units: int
+    revenue: float
+
+class SearchOut(BaseModel):
+    customers: List[CustomerOut]
+    items: List[ItemOut]
+    orders: List[OrderOut]
+    tickets: List[TicketHeaderOut]
+
+class BatchError(BaseModel):
+    index: int
+    detail: str
+
+class CustomerBatchOut(BaseModel):
+    created: List[CustomerOut]
+    errors: List[BatchError] = []
+
+class ItemBatchOut(BaseModel):
+    created: List[ItemOut]
+    errors: List[BatchError] = []
+
+class OrderBatchOut(BaseModel):
+    created: List[OrderOut]
+    errors: List[BatchError] = []
+
+class CustomerPage(BaseModel):
+    data: List[CustomerOut]
+    next_cursor: Optional[int] = None
+
+class ItemPage(BaseModel):
+    data: List[ItemOut]
+    next_cursor: Optional[int] = None
+
+class OrderPage(BaseModel):
+    data: List[OrderOut]
+    next_cursor: Optional[Union[int, str]] = None  # "timestamp:id" when the list is filtered
+
 # Dependency for getting the database session
 def get_db():
     db = SessionLocal()
@@ -114,130 +691,909 @@ def get_db():
         db.close()
 
 
+# Dependency for getting the async database session (DOSA_ASYNC_DB=1)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def db_handler(func):
+    """Serves a handler written against a sync ``db: Session`` in the configured mode.
+
+    In the default sync mode the handler is returned unchanged and FastAPI runs
+    it in its threadpool. In async mode it is wrapped in an ``async def`` that
+    takes an ``AsyncSession`` from ``get_async_db`` and runs the handler body
+    through ``AsyncSession.run_sync``, so the request never occupies a
+    threadpool slot and both modes share one implementation and one response.
+    """
+    if not ASYNC_DB:
+        return func
+
+    async def handler(**kwargs):
+        db = kwargs.pop("db")
+        return await db.run_sync(lambda session: func(db=session, **kwargs))
+
+    signature = inspect.signature(func)
+    handler.__signature__ = signature.replace(parameters=[
+        param.replace(default=Depends(get_async_db), annotation=AsyncSession) if name == "db" else param
+        for name, param in signature.parameters.items()
+    ])
+    handler.__name__ = func.__name__
+    handler.__doc__ = func.__doc__
+    return handler
+
+
+# Conditional requests backed by row versions
+def make_etag(id, version):
+    return f'"{id}-{version}"'
+
+
+def etag_matches(header, etag):
+    """Checks an If-None-Match header against an ETag (weak comparison)."""
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def if_match_versions(if_match, id):
+    """Returns the row versions a PUT's If-Match header accepts, or None for any version.
+
+    Only strong ETags of the form make_etag() produces for this id can match;
+    weak or foreign tags are ignored, so they never satisfy the precondition.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = []
+    for tag in if_match.split(","):
+        match = re.fullmatch(r'"(\d+)-(\d+)"', tag.strip())
+        if match and int(match.group(1)) == id:
+            versions.append(int(match.group(2)))
+    return versions
+
+
+# Single-statement writes
+def item_price(item_id):
+    """Returns the current price of an item as a scalar subquery, to store as an order's sale price."""
+    return select(Item.price).where(Item.id == item_id).scalar_subquery()
+
+
+def execute_returning(db: Session, statement, model):
+    """Executes an INSERT/UPDATE/DELETE with RETURNING of every column.
+
+    Returns:
+        dict or None: The affected row, or None if the statement matched no row.
+    """
+    row = db.execute(statement.returning(*model.__table__.columns)).mappings().first()
+    return dict(row) if row is not None else None
+
+
+def update_returning(db: Session, model, id, if_match, values):
+    """Updates one row and bumps its version with a single UPDATE ... RETURNING.
+
+    The If-Match precondition is part of the WHERE clause, so the check and the
+    write are atomic. When no row was affected under an If-Match header, the
+    precondition failed whether the row is stale or gone (``*`` included), so
+    the result is 412 Precondition Failed; without the header it is a 404.
+    """
+    statement = update(model).where(model.id == id)
+    versions = if_match_versions(if_match, id)
+    if versions is not None:
+        statement = statement.where(model.version.in_(versions))
+    row = execute_returning(db, statement.values(version=model.version + 1, **values), model)
+    if row is None and if_match is not None:
+        raise HTTPException(status_code=412, detail="Precondition Failed")
+    return row
+
+
+def integrity_error(db: Session, error, detail=None, references=None):
+    """Rolls back a write that failed a constraint and returns the HTTP error to raise.
+
+    ``references`` maps the foreign-key columns of the write to their values;
+    the first one that points at no row gives a 404 for that row. Any other
+    failure, e.g. deleting a row that orders still reference, is a 409 with
+    ``detail`` (or the SQLite message).
+    """
+    db.rollback()
+    for name, id in (references or {}).items():
+        model = REFERENCED_MODELS[name]
+        if db.query(model.id).filter(model.id == id).first() is None:
+            return HTTPException(status_code=404, detail=f"{model.__name__} not found")
+    return HTTPException(status_code=409, detail=detail or str(error.orig))
+
+
+# In-process menu cache
+class ItemCache:
+    """Bounded LRU cache of serialized items with an optional TTL.
+
+    The cache is per process: with several workers, a write only invalidates
+    the cache of the worker that served it, so set DOSA_ITEM_CACHE_TTL to bound
+    how long the other workers can serve a stale item.
+
+    Within a process an entry never goes back in time: ``put`` keeps a newer
+    version already cached, and a miss that read the database before an
+    eviction passes the ``generation`` it started from, so it cannot bring
+    back an item that was deleted meanwhile.
+    """
+
+    def __init__(self, max_size, ttl=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # id -> (expires_at, item dict)
+        self.lock = threading.Lock()  # Sync handlers run concurrently in the threadpool
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0  # Bumped by every eviction
+
+    def get(self, id):
+        with self.lock:
+            entry = self.entries.get(id)
+            if entry is not None and (not self.ttl or entry[0] > time.monotonic()):
+                self.entries.move_to_end(id)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[id]  # Expired
+            self.misses += 1
+            return None
+
+    def put(self, item, generation=None):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return  # An item was evicted after this one was read
+            entry = self.entries.get(item["id"])
+            if entry is not None and entry[1]["version"] > item["version"]:
+                return  # A newer version was cached after this one was read
+            self.entries[item["id"]] = (time.monotonic() + self.ttl, item)
+            self.entries.move_to_end(item["id"])
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def evict(self, id):
+        with self.lock:
+            self.entries.pop(id, None)
+            self.generation += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+item_cache = ItemCache(ITEM_CACHE_SIZE, ITEM_CACHE_TTL)
+
+
+def item_to_dict(item):
+    return {"id": item.id, "name": item.name, "price": item.price, "version": item.version}
+
+
+def warm_item_cache():
+    """Loads the menu into the item cache so reads never touch the database in steady state."""
+    db = SessionLocal()
+    try:
+        for db_item in db.query(Item).order_by(Item.id).limit(ITEM_CACHE_SIZE):
+            item_cache.put(item_to_dict(db_item))
+    finally:
+        db.close()
+
+
+@app.get("/cache/items")
+def read_item_cache_stats():
+    return item_cache.stats()
+
+
 # CRUD operations for customers
 @app.post("/customers", response_model=CustomerOut)
+@db_handler
 def create_customer(customer: CustomerCreate, db: Session = Depends(get_db)):
-    db_customer = Customer(name=customer.name, phone=customer.phone)
-    db.add(db_customer)
-    db.commit()
-    db.refresh(db_customer)
+    try:
+        db_customer = execute_returning(
+            db, insert(Customer).values(name=customer.name, phone=customer.phone), Customer
+        )
+        db.commit()
+    except IntegrityError as e:
+        raise integrity_error(db, e, f"Customer with phone {customer.phone} already exists")
     return db_customer
 
 
 @app.get("/customers/{id}", response_model=CustomerOut)
-def read_customer(id: int, db: Session = Depends(get_db)):
+@db_handler
+def read_customer(
+    id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     db_customer = db.query(Customer).filter(Customer.id == id).first()
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
+    etag = make_etag(db_customer.id, db_customer.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return db_customer
 
 
-@app.put("/customers/{id}", response_model=CustomerOut)
-def update_customer(id: int, customer: CustomerUpdate, db: Session = Depends(get_db)):
-    db_customer = db.query(Customer).filter(Customer.id == id).first()
+@app.get("/customers/by-phone/{phone}", response_model=CustomerOut)
+@db_handler
+def read_customer_by_phone(phone: str, db: Session = Depends(get_db)):
+    db_customer = db.query(Customer).filter(Customer.phone == phone).first()
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
-    db_customer.name = customer.name
-    db_customer.phone = customer.phone
-    db.commit()
-    db.refresh(db_customer)
+    return db_customer
+
+
+@app.put("/customers/{id}", response_model=CustomerOut)
+@db_handler
+def update_customer(
+    id: int,
+    customer: CustomerUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    try:
+        db_customer = update_returning(db, Customer, id, if_match, {"name": customer.name, "phone": customer.phone})
+        if db_customer is None:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        db.commit()
+    except IntegrityError as e:
+        raise integrity_error(db, e, f"Customer with phone {customer.phone} already exists")
+    response.headers["ETag"] = make_etag(db_customer["id"], db_customer["version"])
     return db_customer
 
 
 @app.delete("/customers/{id}")
+@db_handler
 def delete_customer(id: int, db: Session = Depends(get_db)):
-    db_customer = db.query(Customer).filter(Customer.id == id).first()
-    if db_customer is None:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    db.delete(db_customer)
-    db.commit()
+    try:
+        db_customer = execute_returning(db, delete(Customer).where(Customer.id == id), Customer)
+        if db_customer is None:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        db.commit()
+    except IntegrityError as e:
+        raise integrity_error(db, e, "Customer still has orders")
     return {"message": "Customer deleted successfully"}
 
 
 # CRUD operations for items
 @app.post("/items", response_model=ItemOut)
+@db_handler
 def create_item(item: ItemCreate, db: Session = Depends(get_db)):
-    db_item = Item(name=item.name, price=item.price)
-    db.add(db_item)
+    db_item = execute_returning(db, insert(Item).values(name=item.name, price=item.price), Item)
     db.commit()
-    db.refresh(db_item)
+    item_cache.put(db_item)
     return db_item
 
 
 @app.get("/items/{id}", response_model=ItemOut)
-def read_item(id: int, db: Session = Depends(get_db)):
-    db_item = db.query(Item).filter(Item.id == id).first()
-    if db_item is None:
-        raise HTTPException(status_code=404, detail="Item not found")
-    return db_item
+@db_handler
+def read_item(
+    id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    generation = item_cache.generation  # Taken before the read, so a delete racing with it wins
+    cached_item = item_cache.get(id)
+    if cached_item is None:
+        db_item = db.query(Item).filter(Item.id == id).first()
+        if db_item is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        cached_item = item_to_dict(db_item)
+        item_cache.put(cached_item, generation)
+    etag = make_etag(cached_item["id"], cached_item["version"])
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return cached_item
 
 
 @app.put("/items/{id}", response_model=ItemOut)
-def update_item(id: int, item: ItemUpdate, db: Session = Depends(get_db)):
-    db_item = db.query(Item).filter(Item.id == id).first()
+@db_handler
+def update_item(
+    id: int,
+    item: ItemUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    db_item = update_returning(db, Item, id, if_match, {"name": item.name, "price": item.price})
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    db_item.name = item.name
-    db_item.price = item.price
     db.commit()
-    db.refresh(db_item)
+    item_cache.put(db_item)
+    response.headers["ETag"] = make_etag(db_item["id"], db_item["version"])
     return db_item
 
 
 @app.delete("/items/{id}")
+@db_handler
 def delete_item(id: int, db: Session = Depends(get_db)):
-    db_item = db.query(Item).filter(Item.id == id).first()
-    if db_item is None:
-        raise HTTPException(status_code=404, detail="Item not found")
-    db.delete(db_item)
-    db.commit()
+    try:
+        db_item = execute_returning(db, delete(Item).where(Item.id == id), Item)
+        if db_item is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        db.commit()
+    except IntegrityError as e:
+        raise integrity_error(db, e, "Item is still ordered")
+    item_cache.evict(id)
     return {"message": "Item deleted successfully"}
 
 
 # CRUD operations for orders
 @app.post("/orders", response_model=OrderOut)
+@db_handler
 def create_order(order: OrderCreate, db: Session = Depends(get_db)):
-    db_order = Order(
-        customer_id=order.customer_id,
-        item_id=order.item_id,
-        quantity=order.quantity,
-        timestamp=order.timestamp,
-        notes=order.notes
-    )
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    try:
+        db_order = execute_returning(db, insert(Order).values(
+            customer_id=order.customer_id,
+            item_id=order.item_id,
+            quantity=order.quantity,
+            timestamp=order.timestamp,
+            notes=order.notes,
+            unit_price=item_price(order.item_id),
+        ), Order)
+        db.commit()
+    except IntegrityError as e:
+        raise integrity_error(db, e, references={"customer_id": order.customer_id, "item_id": order.item_id})
     return db_order
 
 
 @app.get("/orders/{id}", response_model=OrderOut)
-def read_order(id: int, db: Session = Depends(get_db)):
+@db_handler
+def read_order(
+    id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     db_order = db.query(Order).filter(Order.id == id).first()
     if db_order is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    etag = make_etag(db_order.id, db_order.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return db_order
 
 
 @app.put("/orders/{id}", response_model=OrderOut)
-def update_order(id: int, order: OrderUpdate, db: Session = Depends(get_db)):
-    db_order = db.query(Order).filter(Order.id == id).first()
-    if db_order is None:
-        raise HTTPException(status_code=404, detail="Order not found")
-    db_order.customer_id = order.customer_id
-    db_order.item_id = order.item_id
-    db_order.quantity = order.quantity
-    db_order.timestamp = order.timestamp
-    db_order.notes = order.notes
-    db.commit()
-    db.refresh(db_order)
+@db_handler
+def update_order(
+    id: int,
+    order: OrderUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    try:
+        db_order = update_returning(db, Order, id, if_match, {
+            "customer_id": order.customer_id,
+            "item_id": order.item_id,
+            "quantity": order.quantity,
+            "timestamp": order.timestamp,
+            "notes": order.notes,
+            # The sale price only changes with the item, to the new item's current price
+            "unit_price": case((Order.item_id == order.item_id, Order.unit_price), else_=item_price(order.item_id)),
+        })
+        if db_order is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        db.commit()
+    except IntegrityError as e:
+        raise integrity_error(db, e, references={"customer_id": order.customer_id, "item_id": order.item_id})
+    response.headers["ETag"] = make_etag(db_order["id"], db_order["version"])
     return db_order
 
 
 @app.delete("/orders/{id}")
+@db_handler
 def delete_order(id: int, db: Session = Depends(get_db)):
-    db_order = db.query(Order).filter(Order.id == id).first()
-    if db_order is None:
-        raise HTTPException(status_code=404, detail="Order not found")
-    db.delete(db_order)
-    db.commit()
+    try:
+        db_order = execute_returning(db, delete(Order).where(Order.id == id), Order)
+        if db_order is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        db.commit()
+    except IntegrityError as e:
+        raise integrity_error(db, e)
     return {"message": "Order deleted successfully"}
+
+
+# Batch create operations
+def insert_many(db: Session, model, values):
+    """Inserts rows with one bulk INSERT ... RETURNING and returns them in input order."""
+    if not values:
+        return []
+    table = model.__table__
+    result = db.execute(insert(table).returning(*table.columns, sort_by_parameter_order=True), values)
+    return [dict(row) for row in result.mappings()]
+
+
+def create_batch(db: Session, model, values, errors, atomic):
+    """Inserts the rows of a batch that passed validation in one transaction.
+
+    ``errors`` maps the index of each invalid row to its error message. In
+    atomic mode any error rejects the whole batch with a 409; otherwise the
+    valid rows are inserted and the errors are reported next to them.
+    """
+    error_list = [{"index": index, "detail": detail} for index, detail in sorted(errors.items())]
+    if atomic and error_list:
+        raise HTTPException(status_code=409, detail=error_list)
+    try:
+        created = insert_many(db, model, [value for index, value in enumerate(values) if index not in errors])
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e.orig))
+    return {"created": created, "errors": error_list}
+
+
+def check_batch_size(rows):
+    if len(rows) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_SIZE} rows)")
+
+
+@app.post("/customers/batch", response_model=CustomerBatchOut)
+@db_handler
+def create_customers_batch(customers: List[CustomerCreate], atomic: bool = True, db: Session = Depends(get_db)):
+    check_batch_size(customers)
+    values = [{"name": customer.name, "phone": customer.phone} for customer in customers]
+    existing = {
+        phone for (phone,) in
+        db.query(Customer.phone).filter(Customer.phone.in_([value["phone"] for value in values]))
+    }
+    errors = {}
+    seen = set()
+    for index, value in enumerate(values):
+        if value["phone"] in existing:
+            errors[index] = f"Customer with phone {value['phone']} already exists"
+        elif value["phone"] in seen:
+            errors[index] = f"Duplicate phone {value['phone']} in batch"
+        seen.add(value["phone"])
+    return create_batch(db, Customer, values, errors, atomic)
+
+
+@app.post("/items/batch", response_model=ItemBatchOut)
+@db_handler
+def create_items_batch(items: List[ItemCreate], atomic: bool = True, db: Session = Depends(get_db)):
+    check_batch_size(items)
+    values = [{"name": item.name, "price": item.price} for item in items]
+    result = create_batch(db, Item, values, {}, atomic)
+    for created_item in result["created"]:
+        item_cache.put(created_item)
+    return result
+
+
+@app.post("/orders/batch", response_model=OrderBatchOut)
+@db_handler
+def create_orders_batch(orders: List[OrderCreate], atomic: bool = True, db: Session = Depends(get_db)):
+    check_batch_size(orders)
+    values = [
+        {
+            "customer_id": order.customer_id,
+            "item_id": order.item_id,
+            "quantity": order.quantity,
+            "timestamp": order.timestamp,
+            "notes": order.notes,
+        }
+        for order in orders
+    ]
+    customer_ids = {
+        id for (id,) in
+        db.query(Customer.id).filter(Customer.id.in_({value["customer_id"] for value in values}))
+    }
+    prices = dict(db.query(Item.id, Item.price).filter(Item.id.in_({value["item_id"] for value in values})))
+    errors = {}
+    for index, value in enumerate(values):
+        if value["customer_id"] not in customer_ids:
+            errors[index] = f"Customer {value['customer_id']} not found"
+        elif value["item_id"] not in prices:
+            errors[index] = f"Item {value['item_id']} not found"
+        else:
+            value["unit_price"] = prices[value["item_id"]]
+    return create_batch(db, Order, values, errors, atomic)
+
+
+# Keyset-paginated list operations
+def keyset_page(query, keys, after, limit):
+    """Returns one page of ``query`` ordered by the ``keys`` columns, starting after the ``after`` cursor.
+
+    The page is selected with ``WHERE (keys) > (:after) ORDER BY keys LIMIT :limit``
+    (``after`` is None for the first page), so with an index that ends in the
+    keys every page is an index range read regardless of how deep it is. One
+    extra row is fetched to tell whether there is a next page; ``next_cursor``
+    holds the keys of the last row returned (the bare value for a single key),
+    or None on the last page.
+    """
+    if after is not None:
+        query = query.filter(keys[0] > after if len(keys) == 1 else tuple_(*keys) > tuple_(*after))
+    rows = query.order_by(*keys).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = [getattr(rows[limit - 1], key.key) for key in keys]
+        next_cursor = next_cursor[0] if len(keys) == 1 else tuple(next_cursor)
+    return {"data": rows[:limit], "next_cursor": next_cursor}
+
+
+def parse_order_cursor(after, filtered):
+    """Parses the ``after`` cursor of GET /orders: an id (0 for the first page), or "timestamp:id" for a filtered list."""
+    if after is None:
+        return None if filtered else 0
+    try:
+        if filtered:
+            timestamp, id = after.split(":")
+            return int(timestamp), int(id)
+        return int(after)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid cursor: {after}")
+
+
+@app.get("/customers", response_model=CustomerPage)
+@db_handler
+def list_customers(
+    after: int = 0,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    return keyset_page(db.query(Customer), [Customer.id], after, limit)
+
+
+@app.get("/items", response_model=ItemPage)
+@db_handler
+def list_items(
+    after: int = 0,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    return keyset_page(db.query(Item), [Item.id], after, limit)
+
+
+@app.get("/orders", response_model=OrderPage)
+@db_handler
+def list_orders(
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    customer_id: Optional[int] = None,
+    item_id: Optional[int] = None,
+    from_: Optional[int] = Query(None, alias="from"),
+    to: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Lists flat orders, optionally filtered by customer, item and a [from, to) timestamp range.
+
+    Tickets are not listed here; each one is read at /orders/tickets/{id}. Unfiltered, the orders come by id. Filtered, they come by (timestamp, id)
+    with a "timestamp:id" cursor: every index the filters can use ends in
+    (timestamp, id), since SQLite appends the rowid to each index entry, so the
+    pages are index range reads and never sorted in a temp B-tree.
+    """
+    query = db.query(Order)
+    filtered = any(value is not None for value in (customer_id, item_id, from_, to))
+    if customer_id is not None:
+        query = query.filter(Order.customer_id == customer_id)
+    if item_id is not None:
+        query = query.filter(Order.item_id == item_id)
+    if from_ is not None:
+        query = query.filter(Order.timestamp >= from_)
+    if to is not None:
+        query = query.filter(Order.timestamp < to)
+    if not filtered:
+        return keyset_page(query, [Order.id], parse_order_cursor(after, filtered), limit)
+    page = keyset_page(query, [Order.timestamp, Order.id], parse_order_cursor(after, filtered), limit)
+    if page["next_cursor"] is not None:
+        page["next_cursor"] = "%d:%d" % page["next_cursor"]
+    return page
+
+
+# Ticket operations (one order header plus its lines)
+def ticket_lines(db: Session, ticket):
+    """Checks a ticket body and collapses its repeated items into quantities.
+
+    Returns:
+        tuple: {item_id: quantity} and the current {item_id: price} of those items.
+    """
+    if not ticket.items:
+        raise HTTPException(status_code=422, detail="A ticket needs at least one item")
+    quantities = {}
+    for line in ticket.items:
+        if line.quantity < 1:
+            raise HTTPException(status_code=422, detail="Quantities must be positive")
+        quantities[line.item_id] = quantities.get(line.item_id, 0) + line.quantity
+
+    if db.query(Customer.id).filter(Customer.id == ticket.customer_id).first() is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    prices = dict(db.query(Item.id, Item.price).filter(Item.id.in_(quantities)))
+    for item_id in quantities:
+        if item_id not in prices:
+            raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
+    return quantities, prices
+
+
+@app.post("/orders/tickets", response_model=TicketOut)
+@db_handler
+def create_ticket(ticket: TicketCreate, db: Session = Depends(get_db)):
+    """Creates a whole ticket atomically; repeated items are collapsed into quantities, listed by item id."""
+    quantities, prices = ticket_lines(db, ticket)
+    try:
+        header = execute_returning(db, insert(OrderHeader).values(
+            customer_id=ticket.customer_id,
+            timestamp=ticket.timestamp,
+            notes=ticket.notes,
+        ), OrderHeader)
+        header["lines"] = insert_many(db, OrderLine, [
+            {"order_id": header["id"], "item_id": item_id, "quantity": quantity, "unit_price": prices[item_id]}
+            for item_id, quantity in sorted(quantities.items())
+        ])
+        db.commit()
+    except IntegrityError as e:
+        # A customer or item deleted since the checks above
+        raise integrity_error(db, e, references={"customer_id": ticket.customer_id})
+    return header
+
+
+@app.get("/orders/tickets/{id}", response_model=TicketOut)
+@db_handler
+def read_ticket(
+    id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    db_header = db.query(OrderHeader).filter(OrderHeader.id == id).first()
+    if db_header is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    etag = make_etag(db_header.id, db_header.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    # By item id, the order of the unique (order_id, item_id) index, so the lines are never sorted
+    lines = db.query(OrderLine).filter(OrderLine.order_id == id).order_by(OrderLine.item_id).all()
+    return {
+        "id": db_header.id,
+        "customer_id": db_header.customer_id,
+        "timestamp": db_header.timestamp,
+        "notes": db_header.notes,
+        "lines": lines,
+    }
+
+
+@app.put("/orders/tickets/{id}", response_model=TicketOut)
+@db_handler
+def update_ticket(
+    id: int,
+    ticket: TicketUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Replaces a ticket's customer, timestamp, notes and items atomically and bumps its version.
+
+    Items the ticket already had keep their sale price; added items are sold
+    at their current price. The old lines are deleted before the header
+    changes and the new ones inserted after it, so the analytics triggers move
+    the sales from the old timestamp to the new one.
+    """
+    quantities, prices = ticket_lines(db, ticket)
+    try:
+        sold_at = dict(db.query(OrderLine.item_id, OrderLine.unit_price).filter(OrderLine.order_id == id))
+        db.execute(delete(OrderLine).where(OrderLine.order_id == id))
+        header = update_returning(db, OrderHeader, id, if_match, {
+            "customer_id": ticket.customer_id,
+            "timestamp": ticket.timestamp,
+            "notes": ticket.notes,
+        })
+        if header is None:
+            raise HTTPException(status_code=404, detail="Ticket not found")
+        header["lines"] = insert_many(db, OrderLine, [
+            {"order_id": id, "item_id": item_id, "quantity": quantity, "unit_price": sold_at.get(item_id, prices[item_id])}
+            for item_id, quantity in sorted(quantities.items())
+        ])
+        db.commit()
+    except IntegrityError as e:
+        raise integrity_error(db, e, references={"customer_id": ticket.customer_id})
+    response.headers["ETag"] = make_etag(header["id"], header["version"])
+    return header
+
+
+@app.delete("/orders/tickets/{id}")
+@db_handler
+def delete_ticket(id: int, db: Session = Depends(get_db)):
+    try:
+        db_header = execute_returning(db, delete(OrderHeader).where(OrderHeader.id == id), OrderHeader)  # Lines go first, by trigger
+        if db_header is None:
+            raise HTTPException(status_code=404, detail="Ticket not found")
+        db.commit()
+    except IntegrityError as e:
+        raise integrity_error(db, e)
+    return {"message": "Ticket deleted successfully"}
+
+
+# Analytics
+ITEM_STATS_SORT_COLUMNS = {
+    "orders": ItemStats.order_count,
+    "units": ItemStats.units,
+    "revenue": ItemStats.revenue,
+}
+
+
+@app.get("/analytics/items", response_model=List[ItemStatsOut])
+@db_handler
+def read_item_stats(
+    sort: str = Query("orders", pattern="^(orders|units|revenue)$"),
+    desc: bool = True,
+    top: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+):
+    """Item popularity from the precomputed item_stats table, sorted and optionally limited to the top N."""
+    column = ITEM_STATS_SORT_COLUMNS[sort]
+    query = (
+        db.query(ItemStats.item_id, Item.name, Item.price, ItemStats.order_count, ItemStats.units, ItemStats.revenue)
+        .join(Item, Item.id == ItemStats.item_id)
+        .order_by(column.desc() if desc else column.asc(), ItemStats.item_id)
+    )
+    if top is not None:
+        query = query.limit(top)
+    return [row._asdict() for row in query]
+
+
+@app.get("/analytics/sales", response_model=List[SalesBucketOut])
+@db_handler
+def read_sales(
+    from_: int = Query(..., alias="from"),
+    to: int = Query(...),
+    bucket: str = Query("hour", pattern="^(hour|day)$"),
+    item_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Sales per hour or day, read only from the rollup tables.
+
+    The rollups only hold whole buckets, so the result is every bucket that overlaps the
+    [from, to) timestamp range: an unaligned from or to is rounded out to the start of its
+    bucket or the end of its bucket, and the first and last buckets may include sales
+    outside the range.
+    """
+    model, size = SALES_ROLLUPS[bucket]
+    query = (
+        db.query(
+            model.bucket,
+            func.sum(model.order_count).label("order_count"),
+            func.sum(model.units).label("units"),
+            func.sum(model.revenue).label("revenue"),
+        )
+        .filter(model.bucket >= from_ - from_ % size, model.bucket < to)
+        .group_by(model.bucket)
+        .order_by(model.bucket)
+    )
+    if item_id is not None:
+        query = query.filter(model.item_id == item_id)
+    return [row._asdict() for row in query]
+
+
+# Full-text search
+def fts_prefix_query(q):
+    """Turns user input into an FTS5 query where every word is matched as a prefix."""
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", q))
+
+
+def search_table(db: Session, model, fts_table, match, limit):
+    """Returns the rows of ``model`` matching an FTS5 query, best bm25 rank first."""
+    fts = sa_table(fts_table, sa_column("rowid"), sa_column("rank"))
+    return (
+        db.query(model)
+        .join(fts, fts.c.rowid == model.id)
+        .filter(literal_column(fts_table).op("MATCH")(match))
+        .order_by(fts.c.rank)
+        .limit(limit)
+        .all()
+    )
+
+
+@app.get("/search", response_model=SearchOut)
+@db_handler
+def search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Prefix search over customer names, item names and order and ticket notes, ranked by relevance."""
+    match = fts_prefix_query(q)
+    if not match:
+        return {"customers": [], "items": [], "orders": [], "tickets": []}
+    return {
+        "customers": search_table(db, Customer, "customers_fts", match, limit),
+        "items": search_table(db, Item, "items_fts", match, limit),
+        "orders": search_table(db, Order, "orders_fts", match, limit),
+        "tickets": search_table(db, OrderHeader, "order_headers_fts", match, limit),
+    }
+
+
+# Streaming export
+EXPORT_COLUMNS = ["id", "customer_id", "item_id", "quantity", "timestamp", "notes", "ticket_id", "unit_price"]
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def format_export_rows(rows, format):
+    """Renders a chunk of order rows as NDJSON lines or CSV records."""
+    if format == "csv":
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerows(rows)
+        return out.getvalue()
+    return "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), separators=(",", ":")) + "\n" for row in rows)
+
+
+def stream_orders_export(from_, to, format, compress):
+    """
+    Yields the sales in [from_, to) ordered by timestamp, one encoded chunk at a time.
+
+    Flat orders and ticket lines (with their ticket's customer, timestamp and notes, and
+    its id as ticket_id) come from two server-side cursors, each in timestamp order, and
+    are merged as they are read; at equal timestamps flat orders come first. Rows are
+    fetched and written EXPORT_CHUNK_ROWS at a time, so memory stays flat however long
+    the range is. With compress, every chunk is gzip sync-flushed so the client can start
+    decoding right away.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def encode(chunk):
+        data = chunk.encode()
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else data
+
+    if format == "csv":
+        yield encode(",".join(EXPORT_COLUMNS) + "\n")
+
+    orders = select(
+        Order.id, Order.customer_id, Order.item_id, Order.quantity, Order.timestamp, Order.notes,
+        null().label("ticket_id"), Order.unit_price,
+    ).where(Order.timestamp >= from_)
+    lines = select(
+        OrderLine.id, OrderHeader.customer_id, OrderLine.item_id, OrderLine.quantity, OrderHeader.timestamp,
+        OrderHeader.notes, OrderHeader.id.label("ticket_id"), OrderLine.unit_price,
+    ).join(OrderHeader, OrderHeader.id == OrderLine.order_id).where(OrderHeader.timestamp >= from_)
+    if to is not None:
+        orders = orders.where(Order.timestamp < to)
+        lines = lines.where(OrderHeader.timestamp < to)
+    orders = orders.order_by(Order.timestamp, Order.id)
+    lines = lines.order_by(OrderHeader.timestamp, OrderHeader.id, OrderLine.item_id)  # The index orders, no sort
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS)
+        rows = heapq.merge(conn.execute(orders), conn.execute(lines), key=lambda row: row.timestamp)
+        while chunk := list(itertools.islice(rows, EXPORT_CHUNK_ROWS)):
+            yield encode(format_export_rows(chunk, format))
+
+    if compressor:
+        yield compressor.flush()
+
+
+@app.get("/export/orders")
+def export_orders(
+    from_: int = Query(0, alias="from"),
+    to: Optional[int] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+):
+    """Streams every flat order and ticket line in [from, to) as NDJSON or CSV, optionally gzip-encoded."""
+    headers = {"Content-Disposition": f'attachment; filename="orders.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        stream_orders_export(from_, to, format, gzip),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers,
+    )
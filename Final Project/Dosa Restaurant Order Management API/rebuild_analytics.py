@@ -0,0 +1,20 @@
+import time
+
+from main import engine, rebuild_item_stats, rebuild_sales_rollups
+
+def rebuild_analytics():
+    """
+    Recomputes item_stats and the hourly/daily sales rollups from orders and order_lines.
+
+    The tables are normally kept current by triggers; a rebuild is only needed
+    after writing to those tables with the triggers missing. Both value revenue at
+    the unit_price stored on each order, so a rebuild gives the same totals.
+    """
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        rebuild_item_stats(conn)
+        rebuild_sales_rollups(conn)
+    print(f"Rebuilt item_stats and sales rollups in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    rebuild_analytics()
@@ -0,0 +1,430 @@
+import unittest
+import contextlib
+import csv
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import warnings
+from fastapi.testclient import TestClient
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_module(name):
+    """Imports a module of the app directory by path (the directory is not a package)."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(APP_DIR, f'{name}.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def load_main(database_url, async_db=False, query_plan_guard=False):
+    """Imports a fresh copy of main.py, which reads its settings and creates its schema at import."""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['DOSA_ASYNC_DB'] = '1' if async_db else '0'
+    os.environ['DOSA_QUERY_PLAN_GUARD'] = '1' if query_plan_guard else '0'
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Pydantic v1-style Config in the schemas
+        return load_module('main')
+
+class TestApi(unittest.TestCase):
+    """Calls the endpoints of a scratch database in the default sync mode."""
+
+    async_db = False
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'db.sqlite')
+        self.main = load_main(f'sqlite:///{self.db_path}', self.async_db, query_plan_guard=True)
+        self.client = TestClient(self.main.app)
+        self.client.__enter__()
+
+    def tearDown(self):
+        if self.async_db:
+            self.client.portal.call(self.main.async_engine.dispose)  # On the event loop that opened the connections
+        self.client.__exit__(None, None, None)
+        self.main.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def post(self, path, body, status=200):
+        response = self.client.post(path, json=body)
+        self.assertEqual(response.status_code, status, response.text)
+        return response.json()
+
+    def create_order(self, customer_id=1, item_id=1, quantity=1, timestamp=1700000000, notes=None):
+        return self.post('/orders', {'customer_id': customer_id, 'item_id': item_id, 'quantity': quantity,
+                                     'timestamp': timestamp, 'notes': notes})
+
+    def create_menu(self):
+        self.post('/customers', {'name': 'Damodhar', 'phone': '732-555-5509'})
+        self.post('/items', {'name': 'Sada Dosa', 'price': 9.95})
+
+    def test_missing_references_are_not_found(self):
+        self.create_menu()
+        order = {'customer_id': 1, 'item_id': 1, 'quantity': 1, 'timestamp': 1700000000}
+        self.assertEqual(self.post('/orders', dict(order, customer_id=9), 404), {'detail': 'Customer not found'})
+        self.assertEqual(self.post('/orders', dict(order, item_id=9), 404), {'detail': 'Item not found'})
+        self.create_order()
+        response = self.client.put('/orders/1', json=dict(order, item_id=9))
+        self.assertEqual((response.status_code, response.json()), (404, {'detail': 'Item not found'}))
+        self.assertEqual(self.client.get('/orders/1').json()['item_id'], 1)
+
+    def test_referenced_rows_cannot_be_deleted(self):
+        self.create_menu()
+        self.create_order()
+        self.assertEqual(self.client.delete('/customers/1').status_code, 409)
+        self.assertEqual(self.client.delete('/items/1').status_code, 409)
+        self.assertEqual(self.client.get('/items/1').status_code, 200)
+        self.assertEqual(self.client.delete('/orders/1').status_code, 200)
+        self.assertEqual(self.client.delete('/customers/1').status_code, 200)
+        self.assertEqual(self.client.delete('/items/1').status_code, 200)
+
+    def test_duplicate_phone_is_a_conflict(self):
+        self.create_menu()
+        self.post('/customers', {'name': 'Tom', 'phone': '609-555-2301'})
+        self.post('/customers', {'name': 'Tom', 'phone': '732-555-5509'}, 409)
+        response = self.client.put('/customers/2', json={'name': 'Tom', 'phone': '732-555-5509'})
+        self.assertEqual(response.status_code, 409)
+
+    def test_ids_and_etags_are_never_reused(self):
+        self.create_menu()
+        self.post('/customers', {'name': 'Tom', 'phone': '609-555-2301'})
+        etag = self.client.get('/customers/2').headers['ETag']
+        self.client.delete('/customers/2')
+        self.assertEqual(self.post('/customers', {'name': 'Tom', 'phone': '609-555-2301'})['id'], 3)
+        self.assertEqual(self.client.get('/customers/2', headers={'If-None-Match': etag}).status_code, 404)
+
+    def test_if_match_on_missing_row(self):
+        body = {'name': 'Tom', 'phone': '609-555-2301'}
+        for if_match in ('*', '"9-1"'):
+            self.assertEqual(self.client.put('/customers/9', json=body, headers={'If-Match': if_match}).status_code, 412)
+        self.assertEqual(self.client.put('/customers/9', json=body).status_code, 404)
+
+    def test_item_cache_never_goes_back(self):
+        cache = self.main.ItemCache(10)
+        cache.put({'id': 1, 'name': 'Sada Dosa', 'price': 10.95, 'version': 2})
+        cache.put({'id': 1, 'name': 'Sada Dosa', 'price': 9.95, 'version': 1})  # A slow miss read the old row
+        self.assertEqual(cache.get(1)['version'], 2)
+        generation = cache.generation
+        cache.evict(1)  # Deleted while the miss was reading it
+        cache.put({'id': 1, 'name': 'Sada Dosa', 'price': 10.95, 'version': 2}, generation)
+        self.assertIsNone(cache.get(1))
+
+    def test_deleted_item_is_not_served_from_cache(self):
+        self.post('/items', {'name': 'Sada Dosa', 'price': 9.95})
+        self.client.put('/items/1', json={'name': 'Sada Dosa', 'price': 10.95})
+        self.assertEqual(self.client.get('/items/1').json()['price'], 10.95)
+        self.client.delete('/items/1')
+        self.assertEqual(self.client.get('/items/1').status_code, 404)
+
+    def create_ticket(self):
+        self.create_menu()
+        self.post('/items', {'name': 'Masala Dosa', 'price': 10.95})
+        return self.post('/orders/tickets', {'customer_id': 1, 'timestamp': 1700000000, 'notes': 'no onions',
+                                             'items': [{'item_id': 2}, {'item_id': 1}, {'item_id': 2}]})
+
+    def test_tickets_are_stored_as_lines(self):
+        ticket = self.create_ticket()
+        self.create_order(item_id=2, timestamp=1700000000)
+        self.assertEqual([(line['item_id'], line['quantity']) for line in ticket['lines']], [(1, 1), (2, 2)])
+        self.assertEqual(self.client.get(f"/orders/tickets/{ticket['id']}").json(), ticket)
+        self.assertEqual([order['item_id'] for order in self.client.get('/orders?customer_id=1').json()['data']], [2])
+        with self.main.engine.connect() as conn:  # Only the flat order, the ticket is not written to orders
+            self.assertIsNone(conn.exec_driver_sql('SELECT id FROM orders WHERE id = 2').scalar())
+        result = self.client.get('/search?q=onion').json()
+        self.assertEqual((result['orders'], [t['id'] for t in result['tickets']]), ([], [ticket['id']]))
+        rows = list(csv.DictReader(io.StringIO(self.client.get('/export/orders?format=csv').text)))
+        self.assertEqual([(row['item_id'], row['quantity'], row['ticket_id'], row['notes']) for row in rows],
+                         [('2', '1', '', ''), ('1', '1', '1', 'no onions'), ('2', '2', '1', 'no onions')])
+        self.assertEqual([row['units'] for row in self.client.get('/analytics/items?sort=units').json()], [3, 1])
+
+    def test_failed_ticket_write_is_rolled_back(self):
+        self.create_menu()
+        with self.main.engine.begin() as conn:  # Fails the write after the header, as a concurrent delete would
+            conn.exec_driver_sql("CREATE TRIGGER fail_lines BEFORE INSERT ON order_lines BEGIN SELECT RAISE(ABORT, 'gone'); END")
+        body = {'customer_id': 1, 'timestamp': 1700000000, 'items': [{'item_id': 1}]}
+        response = self.client.post('/orders/tickets', json=body)
+        self.assertEqual((response.status_code, response.json()['detail']), (409, 'gone'))
+        with self.main.engine.connect() as conn:
+            self.assertIsNone(conn.exec_driver_sql('SELECT id FROM order_headers WHERE id = 1').scalar())
+
+    def test_tickets_can_be_updated_and_deleted(self):
+        ticket = self.create_ticket()
+        etag = self.client.get('/orders/tickets/1').headers['ETag']
+        self.client.put('/items/2', json={'name': 'Masala Dosa', 'price': 12})
+        body = {'customer_id': 1, 'timestamp': 1700003700, 'items': [{'item_id': 2, 'quantity': 3}]}
+        self.assertEqual(self.client.put('/orders/tickets/1', json=body, headers={'If-Match': '"1-9"'}).status_code, 412)
+        response = self.client.put('/orders/tickets/1', json=body, headers={'If-Match': etag})
+        self.assertNotEqual(response.headers['ETag'], etag)
+        # The kept item is still sold at its price on the ticket, and the sale moved to the new hour
+        self.assertEqual(response.json()['lines'], [{'item_id': 2, 'quantity': 3, 'unit_price': 10.95}])
+        self.assertEqual(self.item_stats(), [(2, 1, 3, 32.85)])
+        self.assertEqual(self.sales(), [(1700002800, 1, 3, 32.85)])
+        self.assertEqual(self.client.put('/orders/tickets/1', json=body, headers={'If-Match': etag}).status_code, 412)
+        self.assertEqual(self.client.get('/search?q=onion').json()['tickets'], [])
+
+        self.assertEqual(self.client.delete(f"/orders/tickets/{ticket['id']}").status_code, 200)
+        self.assertEqual((self.item_stats(), self.sales()), ([], []))
+        self.assertEqual(self.client.get('/orders/tickets/1').status_code, 404)
+        self.assertEqual(self.client.delete('/orders/tickets/1').status_code, 404)
+        with self.main.engine.connect() as conn:
+            self.assertIsNone(conn.exec_driver_sql('SELECT id FROM order_lines WHERE order_id = 1').scalar())
+
+    def test_migration_moves_flat_orders_into_tickets(self):
+        self.create_menu()
+        for notes in ('to go', 'to go', None):
+            self.create_order(notes=notes)
+        before = (self.item_stats(), self.sales(), self.sales('day'))
+        migrate_to_tickets = load_module('init_db').migrate_to_tickets
+        self.assertEqual(migrate_to_tickets(self.db_path), 2)
+        self.assertEqual(self.client.get('/orders').json()['data'], [])
+        self.assertEqual(self.client.get('/orders/tickets/1').json()['lines'], [{'item_id': 1, 'quantity': 2, 'unit_price': 9.95}])
+        # Same units and revenue; the two rows of ticket 1 are one line now, so they count as one order
+        self.assertEqual((self.item_stats(), self.sales(), self.sales('day')),
+                         tuple([(key, 2, units, revenue) for key, count, units, revenue in rows] for rows in before))
+
+        self.create_order(notes='to go')  # Same customer, time and notes as ticket 1, but written after the migration
+        self.assertEqual(migrate_to_tickets(self.db_path), 1)
+        self.assertEqual(self.client.get('/orders/tickets/3').json()['notes'], 'to go')
+        self.assertEqual(self.client.get('/orders').json()['data'], [])
+        body = {'customer_id': 1, 'timestamp': 1700000000, 'items': [{'item_id': 1, 'quantity': 5}]}
+        self.assertEqual(self.client.put('/orders/tickets/1', json=body).json()['lines'][0]['quantity'], 5)  # Still editable
+
+    def test_bulk_load_rebuilds_analytics_and_search(self):
+        self.create_menu()
+        self.create_order(quantity=2)
+        orders = [{'name': 'Asha', 'phone': '609-555-2301', 'timestamp': 1700003700, 'notes': 'extra chutney',
+                   'items': [{'name': 'Sada Dosa', 'price': 9.95}, {'name': 'Rava Dosa', 'price': 11}]}]
+        json_file = os.path.join(self.tmpdir.name, 'orders.json')
+        with open(json_file, 'w') as file:
+            json.dump(orders, file)
+        with self.main.engine.connect() as conn:
+            triggers = conn.exec_driver_sql("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name").fetchall()
+        if self.async_db:
+            self.client.portal.call(self.main.async_engine.dispose)
+        self.main.engine.dispose()  # Leaving WAL mode for the load needs the only connection
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(load_module('init_db').bulk_load_database(json_file, self.db_path), 4)
+        self.assertEqual(self.item_stats(), [(2, 1, 1, 11), (1, 2, 3, 29.85)])
+        self.assertEqual(self.sales(), [(1699999200, 1, 2, 19.9), (1700002800, 2, 2, 20.95)])
+        result = self.client.get('/search?q=chutney rava').json()  # Neither word is in the FTS tables unless they were rebuilt
+        self.assertEqual([order['id'] for order in result['orders']], [])
+        self.assertEqual([item['name'] for item in self.client.get('/search?q=rava').json()['items']], ['Rava Dosa'])
+        self.assertEqual([order['id'] for order in self.client.get('/search?q=chutney').json()['orders']], [2, 3])
+        with self.main.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name").fetchall(), triggers)
+        self.create_order(item_id=2, timestamp=1700003700)  # The reinstalled triggers keep counting
+        self.assertEqual(self.item_stats(), [(1, 2, 3, 29.85), (2, 2, 2, 22)])
+
+    def item_stats(self):
+        return [(row['item_id'], row['order_count'], row['units'], round(row['revenue'], 2))
+                for row in self.client.get('/analytics/items?desc=false').json()]
+
+    def test_item_stats_use_the_sale_price(self):
+        self.create_menu()
+        self.post('/items', {'name': 'Masala Dosa', 'price': 10})
+        self.create_order(item_id=2, quantity=2)
+        self.client.put('/items/2', json={'name': 'Masala Dosa', 'price': 15})
+        self.create_order(item_id=2)
+        self.assertEqual(self.item_stats(), [(2, 2, 3, 35)])
+        self.assertEqual(self.client.get('/orders/1').json()['unit_price'], 10)
+
+        body = {'customer_id': 1, 'item_id': 2, 'quantity': 1, 'timestamp': 1700000000}
+        self.client.put('/orders/1', json=body)  # Same item: still sold at 10
+        self.assertEqual(self.item_stats(), [(2, 2, 2, 25)])
+        self.client.put('/orders/1', json=dict(body, item_id=1))  # Another item: sold at its price now
+        self.assertEqual(self.item_stats(), [(1, 1, 1, 9.95), (2, 1, 1, 15)])
+
+        self.client.delete('/orders/1')
+        self.client.delete('/orders/2')
+        self.assertEqual(self.item_stats(), [])  # Emptied rows are removed, never left at zero or below
+
+    def test_item_stats_count_tickets(self):
+        self.create_ticket()
+        self.client.put('/items/2', json={'name': 'Masala Dosa', 'price': 12})
+        self.assertEqual(self.item_stats(), [(1, 1, 1, 9.95), (2, 1, 2, 21.9)])
+
+    def sales(self, bucket='hour', from_=1699999200, to=1700092800):
+        response = self.client.get(f'/analytics/sales?from={from_}&to={to}&bucket={bucket}')
+        return [(row['bucket'], row['order_count'], row['units'], round(row['revenue'], 2)) for row in response.json()]
+
+    def test_sales_rollups_use_the_sale_price(self):
+        self.create_menu()
+        self.create_order(quantity=2, timestamp=1700000000)
+        self.client.put('/items/1', json={'name': 'Sada Dosa', 'price': 20})
+        self.create_order(timestamp=1700003700)
+        self.assertEqual(self.sales(), [(1699999200, 1, 2, 19.9), (1700002800, 1, 1, 20)])
+        self.assertEqual(self.sales('day'), [(1699920000, 2, 3, 39.9)])
+        # Unaligned bounds are rounded out to the buckets that overlap them
+        self.assertEqual(self.sales(from_=1700003000, to=1700003001), [(1700002800, 1, 1, 20)])
+
+        body = {'customer_id': 1, 'item_id': 1, 'quantity': 2, 'timestamp': 1700003700}
+        self.client.put('/orders/1', json=body)  # Moved to the next hour, still sold at 9.95
+        self.assertEqual(self.sales(), [(1700002800, 2, 3, 39.9)])
+        self.client.delete('/orders/1')
+        self.client.delete('/orders/2')
+        self.assertEqual((self.sales(), self.sales('day')), ([], []))
+        with self.main.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql('SELECT COUNT(*) FROM sales_hourly').scalar(), 0)
+
+    def test_sales_rollups_count_tickets(self):
+        self.create_ticket()
+        self.assertEqual(self.sales(), [(1699999200, 2, 3, 31.85)])
+
+    def test_rebuild_matches_the_triggers(self):
+        self.create_ticket()
+        self.create_order(quantity=3, timestamp=1700090000)
+        self.client.put('/items/1', json={'name': 'Sada Dosa', 'price': 20})
+        before = (self.item_stats(), self.sales(), self.sales('day'))
+        with self.main.engine.begin() as conn:
+            self.main.rebuild_item_stats(conn)
+            self.main.rebuild_sales_rollups(conn)
+        self.assertEqual((self.item_stats(), self.sales(), self.sales('day')), before)
+
+    def pages(self, path):
+        ids, cursors, after = [], [], None
+        while True:
+            page = self.client.get(path + (f'&after={after}' if after is not None else '')).json()
+            ids += [order['id'] for order in page['data']]
+            after = page['next_cursor']
+            if after is None:
+                return ids, cursors
+            cursors.append(after)
+
+    def test_filtered_orders_are_paged_by_timestamp(self):
+        self.create_menu()
+        for timestamp in (3, 1, 2, 1, 3):
+            self.create_order(timestamp=timestamp)
+        self.assertEqual(self.pages('/orders?limit=2'), ([1, 2, 3, 4, 5], [2, 4]))
+        self.assertEqual(self.pages('/orders?limit=2&customer_id=1'), ([2, 4, 3, 1, 5], ['1:4', '3:1']))
+        self.assertEqual(self.pages('/orders?limit=1&from=1&to=3'), ([2, 4, 3], ['1:2', '1:4']))
+        self.assertEqual(self.client.get('/orders?customer_id=1&after=4').status_code, 422)
+
+    def test_etags(self):
+        self.create_menu()
+        self.create_order()
+        for path, body in (('/customers/1', {'name': 'Tom', 'phone': '609-555-2301'}),
+                           ('/items/1', {'name': 'Sada Dosa', 'price': 10.95}),
+                           ('/orders/1', {'customer_id': 1, 'item_id': 1, 'quantity': 2, 'timestamp': 1700000000})):
+            response = self.client.get(path)
+            etag = response.headers['ETag']
+            self.assertEqual(etag, '"1-1"')
+            response = self.client.get(path, headers={'If-None-Match': f'W/"x", W/{etag}'})
+            self.assertEqual((response.status_code, response.content, response.headers['ETag']), (304, b'', etag))
+            self.assertEqual(self.client.put(path, json=body, headers={'If-Match': '"1-9"'}).status_code, 412)
+            response = self.client.put(path, json=body, headers={'If-Match': etag})
+            self.assertEqual((response.status_code, response.headers['ETag']), (200, '"1-2"'))
+            self.assertEqual(self.client.put(path, json=body, headers={'If-Match': etag}).status_code, 412)
+            self.assertEqual(self.client.get(path, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_batches(self):
+        customers = [{'name': 'Tom', 'phone': '609-555-2301'}, {'name': 'Matt', 'phone': '609-555-2301'}]
+        self.assertEqual(len(self.post('/customers/batch', customers, 409)['detail']), 1)
+        result = self.post('/customers/batch?atomic=false', customers)
+        self.assertEqual(([c['id'] for c in result['created']], result['errors']),
+                         ([1], [{'index': 1, 'detail': 'Duplicate phone 609-555-2301 in batch'}]))
+        items = self.post('/items/batch', [{'name': 'Sada Dosa', 'price': 9.95}, {'name': 'Masala Dosa', 'price': 10.95}])
+        self.assertEqual([item['id'] for item in items['created']], [1, 2])
+        self.assertEqual(self.client.get('/items/2').json()['price'], 10.95)
+
+        orders = [{'customer_id': 1, 'item_id': 2, 'quantity': 2, 'timestamp': 1700000000},
+                  {'customer_id': 1, 'item_id': 9, 'quantity': 1, 'timestamp': 1700000000}]
+        self.assertEqual(self.post('/orders/batch', orders, 409)['detail'], [{'index': 1, 'detail': 'Item 9 not found'}])
+        result = self.post('/orders/batch?atomic=false', orders)
+        self.assertEqual([(o['id'], o['unit_price']) for o in result['created']], [(1, 10.95)])
+        self.assertEqual(self.item_stats(), [(2, 1, 2, 21.9)])
+        self.post('/items/batch', [{'name': 'Dosa', 'price': 1}] * (self.main.MAX_BATCH_SIZE + 1), 413)
+
+    def test_customer_and_item_lists(self):
+        for index in range(5):
+            self.post('/customers', {'name': f'Customer {index}', 'phone': f'609-555-230{index}'})
+            self.post('/items', {'name': f'Dosa {index}', 'price': index})
+        for path in ('/customers?limit=2', '/items?limit=2'):
+            self.assertEqual(self.pages(path), ([1, 2, 3, 4, 5], [2, 4]))
+
+    def test_search(self):
+        self.create_menu()
+        self.post('/customers', {'name': 'Dosa Lover', 'phone': '609-555-2301'})
+        self.post('/items', {'name': 'Masala Dosa', 'price': 10.95})
+        self.create_order(notes='extra spicy')
+        self.create_order(item_id=2, notes='spicy masala')
+        result = self.client.get('/search?q=mas').json()
+        self.assertEqual(([c['id'] for c in result['customers']], [i['id'] for i in result['items']],
+                          [o['id'] for o in result['orders']]), ([], [2], [2]))
+        result = self.client.get('/search?q=dos').json()
+        self.assertEqual(([c['id'] for c in result['customers']], sorted(i['id'] for i in result['items'])), ([2], [1, 2]))
+        self.assertEqual([o['id'] for o in self.client.get('/search?q=spic+extr').json()['orders']], [1])
+        self.assertEqual(self.client.get('/search?q=%2A%22').json(), {'customers': [], 'items': [], 'orders': [], 'tickets': []})
+        self.client.put('/items/2', json={'name': 'Paper Roast', 'price': 10.95})
+        self.assertEqual(self.client.get('/search?q=masala').json()['items'], [])
+        self.assertEqual(self.client.get('/customers/by-phone/609-555-2301').json()['name'], 'Dosa Lover')
+        self.assertEqual(self.client.get('/customers/by-phone/000').status_code, 404)
+
+    def test_export(self):
+        self.create_menu()
+        self.create_order(timestamp=1700000100, notes='say "hi", thanks')
+        self.create_order(timestamp=1700000000)
+        self.create_order(timestamp=1700090000)
+        response = self.client.get('/export/orders?format=csv&to=1700086400')
+        self.assertEqual(response.headers['content-type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response.text.splitlines(), [
+            'id,customer_id,item_id,quantity,timestamp,notes,ticket_id,unit_price',
+            '2,1,1,1,1700000000,,,9.95',
+            '1,1,1,1,1700000100,"say ""hi"", thanks",,9.95',
+        ])
+        response = self.client.get('/export/orders?from=1700000100&gzip=true')
+        self.assertEqual(response.headers['content-encoding'], 'gzip')  # Decoded by the client
+        self.assertEqual([json.loads(line)['id'] for line in response.text.splitlines()], [1, 3])
+
+class TestAsyncApi(TestApi):
+    """Runs every API test again with the async handlers (DOSA_ASYNC_DB=1)."""
+
+    async_db = True
+
+class TestQueryPlanGuard(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.main = load_main(f"sqlite:///{os.path.join(self.tmpdir.name, 'db.sqlite')}", query_plan_guard=True)
+
+    def tearDown(self):
+        self.main.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def execute(self, statement):
+        with self.main.engine.connect() as conn:
+            conn.exec_driver_sql(statement).fetchall()
+
+    def test_guarded_names(self):
+        self.assertEqual(self.main.guarded_names('SELECT * FROM orders o JOIN items i ON i.id = o.item_id'), {'orders', 'o'})
+        self.assertEqual(self.main.guarded_names('SELECT * FROM orders AS orders_1 WHERE orders_1.id = 1'), {'orders', 'orders_1'})
+        self.assertEqual(self.main.guarded_names('SELECT * FROM orders WHERE id = 1'), {'orders'})
+        self.assertEqual(self.main.guarded_names('SELECT rowid FROM orders_fts'), set())
+
+    def test_fires_on_scans_and_sorts(self):
+        for statement in (
+            "SELECT * FROM orders WHERE notes = 'x'",
+            "SELECT o.id FROM orders o WHERE o.quantity > 1",
+            "SELECT * FROM orders WHERE customer_id = 1 ORDER BY id",
+            "SELECT * FROM order_lines WHERE order_id = 1 ORDER BY id",
+        ):
+            with self.assertRaises(self.main.FullScanError, msg=statement):
+                self.execute(statement)
+
+    def test_allows_index_reads(self):
+        self.execute("SELECT * FROM orders o WHERE o.customer_id = 1 ORDER BY o.timestamp, o.id")
+        self.execute("SELECT * FROM customers WHERE name = 'x'")  # Not a guarded table
+
+class TestInMemoryDatabase(unittest.TestCase):
+    """Serves the API from sqlite:///:memory:, where every session must see the same database."""
+
+    def test_sessions_share_the_database(self):
+        main = load_main('sqlite:///:memory:')
+        with TestClient(main.app) as client:
+            self.assertEqual(client.post('/customers', json={'name': 'Damodhar', 'phone': '732-555-5509'}).status_code, 200)
+            self.assertEqual(client.get('/customers/1').json()['name'], 'Damodhar')
+            self.assertEqual(client.get('/customers').json()['data'][0]['phone'], '732-555-5509')
+        main.engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,399 @@
+# benchmark.py
+
+import argparse
+import contextlib
+import fnmatch
+import importlib
+import json
+import os
+import platform
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    from scripts.generate_orders import (CUSTOMER_NAMES, MENU, SCALES, START_TIMESTAMP, customer_count, customer_phone,
+                                         generate_orders, parse_scale, write_orders)
+    from scripts.items_price_num_order import process_orders, process_orders_parallel
+    from scripts.order_batch import OrderBatch
+    from scripts.pipeline import CustomerTotalAggregator, RevenueAggregator, run_pipeline
+    from scripts.utils import iter_orders_from_file, read_orders_from_file
+    from scripts.vectorized import customer_totals_vectorized, item_revenue_vectorized
+    extract_customers = importlib.import_module('scripts.customers_phone no_name').extract_customers
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from generate_orders import (CUSTOMER_NAMES, MENU, SCALES, START_TIMESTAMP, customer_count, customer_phone,
+                                 generate_orders, parse_scale, write_orders)
+    from items_price_num_order import process_orders, process_orders_parallel
+    from order_batch import OrderBatch
+    from pipeline import CustomerTotalAggregator, RevenueAggregator, run_pipeline
+    from utils import iter_orders_from_file, read_orders_from_file
+    from vectorized import customer_totals_vectorized, item_revenue_vectorized
+    extract_customers = importlib.import_module('customers_phone no_name').extract_customers
+
+# The FastAPI application and init_db.py, which are imported from their own directory
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'Final Project', 'Dosa Restaurant Order Management API')
+
+# Requests sent to every endpoint per measurement
+DEFAULT_REQUESTS = 200
+
+# Rows per request of the batch endpoints
+BENCH_BATCH_SIZE = 100
+
+# Relative change in throughput or peak memory reported as a regression against the baseline
+DEFAULT_TOLERANCE = 0.1
+
+def pick(i, count):
+    """Spreads request i over the ids 1..count, so consecutive requests hit different rows."""
+    return 1 + (i * 7919) % count
+
+def bench_phone(area, i):
+    """Returns the i-th phone number of the customers created by the benchmark, outside the generated ones."""
+    return f'{area}-{i // 10000 % 1000:03d}-{i % 10000:04d}'
+
+def endpoint_requests(orders, customers, order_rows):
+    """Lists the requests of the endpoint benchmarks, in the order they are run.
+
+    Each entry is (name, make), where make(i, created) returns the (method, url,
+    JSON body) of the i-th request. created maps the path of every POST
+    endpoint to the ids it returned so far, which the PUT, DELETE and ticket
+    reads use; the deletes therefore come after the writes they undo.
+
+    Args:
+        orders (int): Number of generated orders.
+        customers (int): Number of customers in the database.
+        order_rows (int): Number of rows in the orders table.
+
+    Returns:
+        list: (name, make) pairs.
+    """
+    items = len(MENU)
+    span = orders * 30  # Generated timestamps are on average 30 seconds apart
+
+    def created_id(created, path, i):
+        ids = created.get(path) or [0]
+        return ids[i % len(ids)]
+
+    def order(i):
+        return {'customer_id': pick(i, customers), 'item_id': pick(i, items), 'quantity': 1 + i % 3,
+                'timestamp': START_TIMESTAMP + i, 'notes': 'benchmark'}
+
+    return [
+        ('GET /cache/items', lambda i, created: ('GET', '/cache/items', None)),
+        ('GET /customers/{id}', lambda i, created: ('GET', f'/customers/{pick(i, customers)}', None)),
+        ('GET /customers/by-phone/{phone}',
+         lambda i, created: ('GET', f'/customers/by-phone/{customer_phone(pick(i, customer_count(orders)) - 1)}', None)),
+        ('GET /customers', lambda i, created: ('GET', f'/customers?after={pick(i, customers) - 1}&limit=100', None)),
+        ('GET /items/{id}', lambda i, created: ('GET', f'/items/{pick(i, items)}', None)),
+        ('GET /items', lambda i, created: ('GET', '/items?limit=100', None)),
+        ('GET /orders/{id}', lambda i, created: ('GET', f'/orders/{pick(i, order_rows)}', None)),
+        ('GET /orders', lambda i, created: ('GET', f'/orders?after={pick(i, order_rows) - 1}&limit=100', None)),
+        ('GET /orders?customer_id', lambda i, created: ('GET', f'/orders?customer_id={pick(i, customers)}', None)),
+        ('GET /orders?from&to', lambda i, created: (
+            'GET', f'/orders?from={START_TIMESTAMP + pick(i, span)}&to={START_TIMESTAMP + pick(i, span) + 3600}', None)),
+        ('GET /analytics/items', lambda i, created: ('GET', '/analytics/items?sort=revenue&top=10', None)),
+        ('GET /analytics/sales', lambda i, created: (
+            'GET', f'/analytics/sales?from={START_TIMESTAMP}&to={START_TIMESTAMP + span}&bucket=day', None)),
+        ('GET /search', lambda i, created: ('GET', f'/search?q={CUSTOMER_NAMES[i % len(CUSTOMER_NAMES)][:3]}&limit=10', None)),
+        ('GET /export/orders', lambda i, created: (
+            'GET', f'/export/orders?from={START_TIMESTAMP + pick(i, span)}&to={START_TIMESTAMP + pick(i, span) + 3600}', None)),
+        ('POST /customers', lambda i, created: ('POST', '/customers', {'name': 'Bench', 'phone': bench_phone(100, i)})),
+        ('PUT /customers/{id}', lambda i, created: (
+            'PUT', f'/customers/{created_id(created, "/customers", i)}', {'name': 'Benched', 'phone': bench_phone(100, i)})),
+        ('POST /customers/batch', lambda i, created: ('POST', '/customers/batch', [
+            {'name': 'Bench', 'phone': bench_phone(101, i * BENCH_BATCH_SIZE + j)} for j in range(BENCH_BATCH_SIZE)])),
+        ('POST /items', lambda i, created: ('POST', '/items', {'name': f'Bench Dosa {i}', 'price': 9.95})),
+        ('PUT /items/{id}', lambda i, created: (
+            'PUT', f'/items/{created_id(created, "/items", i)}', {'name': f'Bench Dosa {i}', 'price': 10.95})),
+        ('POST /items/batch', lambda i, created: ('POST', '/items/batch', [
+            {'name': f'Bench Dosa {i}.{j}', 'price': 9.95} for j in range(BENCH_BATCH_SIZE)])),
+        ('POST /orders', lambda i, created: ('POST', '/orders', order(i))),
+        ('PUT /orders/{id}', lambda i, created: ('PUT', f'/orders/{created_id(created, "/orders", i)}', order(i + 1))),
+        ('POST /orders/batch', lambda i, created: ('POST', '/orders/batch', [
+            order(i * BENCH_BATCH_SIZE + j) for j in range(BENCH_BATCH_SIZE)])),
+        ('POST /orders/tickets', lambda i, created: ('POST', '/orders/tickets', {
+            'customer_id': pick(i, customers), 'timestamp': START_TIMESTAMP + i,
+            'items': [{'item_id': pick(i + j, items)} for j in range(1 + i % 3)]})),
+        ('GET /orders/tickets/{id}', lambda i, created: (
+            'GET', f'/orders/tickets/{created_id(created, "/orders/tickets", i)}', None)),
+        ('DELETE /orders/{id}', lambda i, created: ('DELETE', f'/orders/{created_id(created, "/orders", i)}', None)),
+        ('DELETE /customers/{id}', lambda i, created: ('DELETE', f'/customers/{created_id(created, "/customers", i)}', None)),
+        ('DELETE /items/{id}', lambda i, created: ('DELETE', f'/items/{created_id(created, "/items", i)}', None)),
+    ]
+
+def measure(run, units, memory=True):
+    """Times one call of a benchmark and measures its peak memory in a second call.
+
+    The peak is measured with tracemalloc, which slows the code down, so it
+    gets a call of its own. It counts the memory allocated through Python
+    during the call, not memory held before it or allocated by SQLite.
+
+    Args:
+        run (callable): run(call) runs the benchmark; call is 0 for the timed call and 1 for the memory one.
+        units (int): Number of orders or requests handled by one call.
+        memory (bool): Also measure the peak memory.
+
+    Returns:
+        dict: seconds, units, throughput (units per second) and peak_memory (bytes) of the benchmark.
+    """
+    start = time.perf_counter()
+    run(0)
+    seconds = time.perf_counter() - start
+    result = {'seconds': round(seconds, 6), 'units': units, 'throughput': round(units / seconds, 2) if seconds else None}
+
+    if memory:
+        tracemalloc.start()
+        try:
+            run(1)
+            result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+def script_benchmarks(orders_path, count):
+    """Lists the benchmarks of the order-processing scripts.
+
+    Args:
+        orders_path (str): Path to the generated orders file.
+        count (int): Number of orders in it.
+
+    Returns:
+        list: (name, run, units) triples for measure.
+    """
+    orders = read_orders_from_file(orders_path)
+    batch = OrderBatch.from_orders(orders)
+    return [
+        ('read_orders_from_file', lambda call: read_orders_from_file(orders_path), count),
+        ('iter_orders_from_file', lambda call: sum(1 for order in iter_orders_from_file(orders_path)), count),
+        ('extract_customers', lambda call: extract_customers(orders), count),
+        ('process_orders', lambda call: process_orders(orders), count),
+        ('extract_customers(OrderBatch)', lambda call: extract_customers(batch), count),
+        ('process_orders(OrderBatch)', lambda call: process_orders(batch), count),
+        ('process_orders(file)', lambda call: process_orders(iter_orders_from_file(orders_path)), count),
+        ('process_orders_parallel', lambda call: process_orders_parallel(orders_path), count),
+        ('item_revenue', lambda call: run_pipeline(orders, {'revenue': RevenueAggregator()}), count),
+        ('item_revenue(OrderBatch)', lambda call: item_revenue_vectorized(batch), count),
+        ('customer_totals', lambda call: run_pipeline(orders, {'totals': CustomerTotalAggregator()}), count),
+        ('customer_totals(OrderBatch)', lambda call: customer_totals_vectorized(batch), count),
+    ]
+
+def database_benchmarks(orders_path, count, workdir):
+    """Lists the benchmarks of init_db.py.
+
+    initialize_database writes db.sqlite in the current directory, so every
+    call runs in a new directory under workdir. The database of the last call
+    is left at workdir/api/db.sqlite for the endpoint benchmarks.
+
+    Args:
+        orders_path (str): Path to the generated orders file.
+        count (int): Number of orders in it.
+        workdir (str): Scratch directory.
+
+    Returns:
+        list: (name, run, units) triples for measure.
+    """
+    init_db = importlib.import_module('init_db')
+
+    def load(bulk):
+        def run(call):
+            directory = tempfile.mkdtemp(dir=workdir)
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                with contextlib.redirect_stdout(sys.stderr):  # Keep standard output for the report
+                    init_db.initialize_database(orders_path, bulk=bulk)
+            finally:
+                os.chdir(cwd)
+            os.replace(os.path.join(directory, 'db.sqlite'), os.path.join(workdir, 'api', 'db.sqlite'))
+        return run
+
+    os.makedirs(os.path.join(workdir, 'api'), exist_ok=True)
+    return [
+        ('initialize_database', load(False), count),
+        ('initialize_database(bulk)', load(True), count),
+    ]
+
+def endpoint_benchmarks(count, db_path, requests):
+    """Lists the benchmarks of the FastAPI endpoints, served in-process by TestClient.
+
+    main.py reads DATABASE_URL when it is imported, so it is imported here,
+    once the database has been loaded. Every response of the timed call with a
+    status of 400 or more counts as an error of its benchmark.
+
+    Args:
+        count (int): Number of generated orders.
+        db_path (str): Database loaded from them.
+        requests (int): Number of requests per call.
+
+    Returns:
+        tuple: The TestClient (to be used as a context manager around the benchmarks),
+        a list of (name, run, units) triples for measure, and a dict that receives
+        the error count of every benchmark run.
+    """
+    from fastapi.testclient import TestClient
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    main = importlib.import_module('main')
+    client = TestClient(main.app)
+    with sqlite3.connect(db_path) as conn:
+        customers = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0] or customer_count(count)
+        order_rows = conn.execute("SELECT MAX(id) FROM orders").fetchone()[0] or 1
+
+    created = {}
+    errors = {}
+
+    def benchmark(name, make):
+        def run(call):
+            failed = 0
+            for i in range(call * requests, (call + 1) * requests):  # The memory call sends new requests
+                method, url, body = make(i, created)
+                response = client.request(method, url, json=body)
+                if response.status_code >= 400:
+                    failed += 1
+                elif method == 'POST':
+                    data = response.json()
+                    ids = [row['id'] for row in data['created']] if 'created' in data else [data['id']]
+                    created.setdefault(url.split('?')[0], []).extend(ids)
+            if call == 0:
+                errors[name] = failed
+        return run
+
+    benchmarks = [(name, benchmark(name, make), requests) for name, make in endpoint_requests(count, customers, order_rows)]
+    return client, benchmarks, errors
+
+def uncovered_routes(names):
+    """Returns the routes of the app that no endpoint benchmark calls."""
+    main = sys.modules['main']
+    benchmarked = {name.split('?')[0] for name in names}
+    return sorted(
+        f'{method} {route.path}'
+        for route in main.app.routes if getattr(route, 'methods', None) and route.path.startswith('/')
+        and route.path not in ('/docs', '/redoc', '/openapi.json', '/docs/oauth2-redirect')
+        for method in route.methods if method != 'HEAD' and f'{method} {route.path}' not in benchmarked
+    )
+
+def compare_reports(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compares a benchmark report with a baseline report.
+
+    Args:
+        report (dict): The current report.
+        baseline (dict): A report saved from an earlier run.
+        tolerance (float): Relative change allowed before a change counts as a regression.
+
+    Returns:
+        list: (name, metric, baseline value, current value, relative change, regression) for every
+        throughput and peak_memory present in both reports.
+    """
+    changes = []
+    for name, result in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        for metric, higher_is_better in (('throughput', True), ('peak_memory', False)):
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regression = -change > tolerance if higher_is_better else change > tolerance
+            changes.append((name, metric, old, new, change, regression))
+    return changes
+
+def run_benchmarks(count, seed=0, requests=DEFAULT_REQUESTS, skip=(), memory=True, orders_path=None):
+    """Generates orders and runs every benchmark on them.
+
+    Args:
+        count (int): Number of orders to generate.
+        seed (int): Seed of the order generator.
+        requests (int): Number of requests per endpoint benchmark.
+        skip (iterable): fnmatch patterns of benchmark names to leave out.
+        memory (bool): Also measure the peak memory of every benchmark.
+        orders_path (str): Existing orders file to use instead of generated orders.
+
+    Returns:
+        dict: The report, with the run settings and a result per benchmark.
+    """
+    def wanted(name):
+        return not any(fnmatch.fnmatchcase(name, pattern) for pattern in skip)
+
+    def run_all(benchmarks):
+        for name, run, units in benchmarks:
+            if wanted(name):
+                print(f"{name} ...", file=sys.stderr, flush=True)
+                results[name] = measure(run, units, memory)
+
+    if API_DIR not in sys.path:
+        sys.path.insert(0, API_DIR)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        if orders_path is None:
+            orders_path = os.path.join(workdir, 'orders.json')
+            write_orders(generate_orders(count, seed), orders_path)
+        else:
+            count = len(read_orders_from_file(orders_path) or [])
+
+        run_all(script_benchmarks(orders_path, count))
+        database = database_benchmarks(orders_path, count, workdir)
+        if not any(wanted(name) for name, run, units in database):
+            database[-1][1](0)  # The endpoints still need a database
+        run_all(database)
+
+        client, endpoints, errors = endpoint_benchmarks(count, os.path.join(workdir, 'api', 'db.sqlite'), requests)
+        with client:
+            run_all(endpoints)
+        for name, failed in errors.items():
+            results[name]['errors'] = failed
+        for route in uncovered_routes(name for name, run, units in endpoints):
+            print(f"Warning: no benchmark for {route}", file=sys.stderr)
+
+    return {
+        'orders': count,
+        'seed': seed,
+        'requests': requests,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'async_db': os.getenv('DOSA_ASYNC_DB', '0'),
+        'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,  # Linux reports KiB
+        'results': results,
+    }
+
+def main():
+    """Main function to execute when script is run."""
+    parser = argparse.ArgumentParser(description="Benchmark the scripts, init_db.py and the API on generated orders.")
+    parser.add_argument('--scale', type=parse_scale, default=SCALES['10k'],
+                        help=f"Number of orders, e.g. {', '.join(SCALES)} or 2500 (default: 10k)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the order generator (default: 0)")
+    parser.add_argument('--orders', help="Benchmark an existing orders file instead of generated orders")
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS,
+                        help=f"Requests per endpoint benchmark (default: {DEFAULT_REQUESTS})")
+    parser.add_argument('--skip', action='append', default=[], metavar='PATTERN',
+                        help="Leave out the benchmarks matching a pattern, e.g. 'initialize_database' (repeatable)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the peak memory measurements")
+    parser.add_argument('--output', help="Write the report to this file instead of standard output")
+    parser.add_argument('--baseline', help="Compare with a report saved from an earlier run")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Relative change counted as a regression (default: {DEFAULT_TOLERANCE})")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.scale, args.seed, args.requests, args.skip, not args.no_memory, args.orders)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+        print(f"Benchmark report successfully written to '{args.output}'")
+    else:
+        print(json.dumps(report, indent=4))
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        if (baseline.get('orders'), baseline.get('requests')) != (report['orders'], report['requests']):
+            print("Warning: the baseline was run with a different scale or number of requests", file=sys.stderr)
+        changes = compare_reports(report, baseline, args.tolerance)
+        for name, metric, old, new, change, regression in changes:
+            print(f"{'REGRESSION' if regression else 'ok        '} {name} {metric}: {old} -> {new} ({change:+.1%})")
+        sys.exit(1 if any(change[-1] for change in changes) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,112 @@
+import json # Importing json module for the decoding errors of the parallel reader
 import sys # Importing sys module for command-line arguments handling
-import json # Importing json module for JSON parsing
-import re # Importing re module for regular expressions
+import argparse # Importing argparse for the command-line options
 
-def read_orders_from_file(file_path):
-    """Reads JSON orders from a specified file.
+try:
+    from scripts.incremental import update_report
+    from scripts.order_batch import OrderBatch
+    from scripts.parallel import PARALLEL_SHARD_SIZE, aggregate_file_parallel
+    from scripts.pipeline import CustomerAggregator, merge_customer_reports, run_pipeline
+    from scripts.snapshot import load_orders_cached
+    from scripts.utils import read_orders_from_file, write_json_file
+    from scripts.vectorized import extract_customers_vectorized
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from incremental import update_report
+    from order_batch import OrderBatch
+    from parallel import PARALLEL_SHARD_SIZE, aggregate_file_parallel
+    from pipeline import CustomerAggregator, merge_customer_reports, run_pipeline
+    from snapshot import load_orders_cached
+    from utils import read_orders_from_file, write_json_file
+    from vectorized import extract_customers_vectorized
+
+def extract_customers(orders):
+    """Extracts customer names and phone numbers from orders.
 
     Args:
-        file_path (str): Path to the JSON file containing orders.
+        orders (iterable): Orders (dicts), e.g. a list or a stream from iter_orders_from_file,
+            or an OrderBatch.
 
     Returns:
-        list or None: List of orders (dicts) if successful, None otherwise.
+        dict: Dictionary with phone numbers as keys and customer names as values.
     """
-    try:
-        with open(file_path, 'r') as file:
-            orders = json.load(file) # Load JSON data from file
-            return orders # Return the list of orders
-    except FileNotFoundError:
-        print(f"Error: The file '{file_path}' was not found.") # Print error message if file not found
-        return None
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from file '{file_path}': {e}") # Print error message for JSON decoding error
-        return None
+    if isinstance(orders, OrderBatch):
+        return extract_customers_vectorized(orders) # Aggregate the columns directly
 
-def extract_customers(orders):
-    """Extracts customer names and phone numbers from orders.
+    return run_pipeline(orders, {'customers': CustomerAggregator()})['customers'] # Keep the last name of every valid phone
+
+def extract_customers_parallel(file_path, workers=None, shard_size=PARALLEL_SHARD_SIZE):
+    """Extracts customers from an orders file like extract_customers, split into byte ranges over a process pool.
 
     Args:
-        orders (list): List of orders (dicts).
+        file_path (str): Path to the JSON array or NDJSON file containing orders.
+        workers (int): Number of worker processes, defaults to the CPU count.
+        shard_size (int): Bytes of the file per worker task.
 
     Returns:
-        dict: Dictionary with phone numbers as keys and customer names as values.
+        dict or None: Dictionary with phone numbers as keys and customer names as values,
+        None if the file has no orders.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        json.JSONDecodeError: If the file is malformed or truncated.
     """
-    customers = {}
-    phone_pattern = re.compile(r'^\d{3}-\d{3}-\d{4}$') # Regular expression pattern for phone number format
-    
-    for order in orders:
-        phone = order.get('phone') # Extract phone number from order
-        name = order.get('name')# Extract customer name from order
-        if phone and name and phone_pattern.match(phone):  # Check if phone and name exist and phone matches pattern
-            customers[phone] = name # Add phone number as key and customer name as value to dictionary
-    return customers
-
-def write_customers_to_file(customers, file_path):
+    return aggregate_file_parallel(file_path, CustomerAggregator, merge_customer_reports, workers, shard_size)
+
+def write_customers_to_file(customers, file_path, compact=False):
     """Writes customer data to a JSON file.
 
     Args:
         customers (dict): Dictionary with phone numbers as keys and customer names as values.
         file_path (str): Path to the output JSON file.
+        compact (bool): Write compact JSON for machine consumers instead of indented JSON.
     """
-    try:
-        with open(file_path, 'w') as file:
-            json.dump(customers, file, indent=4) # Write formatted JSON data to file
-        print(f"Customer data successfully written to '{file_path}'") # Print success message
-    except IOError as e:
-        print(f"Error writing to file '{file_path}': {e}") # Print error message if file writing fails
+    write_json_file(customers, file_path, compact, message="Customer data successfully written to '{}'")
 
 def main():
-    """Main function to execute when script is run."""
+    """Main function to execute when script is run.
+
+    An optional second argument sets the number of worker processes; values
+    above 1 use extract_customers_parallel. With --incremental only the orders
+    added since the previous --incremental run are processed.
+    """
     if len(sys.argv) < 2:
         print("Usage: python script.py <json_file_path>") # Print usage if no file path provided
         return
 
-    input_file_path = sys.argv[1]  # Get input file path from command-line arguments
+    parser = argparse.ArgumentParser(description="Write the name of every customer phone number to customers.json.")
+    parser.add_argument('json_file_path', help="Path to the JSON or NDJSON orders file")
+    parser.add_argument('workers', nargs='?', type=int, default=1, help="Number of worker processes (default: 1)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only process the orders appended since the last incremental run")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Recompute from all the orders and restart the incremental checkpoint")
+    parser.add_argument('--compact', action='store_true', help="Write compact JSON instead of indented JSON")
+    args = parser.parse_args(sys.argv[1:])
+
+    input_file_path = args.json_file_path  # Get input file path from command-line arguments
     output_file_path = 'customers.json' # Define output file name
 
-    orders = read_orders_from_file(input_file_path) # Read orders from input JSON file
+    if args.incremental or args.rebuild:
+        customers = update_report(input_file_path, output_file_path, extract_customers, merge_customer_reports, args.rebuild)
+        if customers is not None:
+            write_customers_to_file(customers, output_file_path, args.compact) # Write the updated customer data to output JSON file
+        return
+
+    if args.workers > 1:
+        try:
+            customers = extract_customers_parallel(input_file_path, args.workers) # Each worker parses its own part of the file
+        except FileNotFoundError:
+            print(f"Error: The file '{input_file_path}' was not found.")
+            customers = None
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON from file '{input_file_path}': {e}")
+            customers = None # The orders read before the error must not produce a report
+    else:
+        orders = load_orders_cached(input_file_path) # Load orders from the parsed snapshot, or parse and snapshot them
+        customers = extract_customers(orders) if orders else None # Extract customer data from orders
     
-    if orders:
-        customers = extract_customers(orders) # Extract customer data from orders
-        write_customers_to_file(customers, output_file_path) # Write customer data to output JSON file
+    if customers is not None:
+        write_customers_to_file(customers, output_file_path, args.compact) # Write customer data to output JSON file
     else:
         print("No orders found or unable to read orders from file.") # Print message if no orders found
 
@@ -0,0 +1,138 @@
+# generate_orders.py
+
+import argparse
+import random
+
+try:
+    from scripts.utils import json_dumps, write_json_stream
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from utils import json_dumps, write_json_stream
+
+# The menu and customer names of the sample data in data/items.json and data/customers.json
+MENU = {
+    'Cheese Madurai Masala Dosa': 13.95, 'Onion Chilli Masala Dosa': 11.95, 'Cheese & Onion Chilli Masala Dosa': 12.95,
+    'Onion Rava Mysore Masala Dosa': 14.95, 'Butter Masala Dosa': 12.95, 'Madurai Masala Dosa': 12.95,
+    'Sada Dosa': 9.95, 'Gun Powder Dosa': 13.95, 'Onion Chilli Rava Masala Dosa': 14.95, 'Masala Dosa': 10.95,
+    'Butter Mysore Masala Dosa': 11.95, 'Malgudi Onion Rava Masala Dosa': 14.95, 'Cheese Mysore Masala Dosa': 13.95,
+    'Ghee Roast Masala Dosa': 11.95, 'Mysore Masala Dosa': 11.95, 'Onion Rava Masala Dosa': 13.95,
+    'Onion Rava Sada Dosa': 12.95, 'Cheese Masala Dosa': 11.95, 'Paper Masala Dosa': 11.95,
+}
+CUSTOMER_NAMES = (
+    'Bhargavi', 'Bhaskara', 'Damodhar', 'Devarsh', 'Dhanush', 'Dhruvik', 'Durga', 'Jennifer', 'Karthik', 'Keith',
+    'Kunal', 'Matt', 'Mohammad', 'Mohit', 'Nimay', 'Nirmal', 'Parth', 'Pranav', 'Pranit', 'Rajkumar',
+    'Ryan', 'Sarathi', 'Saurabh', 'Shanmukhi', 'Shivrishvith', 'Sri', 'Swetha', 'Thanmayi', 'Tom', 'Venkat',
+)
+NOTES = ('', '', '', '', 'extra spicy', 'no onions', 'less oil', 'extra chutney', 'to go')
+
+# Named scale factors, from 1K to 10M orders
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000, '10m': 10000000}
+
+# Orders per distinct customer, so the customer table grows with the scale
+ORDERS_PER_CUSTOMER = 10
+
+# Maximum number of line items per order
+MAX_ITEMS_PER_ORDER = 5
+
+# Timestamp of the first order; the following ones are on average ORDER_INTERVAL seconds apart
+START_TIMESTAMP = 1700000000
+ORDER_INTERVAL = 30
+
+def parse_scale(text):
+    """Converts a scale such as '10k', '1m' or '2500' to a number of orders.
+
+    Args:
+        text (str): A name from SCALES, a number with a k or m suffix, or a plain number.
+
+    Returns:
+        int: The number of orders.
+
+    Raises:
+        argparse.ArgumentTypeError: If text is not a positive scale.
+    """
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    try:
+        count = int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid scale: '{text}'")
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"scale must be at least 1 order: '{text}'")
+    return count
+
+def customer_count(count):
+    """Returns the number of distinct customers in a generated file of count orders."""
+    return max(1, count // ORDERS_PER_CUSTOMER)
+
+def customer_phone(customer):
+    """Returns the phone number of a generated customer.
+
+    Args:
+        customer (int): Index of the customer, below 8M.
+
+    Returns:
+        str: A distinct phone number matching the \\d{3}-\\d{3}-\\d{4} pattern of the scripts.
+    """
+    return f'{200 + customer // 10000:03d}-555-{customer % 10000:04d}'
+
+def generate_orders(count, seed=0):
+    """Generates synthetic orders in the format of orders.json.
+
+    The same count and seed always give the same orders. Customers are reused
+    across orders (about ORDERS_PER_CUSTOMER each), items come from the sample
+    menu with the most popular ones ordered more often, and timestamps increase.
+
+    Args:
+        count (int): Number of orders.
+        seed (int): Seed of the random generator.
+
+    Yields:
+        dict: Orders with name, phone, items (name, price), timestamp and notes.
+    """
+    rng = random.Random(seed)
+    customers = customer_count(count)
+    menu = list(MENU.items())
+    weights = [len(menu) - index for index in range(len(menu))]  # Earlier menu entries are more popular
+    timestamp = START_TIMESTAMP
+
+    for _ in range(count):
+        customer = rng.randrange(customers)
+        items = rng.choices(menu, weights, k=rng.randint(1, MAX_ITEMS_PER_ORDER))
+        yield {
+            'name': CUSTOMER_NAMES[customer % len(CUSTOMER_NAMES)],
+            'phone': customer_phone(customer),
+            'items': [{'name': name, 'price': price} for name, price in items],
+            'timestamp': timestamp,
+            'notes': rng.choice(NOTES),
+        }
+        timestamp += rng.randrange(2 * ORDER_INTERVAL)
+
+def write_orders(orders, file_path, ndjson=False):
+    """Writes orders to a file without holding them all in memory.
+
+    Args:
+        orders (iterable): Orders (dicts), e.g. from generate_orders.
+        file_path (str): Path to the output file.
+        ndjson (bool): Write one order per line instead of a JSON array, which is what init_db.py reads.
+    """
+    with open(file_path, 'w') as file:
+        if ndjson:
+            for order in orders:
+                file.write(json_dumps(order, compact=True) + '\n')
+        else:
+            write_json_stream(orders, file, compact=True)
+
+def main():
+    """Main function to execute when script is run."""
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic orders file.")
+    parser.add_argument('output', help="Path to the orders file to write")
+    parser.add_argument('--scale', type=parse_scale, default=SCALES['10k'],
+                        help=f"Number of orders, e.g. {', '.join(SCALES)} or 2500 (default: 10k)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator (default: 0)")
+    parser.add_argument('--ndjson', action='store_true', help="Write NDJSON instead of a JSON array")
+    args = parser.parse_args()
+
+    write_orders(generate_orders(args.scale, args.seed), args.output, args.ndjson)
+    print(f"{args.scale} orders successfully written to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
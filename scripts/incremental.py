@@ -0,0 +1,232 @@
+# incremental.py
+
+import codecs
+import hashlib
+import io
+import json
+import os
+
+try:
+    from scripts.utils import decode_array_elements, json_loads, skip_whitespace
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from utils import decode_array_elements, json_loads, skip_whitespace
+
+# Bytes read from the start of a new input to tell a JSON array from NDJSON
+FORMAT_PROBE_SIZE = 1 << 12
+
+# Number of bytes just before the checkpoint offset whose hash must still match for the checkpoint to be reused
+CHECKPOINT_TAIL_SIZE = 1 << 12
+
+# Bytes of new input read and decoded at a time
+TAIL_CHUNK_SIZE = 1 << 20
+
+def checkpoint_path(output_path):
+    """Returns the path of the checkpoint kept next to a report file."""
+    return output_path + '.checkpoint'
+
+def tail_hash(file, offset):
+    """Hashes the bytes just before an offset of an open binary file.
+
+    Args:
+        file (file object): File opened in binary mode.
+        offset (int): End of the hashed range.
+
+    Returns:
+        str: Hex digest of the CHECKPOINT_TAIL_SIZE bytes (or fewer) before offset.
+    """
+    start = max(0, offset - CHECKPOINT_TAIL_SIZE)
+    file.seek(start)
+    return hashlib.sha256(file.read(offset - start)).hexdigest()
+
+def parse_array_tail(text, started, final=True):
+    """Decodes the complete elements at the start of a piece of a top-level JSON array.
+
+    Args:
+        text (str): The array from its opening '[', or from just after an element when started.
+        started (bool): Whether text starts after an element rather than at the '['.
+        final (bool): Whether text runs to the end of the file. Otherwise an element that
+            fails to decode is always taken as cut off by the end of the piece.
+
+    Returns:
+        tuple: The decoded elements and the length of text they were read from. Reading stops
+        before the closing ']' or, when the array is still being written, before an incomplete element.
+
+    Raises:
+        json.JSONDecodeError: If the array is malformed.
+    """
+    pos = 0
+    if not started:
+        pos = skip_whitespace(text, pos)
+        if pos == len(text):
+            return [], 0
+        if text[pos] != '[':
+            raise json.JSONDecodeError("Expecting '['", text, pos)
+        pos += 1
+
+    values = []
+    consumed = 0  # A new input is only checkpointed once an element has been read
+    while True:
+        batch, length, closed = decode_array_elements(text[pos:], started, final)
+        if not batch:
+            return values, consumed
+        values.extend(batch)
+        pos += length
+        consumed = pos
+        started = True
+        if closed:
+            return values, consumed
+
+def parse_ndjson_tail(text, final=True):
+    """Decodes the complete lines of a piece of an NDJSON file.
+
+    Args:
+        text (str): The file from the start of a line.
+        final (bool): Whether text runs to the end of the file. Otherwise a last line
+            without a newline is left for the next piece.
+
+    Returns:
+        tuple: The decoded values and the length of text they were read from. A last
+        line without a newline is only read if it is valid JSON.
+
+    Raises:
+        json.JSONDecodeError: If a complete line is not valid JSON.
+    """
+    values = []
+    consumed = 0
+    for line in io.StringIO(text):  # Split on '\n' only, like iter_ndjson
+        if not line.endswith('\n'):
+            if not final:
+                break  # Continued in the next piece
+            try:
+                value = json_loads(line) if line.strip() else None
+            except json.JSONDecodeError:
+                break  # Line still being written
+            if value is not None:
+                values.append(value)
+        elif line.strip():
+            values.append(json_loads(line))
+        consumed += len(line)
+    return values, consumed
+
+def read_new_orders(file_path, position=None):
+    """Reads the orders added to a file since a checkpointed position.
+
+    Only the bytes after the position are read, TAIL_CHUNK_SIZE at a time, and
+    each chunk is decoded as soon as it arrives, so the cost is proportional to
+    the new orders and the new part of the file is never held in memory. Orders still being written at the end of the
+    file are left for the next call.
+
+    Args:
+        file_path (str): Path to the JSON array or NDJSON file containing orders.
+        position (dict): Position returned by an earlier call, None to read from the start.
+
+    Returns:
+        tuple: The new orders (list of dicts) and the position after them.
+
+    Raises:
+        OSError: If the file cannot be read.
+        json.JSONDecodeError: If the new part of the file is malformed.
+    """
+    with open(file_path, 'rb') as file:
+        if position:
+            file_format, offset = position['format'], position['offset']
+        else:
+            probe = file.read(FORMAT_PROBE_SIZE).lstrip()
+            file_format, offset = ('array' if probe.startswith(b'[') else 'ndjson'), 0
+        file.seek(offset)
+        decoder = codecs.getincrementaldecoder('utf-8')()  # Holds back a character cut by a chunk boundary
+        orders = []
+        pending = ''  # Decoded text after the last complete order
+        final = False
+        while not final:
+            chunk = file.read(TAIL_CHUNK_SIZE)
+            final = len(chunk) < TAIL_CHUNK_SIZE
+            pending += decoder.decode(chunk)
+            if file_format == 'array':
+                values, consumed = parse_array_tail(pending, started=offset > 0, final=final)
+            else:
+                values, consumed = parse_ndjson_tail(pending, final)
+            orders.extend(values)
+            offset += len(pending[:consumed].encode('utf-8'))
+            pending = pending[consumed:]
+
+        return orders, {
+            'path': os.path.abspath(file_path),
+            'format': file_format,
+            'offset': offset,
+            'tail_hash': tail_hash(file, offset),
+            'orders': (position['orders'] if position else 0) + len(orders),
+        }
+
+def load_checkpoint(path, file_path):
+    """Loads a checkpoint if it still applies to the input file.
+
+    The input must be the same file, at least as long as the checkpoint offset,
+    and unchanged just before that offset; anything else (a replaced or
+    truncated input) means the report has to be rebuilt.
+
+    Args:
+        path (str): Path to the checkpoint file.
+        file_path (str): Path to the orders file.
+
+    Returns:
+        dict or None: The checkpoint, None if there is none or it does not apply.
+    """
+    try:
+        with open(path, 'rb') as file:
+            checkpoint = json_loads(file.read())
+        position = checkpoint['position']
+        if position['path'] != os.path.abspath(file_path) or os.path.getsize(file_path) < position['offset']:
+            return None
+        with open(file_path, 'rb') as file:
+            if tail_hash(file, position['offset']) != position['tail_hash']:
+                return None
+        return checkpoint
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def save_checkpoint(path, checkpoint):
+    """Writes a checkpoint atomically, so an interrupted run leaves the previous one in place.
+
+    Args:
+        path (str): Path to the checkpoint file.
+        checkpoint (dict): The position and the report at that position.
+    """
+    with open(path + '.tmp', 'w') as file:
+        json.dump(checkpoint, file)  # stdlib json keeps NaN prices, which json_dumps may write as null
+    os.replace(path + '.tmp', path)
+
+def update_report(file_path, output_path, aggregate, merge, rebuild=False):
+    """Brings a report up to date with the orders added since its last update.
+
+    The checkpoint next to output_path holds the input position reached by the
+    last update and the report at that position. Only the orders after the
+    position are aggregated, and their partial report is merged into the saved
+    one. Without a usable checkpoint, or with rebuild, every order is aggregated.
+
+    Args:
+        file_path (str): Path to the JSON array or NDJSON file containing orders.
+        output_path (str): Path of the report file the checkpoint belongs to.
+        aggregate (callable): Builds a report from a list of orders, e.g. process_orders.
+        merge (callable): merge(report, partial) returns the report of both sets of orders.
+        rebuild (bool): Ignore the checkpoint and recompute the report from all the orders.
+
+    Returns:
+        dict or None: The updated report, None if the input could not be read.
+    """
+    path = checkpoint_path(output_path)
+    checkpoint = None if rebuild else load_checkpoint(path, file_path)
+    try:
+        orders, position = read_new_orders(file_path, checkpoint and checkpoint['position'])
+    except FileNotFoundError:
+        print(f"Error: The file '{file_path}' was not found.")
+        return None
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON from file '{file_path}': {e}")
+        return None
+
+    report = aggregate(orders)
+    if checkpoint:
+        report = merge(checkpoint['report'], report)
+    save_checkpoint(path, {'position': position, 'report': report})
+    return report
@@ -1,77 +1,147 @@
+import json  # Importing json module for the decoding errors of the parallel reader
 import sys  # Importing sys module for command-line arguments handling
-import json  # Importing json module for JSON parsing
+import argparse  # Importing argparse for the command-line options
 from collections import defaultdict  # Importing defaultdict for easy handling of item data
 
-def read_orders_from_file(file_path):
-    """Reads JSON orders from a specified file.
+try:
+    from scripts.incremental import update_report
+    from scripts.order_batch import OrderBatch
+    from scripts.parallel import PARALLEL_SHARD_SIZE, aggregate_file_parallel
+    from scripts.pipeline import ItemAggregator, run_pipeline
+    from scripts.snapshot import load_orders_cached
+    from scripts.utils import read_orders_from_file, write_json_file
+    from scripts.vectorized import process_orders_vectorized
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from incremental import update_report
+    from order_batch import OrderBatch
+    from parallel import PARALLEL_SHARD_SIZE, aggregate_file_parallel
+    from pipeline import ItemAggregator, run_pipeline
+    from snapshot import load_orders_cached
+    from utils import read_orders_from_file, write_json_file
+    from vectorized import process_orders_vectorized
+
+def process_orders(orders):
+    """Processes orders to extract item names, prices, and count orders.
 
     Args:
-        file_path (str): Path to the JSON file containing orders.
+        orders (iterable): Orders (dicts), e.g. a list or a stream from iter_orders_from_file,
+            or an OrderBatch.
 
     Returns:
-        list or None: List of orders (dicts) if successful, None otherwise.
+        dict: Dictionary with item names as keys and nested dictionaries with 'price' and 'orders' as values.
     """
-    try:
-        with open(file_path, 'r') as file:
-            orders = json.load(file)  # Load JSON data from file
-            return orders  # Return the list of orders
-    except FileNotFoundError:
-        print(f"Error: The file '{file_path}' was not found.")  # Print error message if file not found
-        return None
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from file '{file_path}': {e}")  # Print error message for JSON decoding error
-        return None
+    if isinstance(orders, OrderBatch):
+        return process_orders_vectorized(orders)  # Aggregate the columns directly
 
-def process_orders(orders):
-    """Processes orders to extract item names, prices, and count orders.
+    return run_pipeline(orders, {'items': ItemAggregator()})['items']  # Count the items of every order
+
+def merge_item_partials(items, partial):
+    """Merges a partial item table into the running totals.
+
+    Partials must be merged in the order of their shards: order counts add up,
+    and the price of a later shard overrides an earlier one, which is the same
+    last-seen price the serial loop keeps.
+
+    Args:
+        items (dict): Running item table, updated in place.
+        partial (dict): Partial item table of the orders that follow.
+    """
+    for item_name, data in partial.items():
+        items[item_name]['price'] = data['price']  # Later shard wins, like the serial loop
+        items[item_name]['orders'] += data['orders']  # Counts are additive
+
+def process_orders_parallel(file_path, workers=None, shard_size=PARALLEL_SHARD_SIZE):
+    """Processes an orders file like process_orders, split into byte ranges over a process pool.
+
+    Every worker parses its own shard of the file and sends back only its
+    partial item table. The result is identical to process_orders, including
+    the key order.
 
     Args:
-        orders (list): List of orders (dicts).
+        file_path (str): Path to the JSON array or NDJSON file containing orders.
+        workers (int): Number of worker processes, defaults to the CPU count.
+        shard_size (int): Bytes of the file per worker task.
 
     Returns:
-        dict: Dictionary with item names as keys and nested dictionaries with 'price' and 'orders' as values.
+        dict or None: Dictionary with item names as keys and nested dictionaries with 'price' and 'orders'
+        as values, None if the file has no orders.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        json.JSONDecodeError: If the file is malformed or truncated.
     """
-    items = defaultdict(lambda: {'price': 0, 'orders': 0})  # Initialize defaultdict with nested structure
+    return aggregate_file_parallel(file_path, ItemAggregator, merge_item_reports, workers, shard_size)
 
-    for order in orders:
-        for item in order.get('items', []):  # Iterate over items in each order
-            item_name = item.get('name')  # Extract item name
-            item_price = item.get('price')  # Extract item price
+def merge_item_reports(items, partial):
+    """Merges the item table of newer orders into an earlier item table.
+
+    Args:
+        items (dict): Item table of the earlier orders, e.g. loaded from a checkpoint.
+        partial (dict): Item table of the newer orders.
 
-            if item_name and item_price:
-                items[item_name]['price'] = item_price  # Set item price in defaultdict
-                items[item_name]['orders'] += 1  # Increment order count for the item
-    
+    Returns:
+        dict: Item table of all the orders, in the format of process_orders.
+    """
+    items = defaultdict(lambda: {'price': 0, 'orders': 0}, items)
+    merge_item_partials(items, partial)
     return items
 
-def write_items_to_file(items, file_path):
+def write_items_to_file(items, file_path, compact=False):
     """Writes item data to a JSON file.
 
     Args:
         items (dict): Dictionary with item names as keys and nested dictionaries with 'price' and 'orders' as values.
         file_path (str): Path to the output JSON file.
+        compact (bool): Write compact JSON for machine consumers instead of indented JSON.
     """
-    try:
-        with open(file_path, 'w') as file:
-            json.dump(items, file, indent=4)  # Write formatted JSON data to file with indentation
-        print(f"Item data successfully written to '{file_path}'")  # Print success message
-    except IOError as e:
-        print(f"Error writing to file '{file_path}': {e}")  # Print error message if file writing fails
+    write_json_file(items, file_path, compact, message="Item data successfully written to '{}'")
 
 def main():
-    """Main function to execute when script is run."""
+    """Main function to execute when script is run.
+
+    An optional second argument sets the number of worker processes; values
+    above 1 use process_orders_parallel. With --incremental only the orders
+    added since the previous --incremental run are processed.
+    """
     if len(sys.argv) < 2:
         print("Usage: python script.py <json_file_path>")  # Print usage if no file path provided
         return
 
-    input_file_path = sys.argv[1]  # Get input file path from command-line arguments
+    parser = argparse.ArgumentParser(description="Write the price and order count of every item to items.json.")
+    parser.add_argument('json_file_path', help="Path to the JSON or NDJSON orders file")
+    parser.add_argument('workers', nargs='?', type=int, default=1, help="Number of worker processes (default: 1)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only process the orders appended since the last incremental run")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Recompute from all the orders and restart the incremental checkpoint")
+    parser.add_argument('--compact', action='store_true', help="Write compact JSON instead of indented JSON")
+    args = parser.parse_args(sys.argv[1:])
+
+    input_file_path = args.json_file_path  # Get input file path from command-line arguments
     output_file_path = 'items.json'  # Define output file name
+    workers = args.workers  # Optional number of worker processes
+
+    if args.incremental or args.rebuild:
+        items = update_report(input_file_path, output_file_path, process_orders, merge_item_reports, args.rebuild)
+        if items is not None:
+            write_items_to_file(items, output_file_path, args.compact)  # Write the updated item data to output JSON file
+        return
+
+    if workers > 1:
+        try:
+            items = process_orders_parallel(input_file_path, workers)  # Each worker parses its own part of the file
+        except FileNotFoundError:
+            print(f"Error: The file '{input_file_path}' was not found.")
+            items = None
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON from file '{input_file_path}': {e}")
+            items = None  # The orders read before the error must not produce a report
+    else:
+        orders = load_orders_cached(input_file_path)  # Load orders from the parsed snapshot, or parse and snapshot them
+        items = process_orders(orders) if orders else None  # Process orders to extract item data
 
-    orders = read_orders_from_file(input_file_path)  # Read orders from input JSON file
-    
-    if orders:
-        items = process_orders(orders)  # Process orders to extract item data
-        write_items_to_file(items, output_file_path)  # Write processed item data to output JSON file
+    if items is not None:
+        write_items_to_file(items, output_file_path, args.compact)  # Write processed item data to output JSON file
     else:
         print("No orders found or unable to read orders from file.")  # Print message if no orders found
 
@@ -0,0 +1,450 @@
+# load_generator.py
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+try:
+    from scripts.benchmark import API_DIR, bench_phone
+    from scripts.generate_orders import SCALES, START_TIMESTAMP, generate_orders, parse_scale, write_orders
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from benchmark import API_DIR, bench_phone
+    from generate_orders import SCALES, START_TIMESTAMP, generate_orders, parse_scale, write_orders
+
+# Method and route of every operation of the request mix
+OPERATIONS = {
+    f'{action}_{resource}': (method, f'/{resource}s' + ('' if action == 'create' else '/{id}'))
+    for resource in ('customer', 'item', 'order')
+    for action, method in (('read', 'GET'), ('create', 'POST'), ('update', 'PUT'), ('delete', 'DELETE'))
+}
+
+# Relative weight of every operation in the default mix, mostly reads and new orders
+DEFAULT_MIX = {
+    'read_customer': 15, 'read_item': 15, 'read_order': 20, 'create_order': 20, 'update_order': 5, 'delete_order': 5,
+    'create_customer': 5, 'update_customer': 5, 'delete_customer': 2, 'create_item': 3, 'update_item': 3, 'delete_item': 2,
+}
+
+# Seconds allowed for the server to start, which includes upgrading the schema of a large database
+SERVER_START_TIMEOUT = 300
+
+# Seconds before a request counts as failed
+REQUEST_TIMEOUT = 30
+
+def parse_mix(text):
+    """Parses a request mix such as 'read_order=80,create_order=20'.
+
+    Args:
+        text (str): Comma-separated operation=weight pairs, operations from OPERATIONS.
+
+    Returns:
+        dict: Operation -> weight.
+
+    Raises:
+        argparse.ArgumentTypeError: If an operation is unknown or no weight is positive.
+    """
+    mix = {}
+    for entry in filter(None, (entry.strip() for entry in text.split(','))):
+        operation, _, weight = entry.partition('=')
+        if operation not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation '{operation}' (choose from {', '.join(OPERATIONS)})")
+        try:
+            mix[operation] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid weight: '{entry}'")
+        if mix[operation] < 0:
+            raise argparse.ArgumentTypeError(f"weights cannot be negative: '{entry}'")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one operation with a positive weight")
+    return mix
+
+def percentile(values, fraction):
+    """Returns the nearest-rank percentile of a sorted list."""
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+class LoadState:
+    """The rows the load test can address, shared by all its clients.
+
+    Reads go to the loaded rows. Updates and deletes go to the rows created
+    during the run, so they never collide with the orders that refer to the
+    loaded customers and items; when there is none to update or delete yet,
+    the operation becomes a create of the same resource. All clients run in
+    one event loop, so no locking is needed.
+    """
+
+    def __init__(self, customers, items, orders):
+        self.counts = {'customer': customers, 'item': items, 'order': orders}
+        self.created = {'customer': [], 'item': [], 'order': []}  # Ids returned by the creates, oldest first
+        self.phones = {}  # Id of each created customer -> its phone
+        self.next_phone = 0
+
+    def body(self, resource, rng, id=None):
+        """Returns the JSON body of a create or update."""
+        if resource == 'customer':
+            if id is None:
+                self.next_phone += 1
+                return {'name': 'Load', 'phone': bench_phone(102, self.next_phone)}
+            return {'name': 'Loaded', 'phone': self.phones[id]}
+        if resource == 'item':
+            return {'name': f'Load Dosa {rng.randrange(1 << 30)}', 'price': round(rng.uniform(5, 15), 2)}
+        return {'customer_id': rng.randint(1, self.counts['customer']), 'item_id': rng.randint(1, self.counts['item']),
+                'quantity': rng.randint(1, 3), 'timestamp': START_TIMESTAMP + rng.randrange(86400 * 365), 'notes': 'load test'}
+
+    def request(self, operation, rng):
+        """Builds the next request of an operation.
+
+        Args:
+            operation (str): Operation from OPERATIONS.
+            rng (random.Random): Random generator of the client.
+
+        Returns:
+            tuple: The operation actually run, method, URL and JSON body of the request.
+        """
+        action, resource = operation.split('_')
+        created = self.created[resource]
+        if action in ('update', 'delete') and not created:
+            action = 'create'
+        operation = f'{action}_{resource}'
+        if action == 'read':
+            return operation, 'GET', f'/{resource}s/{rng.randint(1, self.counts[resource])}', None
+        if action == 'create':
+            return operation, 'POST', f'/{resource}s', self.body(resource, rng)
+        if action == 'update':
+            id = rng.choice(created)
+            return operation, 'PUT', f'/{resource}s/{id}', self.body(resource, rng, id)
+        id = created.pop(rng.randrange(len(created)))  # Taken now, so no other client deletes it too
+        return operation, 'DELETE', f'/{resource}s/{id}', None
+
+    def record(self, operation, response):
+        """Remembers the id of a created row, so later updates and deletes can address it."""
+        action, resource = operation.split('_')
+        if action == 'create':
+            row = response.json()
+            self.created[resource].append(row['id'])
+            if resource == 'customer':
+                self.phones[row['id']] = row['phone']
+
+class LoadStats:
+    """Latencies and statuses of the requests of a load test, per route."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def add(self, route, latency, status):
+        self.latencies[route].append(latency)
+        self.statuses[route][status] += 1
+
+    def report(self, elapsed):
+        """Summarizes the requests of a run.
+
+        Args:
+            elapsed (float): Duration of the run in seconds.
+
+        Returns:
+            dict: Totals and, per route, the number of requests, throughput, error rate,
+            status counts and latency percentiles (ms).
+        """
+        routes = {}
+        for route in sorted(self.latencies):
+            latencies = sorted(self.latencies[route])
+            errors = sum(count for status, count in self.statuses[route].items()
+                         if isinstance(status, str) or status >= 400)  # Connection errors are recorded by name
+            routes[route] = {
+                'requests': len(latencies),
+                'throughput': round(len(latencies) / elapsed, 2),
+                'errors': errors,
+                'error_rate': round(errors / len(latencies), 4),
+                'statuses': {str(status): count for status, count in sorted(self.statuses[route].items(), key=str)},
+                **{name: round(percentile(latencies, fraction) * 1000, 3)
+                   for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+            }
+        requests = sum(route['requests'] for route in routes.values())
+        errors = sum(route['errors'] for route in routes.values())
+        return {
+            'elapsed': round(elapsed, 3),
+            'requests': requests,
+            'throughput': round(requests / elapsed, 2) if elapsed else None,
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else None,
+            'routes': routes,
+        }
+
+async def send(client, state, stats, operation, rng, start=None):
+    """Sends one request of an operation and records its latency.
+
+    Args:
+        client (httpx.AsyncClient): Keep-alive client to send it with.
+        state (LoadState): Rows the request can address.
+        stats (LoadStats): Where the latency and status go.
+        operation (str): Operation from OPERATIONS.
+        rng (random.Random): Random generator for the ids and bodies.
+        start (float): perf_counter() time the latency is measured from, default now. The open loop
+            passes the scheduled time, so the time spent waiting for a free client counts.
+    """
+    operation, method, url, body = state.request(operation, rng)
+    route = '{} {}'.format(*OPERATIONS[operation])
+    start = time.perf_counter() if start is None else start
+    try:
+        response = await client.request(method, url, json=body)
+        status = response.status_code
+        if status < 400:
+            state.record(operation, response)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    stats.add(route, time.perf_counter() - start, status)
+
+def new_client(base_url):
+    """Returns an HTTP client that keeps one connection to the server alive."""
+    return httpx.AsyncClient(base_url=base_url, timeout=REQUEST_TIMEOUT,
+                             limits=httpx.Limits(max_connections=1, max_keepalive_connections=1))
+
+async def closed_loop(base_url, state, mix, clients, duration, seed=0):
+    """Runs a closed-loop load test: every client sends its next request as soon as the last one returns.
+
+    Args:
+        base_url (str): URL of the server.
+        state (LoadState): Rows the requests can address.
+        mix (dict): Operation -> weight.
+        clients (int): Number of concurrent clients.
+        duration (float): Seconds to run for.
+        seed (int): Seed of the clients' random generators.
+
+    Returns:
+        tuple: The LoadStats of the run and its duration.
+    """
+    stats = LoadStats()
+    operations, weights = list(mix), list(mix.values())
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def run_client(index):
+        rng = random.Random(seed * 100003 + index)
+        async with new_client(base_url) as client:
+            while time.perf_counter() < deadline:
+                await send(client, state, stats, rng.choices(operations, weights)[0], rng)
+
+    await asyncio.gather(*(run_client(index) for index in range(clients)))
+    return stats, time.perf_counter() - start
+
+async def open_loop(base_url, state, mix, clients, rate, duration, seed=0):
+    """Runs an open-loop load test: requests arrive at a fixed rate, whether or not the earlier ones returned.
+
+    Each request is sent by the next free client; when all of them are busy it
+    waits for one. Its latency is measured from its scheduled arrival time, so
+    the server falling behind shows up as growing latency instead of a lower
+    request rate.
+
+    Args:
+        base_url (str): URL of the server.
+        state (LoadState): Rows the requests can address.
+        mix (dict): Operation -> weight.
+        clients (int): Number of keep-alive clients (connections).
+        rate (float): Requests per second.
+        duration (float): Seconds during which requests arrive.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        tuple: The LoadStats of the run and its duration, until the last response.
+    """
+    stats = LoadStats()
+    operations, weights = list(mix), list(mix.values())
+    rng = random.Random(seed)
+    idle = asyncio.Queue()
+    async with contextlib.AsyncExitStack() as stack:
+        for _ in range(clients):
+            idle.put_nowait(await stack.enter_async_context(new_client(base_url)))
+
+        async def arrive(scheduled, operation):
+            client = await idle.get()
+            try:
+                await send(client, state, stats, operation, rng, scheduled)
+            finally:
+                idle.put_nowait(client)
+
+        start = time.perf_counter()
+        tasks = []
+        for index in range(int(rate * duration)):
+            scheduled = start + index / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(arrive(scheduled, rng.choices(operations, weights)[0])))
+        await asyncio.gather(*tasks)
+    return stats, time.perf_counter() - start
+
+def free_port():
+    """Returns a TCP port on localhost that is not in use."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def prepare_database(workdir, count, seed=0, database=None):
+    """Creates the database the server under test runs on.
+
+    Args:
+        workdir (str): Scratch directory for the database.
+        count (int): Number of orders to generate and bulk-load.
+        seed (int): Seed of the order generator.
+        database (str): Existing database to copy instead, so the run does not change it.
+
+    Returns:
+        str: Path to the database.
+    """
+    db_path = os.path.join(workdir, 'db.sqlite')
+    if database:
+        shutil.copyfile(database, db_path)
+        return db_path
+
+    if API_DIR not in sys.path:
+        sys.path.insert(0, API_DIR)
+    init_db = importlib.import_module('init_db')
+    orders_path = os.path.join(workdir, 'orders.json')
+    write_orders(generate_orders(count, seed), orders_path)
+    with contextlib.redirect_stdout(sys.stderr):  # Keep standard output for the report
+        init_db.bulk_load_database(orders_path, db_path)
+    os.remove(orders_path)
+    return db_path
+
+@contextlib.contextmanager
+def run_server(db_path, workers=1):
+    """Serves main.py with uvicorn on localhost for the duration of the block.
+
+    Args:
+        db_path (str): Database to serve.
+        workers (int): Number of uvicorn worker processes.
+
+    Yields:
+        str: Base URL of the server, once it answers requests.
+
+    Raises:
+        RuntimeError: If the server exits or does not answer within SERVER_START_TIMEOUT seconds.
+    """
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=API_DIR, env=env,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            try:
+                httpx.get(f'{base_url}/cache/items', timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"uvicorn did not answer within {SERVER_START_TIMEOUT}s")
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+def run_load_test(count, mix=None, mode='closed', clients=50, rate=None, duration=30, workers=1, seed=0, database=None):
+    """Starts the API on a loaded database and drives a request mix against it.
+
+    Args:
+        count (int): Number of orders to generate and load (ignored with database).
+        mix (dict): Operation -> weight, default DEFAULT_MIX.
+        mode (str): 'closed' or 'open' (see closed_loop and open_loop).
+        clients (int): Number of concurrent keep-alive clients.
+        rate (float): Requests per second of the open loop.
+        duration (float): Seconds to run for.
+        workers (int): Number of uvicorn worker processes.
+        seed (int): Seed of the order generator and of the request mix.
+        database (str): Existing database to run on (a copy of it) instead of generated orders.
+
+    Returns:
+        dict: The report: the settings, totals and per-route latency percentiles, throughput and error rates.
+    """
+    mix = mix or DEFAULT_MIX
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = prepare_database(workdir, count, seed, database)
+        with sqlite3.connect(db_path) as conn:
+            state = LoadState(*(conn.execute(f"SELECT COALESCE(MAX(id), 1) FROM {table}").fetchone()[0]
+                                for table in ('customers', 'items', 'orders')))
+
+        with run_server(db_path, workers) as base_url:
+            if mode == 'open':
+                stats, elapsed = asyncio.run(open_loop(base_url, state, mix, clients, rate, duration, seed))
+            else:
+                stats, elapsed = asyncio.run(closed_loop(base_url, state, mix, clients, duration, seed))
+
+    settings = {
+        'mode': mode,
+        'clients': clients,
+        'rate': rate if mode == 'open' else None,
+        'duration': duration,
+        'workers': workers,
+        'orders': None if database else count,
+        'seed': seed,
+        'async_db': os.getenv('DOSA_ASYNC_DB', '0'),
+        'mix': mix,
+    }
+    return {**settings, **stats.report(elapsed)}
+
+def format_report(report):
+    """Formats the per-route results of a load test as a table."""
+    lines = [f"{'route':28} {'requests':>9} {'req/s':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    rows = list(report['routes'].items()) + [('total', report)]
+    for route, result in rows:
+        if route == 'total':
+            lines.append(f"{route:28} {result['requests']:>9} {result['throughput'] or 0:>9.1f} {result['error_rate'] or 0:>7.2%}")
+        else:
+            lines.append(f"{route:28} {result['requests']:>9} {result['throughput']:>9.1f} {result['error_rate']:>7.2%} "
+                         f"{result['p50']:>9.1f} {result['p95']:>9.1f} {result['p99']:>9.1f} {result['max']:>9.1f}")
+    return '\n'.join(lines)
+
+def main():
+    """Main function to execute when script is run."""
+    parser = argparse.ArgumentParser(description="Load-test the API under uvicorn on localhost.")
+    parser.add_argument('--mode', choices=('closed', 'open'), default='closed',
+                        help="closed: each client waits for its response; open: requests arrive at --rate (default: closed)")
+    parser.add_argument('--clients', type=int, default=50, help="Number of concurrent keep-alive clients (default: 50)")
+    parser.add_argument('--rate', type=float, default=100, help="Requests per second in open mode (default: 100)")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run for (default: 30)")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="Weighted operations, e.g. 'read_order=80,create_order=20' (default: a mostly-read CRUD mix)")
+    parser.add_argument('--workers', type=int, default=1, help="Number of uvicorn worker processes (default: 1)")
+    parser.add_argument('--scale', type=parse_scale, default=SCALES['10k'],
+                        help=f"Number of orders loaded before the test, e.g. {', '.join(SCALES)} (default: 10k)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the orders and of the request mix (default: 0)")
+    parser.add_argument('--database', help="Run on a copy of an existing database instead of generated orders")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of standard output")
+    args = parser.parse_args()
+
+    report = run_load_test(args.scale, args.mix, args.mode, args.clients, args.rate, args.duration,
+                           args.workers, args.seed, args.database)
+    print(format_report(report), file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+        print(f"Load test report successfully written to '{args.output}'")
+    else:
+        print(json.dumps(report, indent=4))
+
+if __name__ == "__main__":
+    main()
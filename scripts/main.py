@@ -1,25 +1,67 @@
 # scripts/main.py
 
-from scripts.read_orders import read_orders_from_file
-from scripts.customers_phone_no_name import extract_customers, write_customers_to_file
-from scripts.items_price_num_order import process_orders, write_items_to_file
+import argparse
+import os
+
+from scripts.incremental import update_report
+from scripts.items_price_num_order import merge_item_reports
+from scripts.order_batch import OrderBatch
+from scripts.pipeline import CustomerAggregator, ItemAggregator, merge_customer_reports, run_pipeline
+from scripts.snapshot import load_orders_cached
+from scripts.utils import write_json_file
+from scripts.vectorized import extract_customers_vectorized, np, process_orders_vectorized
+
+# How the partial report of newly appended orders is merged into each saved report
+REPORT_MERGES = {'customers': merge_customer_reports, 'items': merge_item_reports}
+
+def build_reports(orders):
+    """Builds the customers and items reports in a single pass over the orders.
+
+    The orders of an OrderBatch are never traversed one by one: each report is
+    computed with NumPy from its own columns (phone and name, or the item
+    columns). Any other iterable of orders goes through run_pipeline once.
+
+    Args:
+        orders (iterable): Orders (dicts) or an OrderBatch.
+
+    Returns:
+        dict: The 'customers' and 'items' reports.
+    """
+    if isinstance(orders, OrderBatch) and np is not None:
+        return {'customers': extract_customers_vectorized(orders), 'items': process_orders_vectorized(orders)}
+    return run_pipeline(orders, {'customers': CustomerAggregator(), 'items': ItemAggregator()})
+
+def merge_reports(reports, partial):
+    """Merges the reports of newly appended orders into the saved reports."""
+    return {name: merge(reports[name], partial[name]) for name, merge in REPORT_MERGES.items()}
 
 def main():
     input_file_path = 'IS-601-midterm-project/data/orders.json'  
     output_customers_path = 'IS-601-midterm-project/data/customers.json'
     output_items_path = 'IS-601-midterm-project/data/items.json'
+    # Both reports share one checkpoint, so the appended orders are read once
+    reports_path = os.path.join(os.path.dirname(output_items_path), 'reports.json')
 
-    # Read orders from file
-    orders = read_orders_from_file(input_file_path)
+    parser = argparse.ArgumentParser(description="Write customers.json and items.json from orders.json.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only process the orders appended since the last incremental run")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Recompute from all the orders and restart the incremental checkpoint")
+    parser.add_argument('--compact', action='store_true', help="Write compact JSON instead of indented JSON")
+    args = parser.parse_args()
 
-    if orders:
-        # Extract customers and write to customers.json
-        customers = extract_customers(orders)
-        write_customers_to_file(customers, output_customers_path)
+    if args.incremental or args.rebuild:
+        # Merge the orders added since the checkpoint into the saved reports
+        reports = update_report(input_file_path, reports_path, build_reports, merge_reports, args.rebuild)
+    else:
+        # Load the orders, from the parsed snapshot when the file has not changed since the last run
+        orders = load_orders_cached(input_file_path)
+        reports = build_reports(orders) if orders else None
 
-        # Process orders and write to items.json
-        items = process_orders(orders)
-        write_items_to_file(items, output_items_path)
+    if reports is not None:
+        # Write customers.json and items.json
+        write_json_file(reports['customers'], output_customers_path, args.compact)
+        write_json_file(reports['items'], output_items_path, args.compact)
     else:
         print("No orders found or unable to read orders from file.")
 
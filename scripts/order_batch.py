@@ -0,0 +1,191 @@
+# order_batch.py
+
+import sys
+from array import array
+
+# Fields stored per order and per line item as codes into the value table
+ORDER_FIELDS = ('name', 'phone', 'notes')
+ITEM_FIELDS = ('name', 'price')
+
+# Keys of an order and of a line item, in the order of the orders file format; orders and items
+# with other keys, or these in another order, also get an entry in order_layouts or item_layouts
+ORDER_KEYS = ('name', 'phone', 'items', 'timestamp', 'notes')
+ITEM_KEYS = ('name', 'price')
+
+# Code stored for a field the order (or item) does not have
+MISSING = -1
+
+# Timestamps are nearly all distinct, so they are stored as plain int64 instead of codes;
+# these two reserved values mark an absent timestamp and one that is not an int
+MISSING_TIMESTAMP = -(1 << 63)
+OTHER_TIMESTAMP = MISSING_TIMESTAMP + 1
+
+class OrderBatch:
+    """Parsed orders stored column-wise, with every distinct value kept once.
+
+    Each order field and each item field is an array of 4-byte codes into a
+    shared table of distinct values (strings are also interned), except for the
+    timestamps, which are an int64 array. The items of order i are the positions
+    item_offsets[i]:item_offsets[i + 1] of the item columns. A batch holds
+    millions of orders in a fraction of the memory of the equivalent list of
+    dicts, and iterating over it yields those dicts again, so it can be passed
+    to anything that takes an iterable of orders.
+
+    The fields of the orders file format (name, phone, items with name and
+    price, timestamp and notes) are stored in the columns. An order or item
+    with any other keys, or with its keys in another order, also has a layout:
+    its keys in order and the values of the keys outside the columns, so it is
+    rebuilt exactly as it was read.
+    """
+
+    __slots__ = ('values', 'value_codes', 'order_columns', 'timestamps', 'other_timestamps', 'item_offsets', 'item_columns',
+                 'order_layouts', 'item_layouts')
+
+    def __init__(self):
+        self.values = []  # Distinct values, indexed by code
+        self.value_codes = {}  # (type, value) -> code, so 1, 1.0 and True stay distinct
+        self.order_columns = {field: array('i') for field in ORDER_FIELDS}
+        self.timestamps = array('q')
+        self.other_timestamps = {}  # Order index -> timestamp that is not an int (or out of range)
+        self.item_offsets = array('q', [0])
+        self.item_columns = {field: array('i') for field in ITEM_FIELDS}
+        self.order_layouts = {}  # Order index -> (keys, {key: value} for the keys outside the columns)
+        self.item_layouts = {}  # Item position -> (keys, {key: value} for the keys outside the columns)
+
+    @classmethod
+    def from_orders(cls, orders):
+        """Builds a batch from orders.
+
+        Args:
+            orders (iterable): Orders (dicts), e.g. a list or a stream from iter_orders_from_file.
+
+        Returns:
+            OrderBatch: The orders in columnar form.
+        """
+        batch = cls()
+        batch.extend(orders)
+        return batch
+
+    def encode(self, value):
+        """Returns the code of a value, adding it to the value table if needed.
+
+        Args:
+            value: A JSON value; lists and objects are stored once per occurrence.
+
+        Returns:
+            int: The code of the value.
+        """
+        key = (type(value), value)
+        try:
+            code = self.value_codes.get(key)
+        except TypeError:  # A list or an object
+            self.values.append(value)
+            return len(self.values) - 1
+        if code is None:
+            code = self.value_codes[key] = len(self.values)
+            self.values.append(sys.intern(value) if type(value) is str else value)
+        return code
+
+    def extend(self, orders):
+        """Appends orders to the batch.
+
+        Args:
+            orders (iterable): Orders (dicts).
+        """
+        encode = self.encode
+        order_columns = [(field, self.order_columns[field].append) for field in ORDER_FIELDS]
+        item_columns = [(field, self.item_columns[field].append) for field in ITEM_FIELDS]
+        item_count = len(self.item_columns[ITEM_FIELDS[0]])
+        add_offset = self.item_offsets.append
+        add_timestamp = self.timestamps.append
+        other_timestamps = self.other_timestamps
+        order_layouts = self.order_layouts
+        item_layouts = self.item_layouts
+
+        for order in orders:
+            index = len(self.timestamps)
+            keys = tuple(order)
+            if keys != ORDER_KEYS:
+                order_layouts[index] = (keys, {key: order[key] for key in keys if key not in ORDER_KEYS})
+            for field, append in order_columns:
+                append(encode(order[field]) if field in order else MISSING)
+            if 'timestamp' not in order:
+                timestamp = MISSING_TIMESTAMP
+            else:
+                timestamp = order['timestamp']
+                if type(timestamp) is not int or not OTHER_TIMESTAMP < timestamp < 1 << 63:
+                    other_timestamps[index] = timestamp
+                    timestamp = OTHER_TIMESTAMP
+            add_timestamp(timestamp)
+            items = order.get('items', [])
+            first_item = item_count
+            regular = type(items) is list
+            for item in items if regular else ():
+                if type(item) is not dict:
+                    regular = False
+                    break
+                item_keys = tuple(item)
+                if item_keys != ITEM_KEYS:
+                    item_layouts[item_count] = (item_keys, {key: item[key] for key in item_keys if key not in ITEM_KEYS})
+                for field, append in item_columns:
+                    append(encode(item[field]) if field in item else MISSING)
+                item_count += 1
+            if not regular:  # Items that are not a list of objects are kept whole in the layout
+                for column in self.item_columns.values():
+                    del column[first_item:]
+                for position in range(first_item, item_count):
+                    item_layouts.pop(position, None)
+                item_count = first_item
+                order_layouts[index] = (keys, {key: order[key] for key in keys if key not in ORDER_KEYS or key == 'items'})
+            add_offset(item_count)
+
+    def __len__(self):
+        return len(self.item_offsets) - 1
+
+    def __getitem__(self, index):
+        """Rebuilds one order as a dict.
+
+        Args:
+            index (int): Position of the order in the batch.
+
+        Returns:
+            dict: The order, with the fields it was stored with.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("order index out of range")
+
+        values = self.values
+        columns = self.order_columns
+        order = {}
+        for field in ('name', 'phone'):
+            code = columns[field][index]
+            if code != MISSING:
+                order[field] = values[code]
+        order['items'] = items = [
+            {field: values[code] for field in ITEM_FIELDS if (code := self.item_columns[field][position]) != MISSING}
+            for position in range(self.item_offsets[index], self.item_offsets[index + 1])
+        ]
+        if self.item_layouts:
+            first = self.item_offsets[index]
+            for k, item in enumerate(items):
+                if first + k in self.item_layouts:
+                    keys, extras = self.item_layouts[first + k]
+                    items[k] = {key: extras[key] if key in extras else item[key] for key in keys}
+        timestamp = self.timestamps[index]
+        if timestamp == OTHER_TIMESTAMP:
+            order['timestamp'] = self.other_timestamps[index]
+        elif timestamp != MISSING_TIMESTAMP:
+            order['timestamp'] = timestamp
+        code = columns['notes'][index]
+        if code != MISSING:
+            order['notes'] = values[code]
+        if index in self.order_layouts:
+            keys, extras = self.order_layouts[index]
+            order = {key: extras[key] if key in extras else order[key] for key in keys}
+        return order
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
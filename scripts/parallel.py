@@ -0,0 +1,303 @@
+# parallel.py
+
+import codecs
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from scripts.utils import STREAM_CHUNK_SIZE, decode_array_elements, json_loads, skip_whitespace
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from utils import STREAM_CHUNK_SIZE, decode_array_elements, json_loads, skip_whitespace
+
+# Bytes of the input file aggregated by one worker task
+PARALLEL_SHARD_SIZE = 1 << 23
+
+# Bytes read at a time past the end of a shard, to finish its last element
+SHARD_READ_SIZE = 1 << 16
+
+# Bytes after a comma decoded to check that it is between two array elements
+ALIGN_WINDOW_SIZE = 1 << 16
+
+# Elements that must decode after a comma for a worker to start its shard there
+ALIGN_CHECKS = 8
+
+def file_layout(file_path):
+    """Finds the format of an orders file and where its orders are.
+
+    Args:
+        file_path (str): Path to the JSON array or NDJSON file containing orders.
+
+    Returns:
+        dict: 'format' ('array' or 'ndjson'), 'start' (offset of the '[' of an array, 0 for
+        NDJSON), 'size', 'opening' (first character of the first array element) and 'end'
+        (offset of the closing ']', None when the array is not terminated).
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        head = file.read(ALIGN_WINDOW_SIZE)
+        start = len(head) - len(head.lstrip())
+        if head[start:start + 1] != b'[':
+            return {'format': 'ndjson', 'start': 0, 'size': size, 'opening': None, 'end': None}
+        opening = head[start + 1:].lstrip()[:1].decode('ascii', 'replace')
+        tail_start = max(0, size - ALIGN_WINDOW_SIZE)
+        file.seek(tail_start)
+        tail = file.read().rstrip()
+    end = tail_start + len(tail) - 1 if tail.endswith(b']') else None
+    return {'format': 'array', 'start': start, 'size': size, 'opening': opening, 'end': end}
+
+def read_ndjson_shard(file, start, end, aggregator):
+    """Aggregates the lines of an NDJSON file that start in [start, end).
+
+    Args:
+        file (file object): The file, opened in binary mode.
+        start (int): Offset of the shard; a line that starts before it belongs to the previous shard.
+        end (int): Offset of the next shard.
+        aggregator: Object whose add(order) method is called for every order.
+
+    Returns:
+        tuple: The offset of the first line read, the offset after the last one, and the number of orders.
+
+    Raises:
+        json.JSONDecodeError: If a line is not valid JSON.
+    """
+    file.seek(max(0, start - 1))
+    if start > 0:
+        file.readline()  # Rest of the line of the previous shard, or the newline just before start
+    first = position = file.tell()
+    count = 0
+    while position < end:
+        line = file.readline()
+        if not line:
+            break
+        position += len(line)
+        if line.strip():
+            aggregator.add(json_loads(line))
+            count += 1
+    return first, position, count
+
+def read_array_shard(file, separator, end, aggregator):
+    """Aggregates the elements of a JSON array that follow the separators in [separator, end).
+
+    The elements that fit before end are decoded in batches by
+    decode_array_elements, one piece of the shard at a time. The element that crosses end is read past it, so
+    the shard stops at the first separator at or after end, where the next
+    shard starts.
+
+    Args:
+        file (file object): The file, opened in binary mode.
+        separator (int): Offset of the '[' or ',' before the first element of the shard.
+        end (int): Offset of the next shard.
+        aggregator: Object whose add(order) method is called for every order.
+
+    Returns:
+        tuple: The offset of the ',' or ']' after the last element, the number of orders,
+        and whether that offset is the closing ']'.
+
+    Raises:
+        json.JSONDecodeError: If the array is malformed or truncated.
+    """
+    file.seek(separator + 1)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    text = decoder.decode(file.read(max(0, end - separator - 1)))
+    inside = len(text)  # Separators from here on are at or after end
+
+    def read_more():
+        nonlocal text
+        chunk = file.read(SHARD_READ_SIZE)
+        text += decoder.decode(chunk, final=not chunk)
+        return bool(chunk)
+
+    # The elements that fit in the shard, decoded STREAM_CHUNK_SIZE characters at a time like iter_json_array
+    pos = count = 0
+    started = False
+    piece = STREAM_CHUNK_SIZE
+    while pos < inside:
+        values, length, closed = decode_array_elements(text[pos:min(pos + piece, inside)], started, final=False)
+        for value in values:
+            aggregator.add(value)
+        count += len(values)
+        pos += length
+        started = started or bool(values)
+        if closed:
+            break
+        if values:
+            piece = STREAM_CHUNK_SIZE
+        elif pos + piece < inside:
+            piece *= 2  # An element longer than the piece
+        else:
+            break
+
+    # The elements after them whose separator is still before end, one at a time
+    json_decoder = json.JSONDecoder()
+    while True:
+        stop = skip_whitespace(text, pos)
+        while stop == len(text):
+            if not read_more():
+                raise json.JSONDecodeError("Unterminated array", text, stop)
+            stop = skip_whitespace(text, pos)
+        if text[stop] == ']' or started and stop >= inside:
+            break
+        if started:
+            if text[stop] != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, stop)
+            stop = skip_whitespace(text, stop + 1)
+        while True:
+            try:
+                value, pos = json_decoder.raw_decode(text, stop)
+                if pos < len(text):
+                    break  # A number at the end of the text may continue in the next chunk
+            except json.JSONDecodeError:
+                pass
+            if not read_more():
+                value, pos = json_decoder.raw_decode(text, skip_whitespace(text, stop))  # Raises if truncated
+                break
+        aggregator.add(value)
+        count += 1
+        started = True
+
+    return separator + 1 + len(text[:stop].encode('utf-8')), count, text[stop] == ']'
+
+def looks_aligned(file, separator, layout):
+    """Checks that a comma of a JSON array is followed by array elements.
+
+    A comma inside an element (e.g. between two line items) is followed by a
+    few values and then by a closing bracket or a key, so it fails this check
+    long before the shard would have been read from it.
+
+    Args:
+        file (file object): The file, opened in binary mode.
+        separator (int): Offset of the comma.
+        layout (dict): The layout of the file, from file_layout.
+
+    Returns:
+        bool: Whether ALIGN_CHECKS elements, or all of those in the window after the comma, decode.
+    """
+    file.seek(separator + 1)
+    window = file.read(ALIGN_WINDOW_SIZE)
+    text = window.decode('utf-8', 'ignore')
+    decoder = json.JSONDecoder()
+    pos = 0
+    for _ in range(ALIGN_CHECKS):
+        try:
+            value, pos = decoder.raw_decode(text, skip_whitespace(text, pos))
+        except json.JSONDecodeError:
+            return pos > 0 and len(window) == ALIGN_WINDOW_SIZE  # Cut off by the end of the window
+        pos = skip_whitespace(text, pos)
+        if pos == len(text):
+            return True
+        if text[pos] == ']':
+            return separator + 1 + len(text[:pos].encode('utf-8')) == layout['end']
+        if text[pos] != ',':
+            return False
+        pos += 1
+    return True
+
+def aggregate_shard(file_path, layout, start, end, aggregator_class, aligned):
+    """Aggregates one shard of an orders file in a worker process.
+
+    An NDJSON shard starts at its first line. An array shard starts at a
+    comma: at start itself when aligned, otherwise at the first comma after
+    start that is followed by array elements. The parent process checks that
+    each shard starts where the previous one stopped.
+
+    Args:
+        file_path (str): Path to the JSON array or NDJSON file containing orders.
+        layout (dict): The layout of the file, from file_layout.
+        start (int): Offset of the shard.
+        end (int): Offset of the next shard.
+        aggregator_class (type): Aggregator class, e.g. ItemAggregator.
+        aligned (bool): Whether start is known to be the '[' or a ',' between two array elements.
+
+    Returns:
+        tuple: The offset the shard starts at (None if no start was found), the offset it stops at,
+        whether that is the closing ']', the number of orders and the result of the aggregator as a plain dict.
+
+    Raises:
+        json.JSONDecodeError: If the shard is malformed (unaligned array shards are skipped instead).
+    """
+    with open(file_path, 'rb') as file:
+        if layout['format'] == 'ndjson':
+            aggregator = aggregator_class()
+            first, stop, count = read_ndjson_shard(file, start, end, aggregator)
+            return first, stop, False, count, dict(aggregator.result())
+
+        if aligned:
+            aggregator = aggregator_class()
+            stop, count, closed = read_array_shard(file, start, end, aggregator)
+            return start, stop, closed, count, dict(aggregator.result())
+
+        file.seek(start)
+        data = file.read(end - start)
+        comma = data.find(b',')
+        while comma >= 0:
+            separator = start + comma
+            following = data[comma + 1:comma + 65].lstrip()[:1].decode('ascii', 'replace')
+            if following in ('', layout['opening']) and looks_aligned(file, separator, layout):
+                aggregator = aggregator_class()
+                try:
+                    stop, count, closed = read_array_shard(file, separator, end, aggregator)
+                    if not closed or stop == layout['end']:
+                        return separator, stop, closed, count, dict(aggregator.result())
+                except json.JSONDecodeError:
+                    pass
+            comma = data.find(b',', comma + 1)
+        return None, None, False, 0, {}
+
+def aggregate_file_parallel(file_path, aggregator_class, merge, workers=None, shard_size=PARALLEL_SHARD_SIZE):
+    """Aggregates an orders file over a process pool, each worker reading its own byte range.
+
+    The file is split into shards of about shard_size bytes. Each worker
+    opens the file, parses only its shard and sends back the result of its
+    aggregator, so orders are never pickled. The results are merged in shard
+    order, which gives the same report as a single pass. An array shard whose
+    worker started at a comma inside an element is read again here from where
+    the previous shard stopped.
+
+    Args:
+        file_path (str): Path to the JSON array or NDJSON file containing orders.
+        aggregator_class (type): Aggregator class, e.g. ItemAggregator.
+        merge (callable): merge(report, partial) returns the report of both sets of orders.
+        workers (int): Number of worker processes, defaults to the CPU count.
+        shard_size (int): Bytes per shard; there is at least one shard per worker.
+
+    Returns:
+        The merged report, None if the file has no orders.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        json.JSONDecodeError: If the file is malformed or truncated.
+    """
+    workers = workers or os.cpu_count() or 1
+    layout = file_layout(file_path)
+    start, size = layout['start'], layout['size']
+    shards = max(workers, -(-(size - start) // shard_size), 1)
+    bounds = [start + (size - start) * k // shards for k in range(shards + 1)]
+
+    report = aggregator_class().result()
+    orders = 0
+    closed = False
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(aggregate_shard, file_path, layout, bounds[k], bounds[k + 1], aggregator_class, k == 0)
+                   for k in range(shards)]
+        expected = start  # Where the next shard must start
+        for k, future in enumerate(futures):
+            if expected >= bounds[k + 1]:
+                continue  # Covered by the element or line that ended the previous shard
+            first, stop, closed, count, partial = future.result()
+            if first != expected:
+                first, stop, closed, count, partial = aggregate_shard(
+                    file_path, layout, expected, bounds[k + 1], aggregator_class, True)
+            if closed and stop != layout['end']:
+                raise json.JSONDecodeError("Extra data", '', stop)  # Text after the array
+            report = merge(report, partial)
+            orders += count
+            expected = stop
+            if closed:
+                break
+        if layout['format'] == 'array' and not closed:
+            raise json.JSONDecodeError("Unterminated array", '', size)
+        for future in futures:
+            future.cancel()
+
+    return report if orders else None
@@ -0,0 +1,166 @@
+# pipeline.py
+
+import re
+from collections import defaultdict
+
+# Regular expression pattern for phone number format, shared by every customers report
+PHONE_PATTERN = re.compile(r'^\d{3}-\d{3}-\d{4}$')
+
+class CustomerAggregator:
+    """Collects customer names keyed by phone number for extract_customers."""
+
+    def __init__(self):
+        self.customers = {}
+
+    def add(self, order):
+        """Updates the customer map with one order.
+
+        Args:
+            order (dict): A single order.
+        """
+        phone = order.get('phone')
+        name = order.get('name')
+        if phone and name and PHONE_PATTERN.match(phone):
+            self.customers[phone] = name
+
+    def result(self):
+        """Returns the customer map.
+
+        Returns:
+            dict: Dictionary with phone numbers as keys and customer names as values.
+        """
+        return self.customers
+
+def merge_customer_reports(customers, partial):
+    """Merges the customer map of newer orders into an earlier customer map.
+
+    Args:
+        customers (dict): Customer map of the earlier orders, e.g. loaded from a checkpoint.
+        partial (dict): Customer map of the newer orders.
+
+    Returns:
+        dict: Customer map of all the orders, in the format of extract_customers.
+    """
+    return {**customers, **partial}  # Newer names win and new phones go last, like a single pass
+
+class ItemAggregator:
+    """Collects item prices and order counts for process_orders."""
+
+    def __init__(self):
+        self.items = defaultdict(lambda: {'price': 0, 'orders': 0})
+
+    def add(self, order):
+        """Updates the item table with one order.
+
+        Args:
+            order (dict): A single order.
+        """
+        for item in order.get('items', []):
+            item_name = item.get('name')
+            item_price = item.get('price')
+            if item_name and item_price:
+                self.items[item_name]['price'] = item_price
+                self.items[item_name]['orders'] += 1
+
+    def result(self):
+        """Returns the item table.
+
+        Returns:
+            dict: Dictionary with item names as keys and nested dictionaries with 'price' and 'orders' as values.
+        """
+        return self.items
+
+def sale_amount(item):
+    """Returns what a line item adds to the revenue.
+
+    Args:
+        item (dict): A single line item.
+
+    Returns:
+        float or None: The price of an item the items report counts, None for a
+        missing name or a price that is missing or not a number.
+    """
+    price = item.get('price')
+    if item.get('name') and type(price) in (int, float):
+        return float(price)
+    return None
+
+class RevenueAggregator:
+    """Adds up the revenue of every item, over the same items as process_orders."""
+
+    def __init__(self):
+        self.revenue = {}
+
+    def add(self, order):
+        """Adds the line items of one order to the revenue.
+
+        Args:
+            order (dict): A single order.
+        """
+        for item in order.get('items', []):
+            amount = sale_amount(item)
+            if amount:
+                self.revenue[item['name']] = self.revenue.get(item['name'], 0.0) + amount
+
+    def result(self):
+        """Returns the revenue table.
+
+        Returns:
+            dict: Dictionary with item names as keys and revenues, rounded to cents, as values.
+        """
+        return {item_name: round(revenue, 2) for item_name, revenue in self.revenue.items()}
+
+class CustomerTotalAggregator:
+    """Counts the orders and spending of every customer, over the same orders as extract_customers."""
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, order):
+        """Adds one order to the totals of its customer.
+
+        Args:
+            order (dict): A single order.
+        """
+        phone = order.get('phone')
+        name = order.get('name')
+        if not (phone and name and PHONE_PATTERN.match(phone)):
+            return
+        totals = self.totals.get(phone)
+        if totals is None:
+            totals = self.totals[phone] = {'orders': 0, 'spent': 0.0}
+        totals['orders'] += 1
+        for item in order.get('items', []):
+            amount = sale_amount(item)
+            if amount:
+                totals['spent'] += amount
+
+    def result(self):
+        """Returns the customer totals.
+
+        Returns:
+            dict: Dictionary with phone numbers as keys and nested dictionaries with 'orders' and
+            'spent' (rounded to cents) as values.
+        """
+        return {phone: {'orders': totals['orders'], 'spent': round(totals['spent'], 2)}
+                for phone, totals in self.totals.items()}
+
+def run_pipeline(orders, aggregators):
+    """Feeds every order to a set of aggregators in a single pass.
+
+    An aggregator is any object with an ``add(order)`` method called once per
+    order and a ``result()`` method called once at the end, so adding another
+    report does not add another traversal of the orders.
+
+    Args:
+        orders (iterable): Orders (dicts), e.g. a list or a stream from iter_orders_from_file.
+        aggregators (dict): Aggregators keyed by report name.
+
+    Returns:
+        dict: The result of each aggregator, keyed by report name.
+    """
+    adders = [aggregator.add for aggregator in aggregators.values()]
+    for order in orders:
+        for add in adders:
+            add(order)
+    return {name: aggregator.result() for name, aggregator in aggregators.items()}
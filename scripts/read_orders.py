@@ -1,25 +1,114 @@
 import sys  # Importing sys module for command-line arguments handling
-import json  # Importing json module for JSON parsing
+import os  # Importing os module for moving the finished --output file into place
+import json  # Importing json module for the decoding errors of the streaming reader
+import csv  # Importing csv module for the CSV report format
+import io  # Importing io module for the in-memory batch buffer
+import argparse  # Importing argparse for the report options
+import itertools  # Importing itertools for batching the orders
 
-def read_orders_from_file(file_path):
-    """Reads JSON orders from a specified file.
+try:
+    from scripts.snapshot import load_orders_cached
+    from scripts.utils import iter_orders_from_file, json_dumps, peek_orders, read_orders_from_file
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from snapshot import load_orders_cached
+    from utils import iter_orders_from_file, json_dumps, peek_orders, read_orders_from_file
+
+# Number of orders formatted into one buffer before it is written out
+REPORT_BATCH_SIZE = 5000
+
+# Size of the write buffer used for --output files
+REPORT_BUFFER_SIZE = 1 << 20
+
+# Columns of the CSV report, one row per line item
+CSV_COLUMNS = ['name', 'phone', 'item', 'price', 'timestamp', 'notes']
+
+def format_orders_text(orders):
+    """Formats orders as the human-readable report.
 
     Args:
-        file_path (str): Path to the JSON file containing orders.
+        orders (list): List of orders (dicts).
 
     Returns:
-        list or None: List of orders (dicts) if successful, None otherwise.
+        str: The report text for these orders.
     """
-    try:
-        with open(file_path, 'r') as file:
-            orders = json.load(file)  # Load JSON data from file
-            return orders  # Return the list of orders
-    except FileNotFoundError:
-        print(f"Error: The file '{file_path}' was not found.")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from file '{file_path}': {e}")
-        return None
+    lines = []
+    append = lines.append
+    for order in orders:
+        append(f"Name: {order['name']}\n")
+        append(f"Phone: {order['phone']}\n")
+        append("Items:\n")
+        for item in order['items']:
+            append(f"- {item['name']}: ${item['price']:.2f}\n")  # Formatting price to 2 decimal places
+        if order['notes']:
+            append(f"Notes: {order['notes']}\n")
+        append("\n")
+    return ''.join(lines)
+
+def format_orders_ndjson(orders):
+    """Formats orders as NDJSON, one order object per line.
+
+    Args:
+        orders (list): List of orders (dicts).
+
+    Returns:
+        str: The NDJSON text for these orders.
+    """
+    return ''.join(json_dumps(order, compact=True) + '\n' for order in orders)
+
+def format_orders_csv(orders):
+    """Formats orders as CSV rows, one row per line item (without header).
+
+    Args:
+        orders (list): List of orders (dicts).
+
+    Returns:
+        str: The CSV text for these orders.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerows(
+        (order['name'], order['phone'], item['name'], item['price'], order.get('timestamp'), order.get('notes'))
+        for order in orders
+        for item in order['items']
+    )
+    return buffer.getvalue()
+
+REPORT_FORMATTERS = {
+    'text': format_orders_text,
+    'ndjson': format_orders_ndjson,
+    'csv': format_orders_csv,
+}
+
+def write_orders_report(orders, out, report_format='text', batch_size=REPORT_BATCH_SIZE):
+    """Writes a report of the orders, formatting them in batches.
+
+    Each batch of orders is formatted into a single string and written with one
+    call, instead of one print() per line.
+
+    Args:
+        orders (iterable): Orders (dicts), e.g. a list, a stream from iter_orders_from_file or an OrderBatch.
+        out (file object): Text stream to write the report to.
+        report_format (str): One of 'text', 'ndjson' or 'csv'.
+        batch_size (int): Number of orders formatted per write.
+    """
+    formatter = REPORT_FORMATTERS[report_format]
+    if report_format == 'csv':
+        out.write(','.join(CSV_COLUMNS) + '\n')  # Header row
+
+    orders = iter(orders)
+    while True:
+        batch = list(itertools.islice(orders, batch_size))
+        if not batch:
+            break
+        out.write(formatter(batch))
+
+def print_orders(orders):
+    """Prints the details of each order.
+
+    Args:
+        orders (iterable): Orders (dicts), e.g. a list, a stream from iter_orders_from_file or an OrderBatch.
+    """
+    write_orders_report(orders, sys.stdout)
 
 def main():
     """Main function to execute when script is run."""
@@ -28,21 +117,38 @@ def main():
         print("Usage: python script.py <json_file_path>")
         return
 
-    file_path = sys.argv[1]  # Getting the JSON file path from command-line arguments;
-
-    orders = read_orders_from_file(file_path)  # Reading orders from the specified file
-    if orders:
-        print("Orders read successfully:")
-        # Iterating through each order and printing its details
-        for order in orders:
-            print(f"Name: {order['name']}")
-            print(f"Phone: {order['phone']}")
-            print("Items:")
-            for item in order['items']:
-                print(f"- {item['name']}: ${item['price']:.2f}")  # Formatting price to 2 decimal places
-            if order['notes']:
-                print(f"Notes: {order['notes']}")
-            print()
+    parser = argparse.ArgumentParser(description="Print a report of the orders in a JSON or NDJSON file.")
+    parser.add_argument('json_file_path', help="Path to the JSON or NDJSON orders file")
+    parser.add_argument('--format', dest='report_format', choices=sorted(REPORT_FORMATTERS), default='text',
+                        help="Report format (default: text)")
+    parser.add_argument('--output', help="Write the report to this file instead of stdout")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Stream the file instead of using (and writing) its parsed snapshot")
+    args = parser.parse_args(sys.argv[1:])
+
+    # An --output report is written next to its destination and only moved there once complete
+    temp_path = args.output + '.tmp' if args.output else None
+    try:
+        if args.no_cache:
+            orders = peek_orders(iter_orders_from_file(args.json_file_path))  # Streaming orders from the specified file
+        else:
+            orders = load_orders_cached(args.json_file_path, raise_errors=True)  # Orders from the parsed snapshot, or parse and snapshot them
+        if orders:
+            out = open(temp_path, 'w', buffering=REPORT_BUFFER_SIZE, newline='') if temp_path else sys.stdout
+            try:
+                if args.report_format == 'text':
+                    out.write("Orders read successfully:\n")
+                write_orders_report(orders, out, args.report_format)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            if temp_path:
+                os.replace(temp_path, args.output)
+    except json.JSONDecodeError:
+        # The error is already printed; a streamed report of the orders before it is incomplete
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
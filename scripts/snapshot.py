@@ -0,0 +1,251 @@
+# snapshot.py
+
+import argparse
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+try:
+    from scripts.order_batch import ITEM_FIELDS, ORDER_FIELDS, OrderBatch
+    from scripts.utils import json_loads, read_order_batch
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from order_batch import ITEM_FIELDS, ORDER_FIELDS, OrderBatch
+    from utils import json_loads, read_order_batch
+
+# A snapshot of orders.json is written next to it as orders.json.snapshot
+SNAPSHOT_SUFFIX = '.snapshot'
+
+# File layout: magic, header length, JSON header, then the raw columns, each aligned to 8 bytes
+SNAPSHOT_MAGIC = b'ORDSNAP1'
+HEADER_LENGTH = struct.Struct('<Q')
+
+# Bytes read at a time when hashing the source file
+HASH_CHUNK_SIZE = 1 << 20
+
+def snapshot_path(file_path):
+    """Returns the path of the snapshot of an orders file."""
+    return file_path + SNAPSHOT_SUFFIX
+
+def file_fingerprint(file_path):
+    """Identifies the current version of a file without reading it.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        dict: The absolute path, size and modification time (ns) of the file.
+    """
+    stat = os.stat(file_path)
+    return {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def file_hash(file_path):
+    """Computes the SHA-256 of a file's content.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: Hex digest of the content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def batch_columns(batch):
+    """Lists the arrays of an OrderBatch under their snapshot names.
+
+    Args:
+        batch (OrderBatch): The orders.
+
+    Returns:
+        dict: Column name -> array.
+    """
+    columns = {f'order.{field}': batch.order_columns[field] for field in ORDER_FIELDS}
+    columns['order.timestamp'] = batch.timestamps
+    columns['item_offsets'] = batch.item_offsets
+    columns.update({f'item.{field}': batch.item_columns[field] for field in ITEM_FIELDS})
+    return columns
+
+def write_snapshot(batch, file_path, source):
+    """Writes a snapshot of an OrderBatch parsed from a file.
+
+    Args:
+        batch (OrderBatch): The orders parsed from file_path.
+        file_path (str): Path to the orders file.
+        source (dict): Fingerprint of the orders file, with its content 'hash', taken before parsing.
+    """
+    header = {
+        'source': source,
+        'byteorder': sys.byteorder,
+        'values': batch.values,
+        'other_timestamps': list(batch.other_timestamps.items()),
+        'order_layouts': [[index, keys, extras] for index, (keys, extras) in batch.order_layouts.items()],
+        'item_layouts': [[position, keys, extras] for position, (keys, extras) in batch.item_layouts.items()],
+        'columns': [],
+    }
+    offset = 0
+    for name, column in batch_columns(batch).items():
+        header['columns'].append([name, column.typecode, offset, len(column)])
+        offset += -(-len(column) * column.itemsize // 8) * 8  # Round up to a multiple of 8
+    write_snapshot_file(file_path, header, (column.tobytes() for column in batch_columns(batch).values()))
+
+def write_snapshot_file(file_path, header, columns):
+    """Writes a snapshot file from its header and column data.
+
+    The snapshot is written to a temporary file and renamed into place, so a
+    reader never sees a half-written snapshot.
+
+    Args:
+        file_path (str): Path to the orders file.
+        header (dict): The snapshot header.
+        columns (iterable): Bytes of each column, in the order of header['columns'].
+    """
+    header = json.dumps(header).encode()  # stdlib json keeps NaN values, which json_dumps may write as null
+    header += b' ' * (-(len(SNAPSHOT_MAGIC) + HEADER_LENGTH.size + len(header)) % 8)  # Align the first column
+
+    temp_path = snapshot_path(file_path) + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(SNAPSHOT_MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+        for data in columns:
+            file.write(data)
+            file.write(b'\0' * (-len(data) % 8))
+    os.replace(temp_path, snapshot_path(file_path))
+
+def load_snapshot(file_path):
+    """Loads the snapshot of an orders file if it is still valid.
+
+    The columns are memory-mapped rather than read, so loading takes about the
+    same time however many orders there are. A snapshot is valid when the
+    orders file has the size and modification time recorded in it; if only the
+    modification time changed, the content hash decides, and a snapshot whose
+    hash still matches is rewritten with the new modification time. The
+    returned batch is read-only.
+
+    Args:
+        file_path (str): Path to the orders file.
+
+    Returns:
+        OrderBatch or None: The orders, None if there is no valid snapshot.
+    """
+    try:
+        with open(snapshot_path(file_path), 'rb') as file:
+            snapshot = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # Missing, unreadable or empty snapshot
+        return None
+
+    try:
+        prefix = len(SNAPSHOT_MAGIC) + HEADER_LENGTH.size
+        if snapshot[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            return None
+        (header_length,) = HEADER_LENGTH.unpack(snapshot[len(SNAPSHOT_MAGIC):prefix])
+        header = json_loads(snapshot[prefix:prefix + header_length])
+
+        source, current = header['source'], file_fingerprint(file_path)
+        if header['byteorder'] != sys.byteorder or source['path'] != current['path'] or source['size'] != current['size']:
+            return None
+        touched = source['mtime_ns'] != current['mtime_ns']
+        if touched and source['hash'] != file_hash(file_path):
+            return None
+
+        data = memoryview(snapshot)[prefix + header_length:]
+        if touched:
+            # Same content: record the new modification time so the next load skips the hash
+            source['mtime_ns'] = current['mtime_ns']
+            try:
+                write_snapshot_file(file_path, header, [data])
+            except OSError:
+                pass
+        columns = {name: data[offset:offset + length * struct.calcsize(typecode)].cast(typecode)
+                   for name, typecode, offset, length in header['columns']}
+        order_layouts = {index: (keys, extras) for index, keys, extras in header['order_layouts']}
+        item_layouts = {position: (keys, extras) for position, keys, extras in header['item_layouts']}
+    except (OSError, ValueError, KeyError, TypeError, struct.error):  # Source gone, snapshot corrupt or from an older version
+        return None
+
+    batch = OrderBatch()
+    batch.values = header['values']
+    batch.order_columns = {field: columns[f'order.{field}'] for field in ORDER_FIELDS}
+    batch.timestamps = columns['order.timestamp']
+    batch.other_timestamps = dict((index, timestamp) for index, timestamp in header['other_timestamps'])
+    batch.item_offsets = columns['item_offsets']
+    batch.item_columns = {field: columns[f'item.{field}'] for field in ITEM_FIELDS}
+    batch.order_layouts = order_layouts
+    batch.item_layouts = item_layouts
+    return batch
+
+def load_orders_cached(file_path, raise_errors=False):
+    """Reads an orders file into an OrderBatch, through its snapshot when possible.
+
+    On a miss the file is parsed with read_order_batch and a new snapshot is
+    written next to it for the following runs. Only a clean parse of the whole
+    file is snapshotted: a decoding error gives None and writes nothing. Failing to write the snapshot
+    (e.g. a read-only directory) only costs the speed-up.
+
+    Args:
+        file_path (str): Path to the JSON or NDJSON file containing orders.
+        raise_errors (bool): Raise the decoding error of a malformed file instead of returning None.
+
+    Returns:
+        OrderBatch or None: The orders, None if there are none or the file cannot be read.
+
+    Raises:
+        json.JSONDecodeError: If raise_errors is set and the file is malformed or truncated.
+    """
+    batch = load_snapshot(file_path)
+    if batch is not None:
+        return batch
+
+    try:
+        source = file_fingerprint(file_path)
+        source['hash'] = file_hash(file_path)
+    except OSError:
+        source = None  # Reported by read_order_batch below
+    batch = read_order_batch(file_path, raise_errors)
+    if batch is not None and source is not None:
+        try:
+            write_snapshot(batch, file_path, source)
+        except OSError:
+            pass
+    return batch
+
+def clear_snapshots(paths):
+    """Deletes the snapshots of orders files.
+
+    Args:
+        paths (list): Orders files, or directories whose snapshots are all deleted.
+
+    Returns:
+        list: The snapshot files that were deleted.
+    """
+    deleted = []
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = glob.glob(os.path.join(glob.escape(path), '*' + SNAPSHOT_SUFFIX))
+        else:
+            candidates = [snapshot_path(path)]
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                os.remove(candidate)
+                deleted.append(candidate)
+    return deleted
+
+def main():
+    """Main function to execute when script is run."""
+    parser = argparse.ArgumentParser(description="Manage the parsed-orders snapshots written next to orders files.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    clear = subparsers.add_parser('clear', help="Delete the snapshots of orders files or directories")
+    clear.add_argument('paths', nargs='+', help="Orders files or directories")
+    args = parser.parse_args()
+
+    if args.command == 'clear':
+        for path in clear_snapshots(args.paths):
+            print(f"Deleted '{path}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import unittest
+from scripts.benchmark import compare_reports, endpoint_requests, measure
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_measure(self):
+        calls = []
+        result = measure(lambda call: calls.append(bytearray(1 << 20)), 10)
+        self.assertEqual(len(calls), 2)  # Timed call, then the memory one
+        self.assertEqual(result['units'], 10)
+        self.assertGreater(result['throughput'], 0)
+        self.assertGreaterEqual(result['peak_memory'], 1 << 20)
+        self.assertNotIn('peak_memory', measure(lambda call: None, 1, memory=False))
+
+    def test_compare_reports(self):
+        baseline = {'results': {'a': {'throughput': 100, 'peak_memory': 1000}, 'b': {'throughput': 100}}}
+        report = {'results': {'a': {'throughput': 95, 'peak_memory': 1200}, 'b': {'throughput': 50}, 'c': {'throughput': 1}}}
+        changes = {(name, metric): regression for name, metric, old, new, change, regression in compare_reports(report, baseline)}
+        self.assertEqual(changes, {('a', 'throughput'): False, ('a', 'peak_memory'): True, ('b', 'throughput'): True})
+
+    def test_endpoint_requests(self):
+        requests = endpoint_requests(1000, 100, 3000)
+        self.assertEqual(len({name for name, make in requests}), len(requests))
+        created = {'/customers': [7]}
+        self.assertEqual(dict(requests)['DELETE /customers/{id}'](0, created), ('DELETE', '/customers/7', None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import argparse
+import os
+import tempfile
+from scripts.generate_orders import MENU, customer_count, generate_orders, parse_scale, write_orders
+from scripts.utils import iter_orders_from_file, read_orders_from_file
+
+class TestGenerateOrders(unittest.TestCase):
+
+    def test_deterministic(self):
+        self.assertEqual(list(generate_orders(500, seed=1)), list(generate_orders(500, seed=1)))
+        self.assertNotEqual(list(generate_orders(500, seed=1)), list(generate_orders(500, seed=2)))
+
+    def test_format(self):
+        orders = list(generate_orders(1000))
+        self.assertEqual(len(orders), 1000)
+        for order in orders:
+            self.assertEqual(list(order), ['name', 'phone', 'items', 'timestamp', 'notes'])
+            self.assertRegex(order['phone'], r'^\d{3}-\d{3}-\d{4}$')
+            self.assertTrue(1 <= len(order['items']) <= 5)
+            for item in order['items']:
+                self.assertEqual(MENU[item['name']], item['price'])
+        timestamps = [order['timestamp'] for order in orders]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertLessEqual(len({order['phone'] for order in orders}), customer_count(1000))
+
+    def test_write_orders(self):
+        orders = list(generate_orders(100))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'orders.json')
+            write_orders(iter(orders), path)
+            self.assertEqual(read_orders_from_file(path), orders)
+            write_orders(iter(orders), path, ndjson=True)
+            self.assertEqual(list(iter_orders_from_file(path)), orders)
+
+    def test_parse_scale(self):
+        self.assertEqual(parse_scale('1k'), 1000)
+        self.assertEqual(parse_scale('10M'), 10000000)
+        self.assertEqual(parse_scale('2.5k'), 2500)
+        self.assertEqual(parse_scale('42'), 42)
+        for text in ('0', 'lots', '-1k'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_scale(text)
+
+if __name__ == '__main__':
+    unittest.main()
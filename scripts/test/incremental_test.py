@@ -0,0 +1,96 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest import mock
+from scripts.incremental import checkpoint_path, read_new_orders, update_report
+from scripts.items_price_num_order import merge_item_reports, process_orders
+from scripts.pipeline import merge_customer_reports
+
+ORDERS = [
+    {'name': f'Customer{i % 7}', 'phone': f'{i % 5:03d}-555-0000', 'items': [{'name': f'Item{i % 3}', 'price': i % 4 + 1}],
+     'timestamp': 1700000000 + i, 'notes': 'ünïcode' if i % 2 else ''}
+    for i in range(40)
+]
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'orders.json')
+        self.output = os.path.join(self.tmpdir.name, 'items.json')
+        self.seen = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_array(self, orders):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(orders, file, indent=4, ensure_ascii=False)
+
+    def write_ndjson(self, orders):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(order, ensure_ascii=False) + '\n' for order in orders)
+
+    def aggregate(self, orders):
+        self.seen.append(len(orders))
+        return process_orders(orders)
+
+    def update(self, rebuild=False):
+        return json.dumps(update_report(self.path, self.output, self.aggregate, merge_item_reports, rebuild))
+
+    def check_appends(self, write):
+        for count in (10, 10, 25, 40):
+            write(ORDERS[:count])
+            self.assertEqual(self.update(), json.dumps(process_orders(ORDERS[:count])))
+        self.assertEqual(self.seen, [10, 0, 15, 15])  # Only the new orders were aggregated
+
+    def test_json_array_appends(self):
+        self.check_appends(self.write_array)
+
+    def test_ndjson_appends(self):
+        self.check_appends(self.write_ndjson)
+
+    def test_small_chunks(self):
+        # Chunk boundaries fall inside orders, nested arrays and multi-byte characters
+        for write in (self.write_array, self.write_ndjson):
+            self.seen = []
+            with mock.patch('scripts.incremental.TAIL_CHUNK_SIZE', 7):
+                self.check_appends(write)
+            os.remove(checkpoint_path(self.output))
+
+    def test_rewritten_input_rebuilds(self):
+        self.write_array(ORDERS[:20])
+        self.update()
+        self.write_array(ORDERS[20:])
+        self.assertEqual(self.update(), json.dumps(process_orders(ORDERS[20:])))
+        self.assertEqual(self.seen, [20, 20])
+
+    def test_rebuild(self):
+        self.write_ndjson(ORDERS)
+        self.update()
+        self.assertEqual(self.update(rebuild=True), json.dumps(process_orders(ORDERS)))
+        self.assertEqual(self.seen, [40, 40])
+        with open(checkpoint_path(self.output)) as file:
+            self.assertEqual(json.load(file)['position']['orders'], 40)
+
+    def test_partial_tail_is_left_for_later(self):
+        text = ''.join(json.dumps(order) + '\n' for order in ORDERS[:3])
+        with open(self.path, 'w') as file:
+            file.write(text + '{"name": "Cut')
+        orders, position = read_new_orders(self.path)
+        self.assertEqual(orders, ORDERS[:3])
+        self.assertEqual(position['offset'], len(text))
+
+    def test_customers(self):
+        self.write_array(ORDERS[:15])
+        update_report(self.path, self.output, lambda orders: {o['phone']: o['name'] for o in orders}, merge_customer_reports)
+        self.write_array(ORDERS)
+        customers = update_report(self.path, self.output, lambda orders: {o['phone']: o['name'] for o in orders}, merge_customer_reports)
+        self.assertEqual(list(customers.items()), list({o['phone']: o['name'] for o in ORDERS}.items()))
+
+    def test_missing_file(self):
+        self.assertIsNone(update_report(os.path.join(self.tmpdir.name, 'missing.json'), self.output, process_orders, merge_item_reports))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import importlib
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from scripts.items_price_num_order import main, process_orders, process_orders_parallel
+
+customers_module = importlib.import_module('scripts.customers_phone no_name')
+
+ORDERS = [
+    {'name': f'Cüstomer{i % 11}', 'phone': f'{i % 13:03d}-555-0000',
+     'items': [{'name': f'Item{(i + j) % 7}', 'price': float(j % 5 + 1) + i / 100} for j in range(i % 12)],
+     'notes': '], {"name": "x"}, [' if i % 9 == 0 else ''}
+    for i in range(400)
+]
+
+class TestProcessOrdersParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'orders.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, text):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+    def test_matches_serial(self):
+        # Shards start inside orders, line items, strings and multi-byte characters
+        serial = json.dumps(process_orders(ORDERS))
+        customers = customers_module.extract_customers(ORDERS)
+        for text in (json.dumps(ORDERS, ensure_ascii=False), json.dumps(ORDERS, indent=4),
+                     ''.join(json.dumps(order, ensure_ascii=False) + '\n' for order in ORDERS)):
+            self.write(text)
+            for shard_size in (97, 1000, 1 << 23):
+                parallel = process_orders_parallel(self.path, workers=2, shard_size=shard_size)
+                self.assertEqual(json.dumps(parallel), serial)  # Same values and key order
+            self.assertEqual(customers_module.extract_customers_parallel(self.path, workers=2, shard_size=333), customers)
+
+    def test_empty(self):
+        for text in ('[]', ' [ ]\n', ''):
+            self.write(text)
+            self.assertIsNone(process_orders_parallel(self.path, workers=2))
+
+    def test_malformed(self):
+        text = json.dumps(ORDERS)
+        middle = text.index('}, {"name": "C', len(text) // 2) + 1  # Between two orders
+        for broken in (text[:-500], text[:-1], text.replace('"notes"', '"notes" 1', 1), text[:middle] + ',' + text[middle:],
+                       text[:middle] + ']' + text[middle:]):
+            self.write(broken)
+            with self.assertRaises(json.JSONDecodeError):
+                process_orders_parallel(self.path, workers=2, shard_size=1000)
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_truncated_input_writes_no_report(self, mock_stdout):
+        orders = [{'name': 'John Doe', 'items': [{'name': 'Item1', 'price': 1.0}]}] * 100
+        self.write(json.dumps(orders)[:-500])
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            with patch('sys.argv', ['items_price_num_order.py', self.path, '2']):
+                main()
+        finally:
+            os.chdir(cwd)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, 'items.json')))
+        self.assertIn("Error decoding JSON", mock_stdout.getvalue())
+        self.assertNotIn("successfully written", mock_stdout.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import argparse
+import random
+from unittest.mock import Mock
+from scripts.load_generator import DEFAULT_MIX, OPERATIONS, LoadState, LoadStats, parse_mix, percentile
+
+class TestLoadTest(unittest.TestCase):
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('read_order=80, create_order=20'), {'read_order': 80, 'create_order': 20})
+        self.assertEqual(parse_mix('read_item'), {'read_item': 1})
+        for text in ('read_orders=1', 'read_order=x', 'read_order=-1', 'read_order=0', ''):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_mix(text)
+        self.assertLessEqual(set(DEFAULT_MIX), set(OPERATIONS))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, fraction) for fraction in (0.5, 0.95, 0.99, 1.0)], [50, 95, 99, 100])
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_updates_and_deletes_use_created_rows(self):
+        state, rng = LoadState(10, 5, 100), random.Random(0)
+        self.assertEqual(state.request('delete_customer', rng)[:3], ('create_customer', 'POST', '/customers'))
+        operation, method, url, body = state.request('create_customer', rng)
+        state.record(operation, Mock(json=lambda: {'id': 11, 'name': body['name'], 'phone': body['phone']}))
+        self.assertEqual(state.request('update_customer', rng)[1:], ('PUT', '/customers/11', {'name': 'Loaded', 'phone': body['phone']}))
+        self.assertEqual(state.request('delete_customer', rng), ('delete_customer', 'DELETE', '/customers/11', None))
+        self.assertEqual(state.created['customer'], [])
+        self.assertEqual(state.request('read_order', rng)[1], 'GET')
+
+    def test_report(self):
+        stats = LoadStats()
+        for latency in range(1, 101):
+            stats.add('GET /orders/{id}', latency / 1000, 200 if latency % 10 else 404)
+        stats.add('POST /orders', 0.5, 'ReadTimeout')
+        report = stats.report(elapsed=2)
+        self.assertEqual((report['requests'], report['errors'], report['throughput']), (101, 11, 50.5))
+        route = report['routes']['GET /orders/{id}']
+        self.assertEqual((route['p50'], route['p99'], route['max'], route['error_rate']), (50, 99, 100, 0.1))
+        self.assertEqual(route['statuses'], {'200': 90, '404': 10})
+        self.assertEqual(report['routes']['POST /orders']['error_rate'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+from scripts import vectorized
+from scripts.items_price_num_order import process_orders
+from scripts.order_batch import OrderBatch
+from scripts.read_orders import write_orders_report
+from scripts.utils import read_order_batch
+from scripts.vectorized import extract_customers_vectorized
+
+ORDERS = [
+    {'name': f'Customer{i % 11}', 'phone': f'{i % 13:03d}-555-0000' if i % 5 else '12345',
+     'items': [{'name': f'Item{i % 7}', 'price': i % 5}, {'name': 'Item1', 'price': float(i)}],
+     'timestamp': 1700000000 + i, 'notes': 'extra spicy' if i % 3 else ''}
+    for i in range(300)
+] + [{'name': '', 'phone': '001-555-0000', 'items': [{'name': 'NoPrice'}]}, {'name': 'Last', 'phone': '002-555-0000', 'items': []}]
+
+class TestOrderBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.batch = OrderBatch.from_orders(iter(ORDERS))
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.batch), len(ORDERS))
+        self.assertEqual(json.dumps(list(self.batch)), json.dumps(ORDERS))  # Same fields, values, types and key order
+        self.assertEqual(self.batch[-1], ORDERS[-1])
+
+    def test_other_keys_are_kept(self):
+        orders = [
+            {'phone': '123-456-7890', 'name': 'Reordered', 'items': [{'price': 1, 'name': 'A', 'qty': 2}], 'coupon': 'X1'},
+            {'name': 'No items', 'notes': ['list', {'nested': True}], 'table': {'seats': 4}},
+            {'name': 'Odd items', 'items': None},
+            {'name': 'Scalar items', 'items': ['Dosa', 3]},
+            ORDERS[0],
+        ]
+        batch = OrderBatch.from_orders(orders)
+        self.assertEqual(json.dumps(list(batch)), json.dumps(orders))
+        self.assertEqual(list(batch.order_layouts), [0, 1, 2, 3])
+        self.assertEqual(list(batch.item_layouts), [0])
+
+    def test_values_are_shared(self):
+        self.assertEqual(len(self.batch.values), len(set(map(json.dumps, self.batch.values))))
+        self.assertIs(self.batch[0]['notes'], self.batch[3]['notes'])
+
+    def test_process_orders(self):
+        self.assertEqual(json.dumps(process_orders(self.batch)), json.dumps(process_orders(ORDERS)))
+        with patch.object(vectorized, 'np', None):
+            self.assertEqual(json.dumps(process_orders(self.batch)), json.dumps(process_orders(ORDERS)))
+
+    def test_extract_customers(self):
+        expected = json.dumps(extract_customers_vectorized(iter(ORDERS)))
+        self.assertEqual(json.dumps(extract_customers_vectorized(self.batch)), expected)
+        with patch.object(vectorized, 'np', None):
+            self.assertEqual(json.dumps(extract_customers_vectorized(self.batch)), expected)
+
+    def test_report(self):
+        complete = ORDERS[:300]  # The report needs every field
+        for report_format in ('text', 'ndjson', 'csv'):
+            expected, actual = io.StringIO(), io.StringIO()
+            write_orders_report(complete, expected, report_format)
+            write_orders_report(OrderBatch.from_orders(complete), actual, report_format)
+            self.assertEqual(actual.getvalue(), expected.getvalue())
+
+    def test_read_order_batch(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'orders.json')
+            with open(path, 'w') as file:
+                json.dump(ORDERS, file)
+            self.assertEqual(list(read_order_batch(path)), ORDERS)
+            with open(path, 'w') as file:
+                file.write('[]')
+            self.assertIsNone(read_order_batch(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from scripts.pipeline import CustomerAggregator, CustomerTotalAggregator, ItemAggregator, RevenueAggregator, run_pipeline
+
+class CountAggregator:
+    """Minimal third-party aggregator used to check the plug-in protocol."""
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, order):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+class TestRunPipeline(unittest.TestCase):
+
+    def test_single_pass(self):
+        orders = [
+            {'name': 'John Doe', 'phone': '123-456-7890', 'items': [{'name': 'Item1', 'price': 10.0}, {'name': 'Item2', 'price': 20.0}]},
+            {'name': 'Jane Smith', 'phone': '234-567-8901', 'items': [{'name': 'Item1', 'price': 11.0}]},
+            {'name': 'No Phone', 'phone': '12345', 'items': []},
+        ]
+        reports = run_pipeline(iter(orders), {
+            'customers': CustomerAggregator(),
+            'items': ItemAggregator(),
+            'count': CountAggregator(),
+            'revenue': RevenueAggregator(),
+            'totals': CustomerTotalAggregator(),
+        })
+        self.assertEqual(reports['customers'], {'123-456-7890': 'John Doe', '234-567-8901': 'Jane Smith'})
+        self.assertEqual(dict(reports['items']), {'Item1': {'price': 11.0, 'orders': 2}, 'Item2': {'price': 20.0, 'orders': 1}})
+        self.assertEqual(reports['count'], 3)
+        self.assertEqual(reports['revenue'], {'Item1': 21.0, 'Item2': 20.0})
+        self.assertEqual(reports['totals'], {'123-456-7890': {'orders': 1, 'spent': 30.0}, '234-567-8901': {'orders': 1, 'spent': 11.0}})
+
+if __name__ == '__main__':
+    unittest.main()
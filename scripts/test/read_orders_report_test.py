@@ -0,0 +1,85 @@
+import unittest
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from scripts.read_orders import main, write_orders_report
+
+ORDERS = [
+    {"name": "John Doe", "phone": "123-456-7890", "items": [{"name": "Item1", "price": 10.0}], "timestamp": 1, "notes": ""},
+    {"name": "Jane Smith", "phone": "234-567-8901", "items": [{"name": "Item2", "price": 20.5}, {"name": "Item1", "price": 10.0}], "timestamp": 2, "notes": "extra spicy"},
+]
+
+class TestWriteOrdersReport(unittest.TestCase):
+
+    def test_text(self):
+        out = StringIO()
+        write_orders_report(iter(ORDERS), out, batch_size=1)
+        expected_output = """Name: John Doe
+Phone: 123-456-7890
+Items:
+- Item1: $10.00
+
+Name: Jane Smith
+Phone: 234-567-8901
+Items:
+- Item2: $20.50
+- Item1: $10.00
+Notes: extra spicy
+
+"""
+        self.assertEqual(out.getvalue(), expected_output)
+
+    def test_ndjson(self):
+        out = StringIO()
+        write_orders_report(ORDERS, out, 'ndjson')
+        self.assertEqual([json.loads(line) for line in out.getvalue().splitlines()], ORDERS)
+
+    def test_csv(self):
+        out = StringIO()
+        write_orders_report(ORDERS, out, 'csv')
+        self.assertEqual(out.getvalue().splitlines(), [
+            'name,phone,item,price,timestamp,notes',
+            'John Doe,123-456-7890,Item1,10.0,1,',
+            'Jane Smith,234-567-8901,Item2,20.5,2,extra spicy',
+            'Jane Smith,234-567-8901,Item1,10.0,2,extra spicy',
+        ])
+
+class TestMain(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'orders.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_main(self, *args):
+        with patch('sys.argv', ['read_orders.py', self.path, *args]), patch('sys.stdout', new_callable=StringIO) as stdout:
+            try:
+                main()
+                status = 0
+            except SystemExit as error:
+                status = error.code
+        return status, stdout.getvalue()
+
+    def test_cache_matches_stream(self):
+        orders = [dict(ORDERS[0], coupon='X1'), {'phone': '345-678-9012', 'name': 'Reordered', 'items': [{'name': 'Item3', 'price': 1, 'qty': 2}]}]
+        with open(self.path, 'w') as file:
+            json.dump(orders, file)
+        expected = self.run_main('--format', 'ndjson', '--no-cache')
+        self.assertEqual([json.loads(line) for line in expected[1].splitlines()], orders)
+        for _ in range(2):  # Parsed and snapshotted, then read from the snapshot
+            self.assertEqual(self.run_main('--format', 'ndjson'), expected)
+
+    def test_malformed_input_fails_either_way(self):
+        with open(self.path, 'w') as file:
+            file.write(json.dumps(ORDERS)[:-10])
+        for args in (['--no-cache'], []):
+            status, output = self.run_main(*args)
+            self.assertEqual(status, 1)
+            self.assertIn("Error decoding JSON", output)
+
+if __name__ == '__main__':
+    unittest.main()
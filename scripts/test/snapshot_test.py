@@ -0,0 +1,83 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest.mock import patch
+from scripts.snapshot import clear_snapshots, load_orders_cached, load_snapshot, snapshot_path
+
+ORDERS = [
+    {'name': 'John Doe', 'phone': '123-456-7890', 'items': [{'name': 'Item1', 'price': 10.5}, {'name': 'Item2', 'price': 20}],
+     'timestamp': 1700000000, 'notes': 'extra spicy'},
+    {'name': 'Jane Smith', 'phone': '234-567-8901', 'items': [], 'timestamp': '2023-11-14', 'notes': None},
+]
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'orders.json')
+        self.write(ORDERS)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, orders):
+        with open(self.path, 'w') as file:
+            json.dump(orders, file)
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(load_snapshot(self.path))
+        self.assertEqual(list(load_orders_cached(self.path)), ORDERS)
+        self.assertTrue(os.path.exists(snapshot_path(self.path)))
+
+        batch = load_snapshot(self.path)
+        self.assertIsInstance(batch.item_offsets, memoryview)  # Mapped, not parsed
+        self.assertEqual(list(batch), ORDERS)
+
+    def test_other_keys_are_kept(self):
+        orders = [dict(ORDERS[0], coupon={'code': 'X1'}), {'items': [{'name': 'Item1', 'size': 'L'}], 'name': 'Late name'}]
+        self.write(orders)
+        load_orders_cached(self.path)
+        self.assertEqual(json.dumps(list(load_snapshot(self.path))), json.dumps(orders))
+
+    def test_changed_source_invalidates(self):
+        load_orders_cached(self.path)
+        self.write(ORDERS[:1])
+        self.assertIsNone(load_snapshot(self.path))
+        self.assertEqual(list(load_orders_cached(self.path)), ORDERS[:1])
+
+    def test_touched_source_is_checked_by_hash(self):
+        load_orders_cached(self.path)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(list(load_snapshot(self.path)), ORDERS)
+        with patch('scripts.snapshot.file_hash') as file_hash:  # The new modification time was recorded
+            self.assertEqual(list(load_snapshot(self.path)), ORDERS)
+        file_hash.assert_not_called()
+
+    def test_corrupt_snapshot_is_ignored(self):
+        with open(snapshot_path(self.path), 'wb') as file:
+            file.write(b'ORDSNAP1garbage')
+        self.assertIsNone(load_snapshot(self.path))
+        self.assertEqual(list(load_orders_cached(self.path)), ORDERS)
+
+    def test_clear(self):
+        load_orders_cached(self.path)
+        self.assertEqual(clear_snapshots([self.tmpdir.name]), [snapshot_path(self.path)])
+        self.assertEqual(clear_snapshots([self.path]), [])
+
+    def test_truncated_source_is_not_snapshotted(self):
+        text = json.dumps(ORDERS)
+        with open(self.path, 'w') as file:
+            file.write(text[:text.index('Jane')])
+        self.assertIsNone(load_orders_cached(self.path))
+        self.assertFalse(os.path.exists(snapshot_path(self.path)))
+        self.assertIsNone(load_orders_cached(self.path))  # Parsed again, never served the first order
+        with self.assertRaises(json.JSONDecodeError):
+            load_orders_cached(self.path, raise_errors=True)
+
+    def test_missing_file(self):
+        self.assertIsNone(load_orders_cached(os.path.join(self.tmpdir.name, 'missing.json')))
+
+if __name__ == '__main__':
+    unittest.main()
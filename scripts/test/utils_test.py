@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import patch, mock_open
+import json
+from io import StringIO
+from scripts import utils
+from scripts.utils import iter_json_chunks, iter_orders_from_file, json_dumps, json_loads, peek_orders, read_order_batch
+
+ORDERS = [
+    {"name": "John Doe", "phone": "123-456-7890", "items": [{"name": "Item1", "price": 10.0}], "notes": ""},
+    {"name": "Jane Smith", "phone": "234-567-8901", "items": [{"name": "Item2", "price": 20.0}], "notes": "extra spicy"},
+]
+
+class TestIterOrdersFromFile(unittest.TestCase):
+
+    @patch.object(utils, 'STREAM_CHUNK_SIZE', 8)  # Force orders to span several chunks
+    def test_json_array(self):
+        with patch('builtins.open', mock_open(read_data=json.dumps(ORDERS, indent=4))):
+            self.assertEqual(list(iter_orders_from_file('test.json')), ORDERS)
+
+    @patch.object(utils, 'STREAM_CHUNK_SIZE', 8)
+    def test_ndjson(self):
+        data = '\n'.join(json.dumps(order) for order in ORDERS) + '\n\n'
+        with patch('builtins.open', mock_open(read_data=data)):
+            self.assertEqual(list(iter_orders_from_file('test.ndjson')), ORDERS)
+
+    def test_empty_array(self):
+        with patch('builtins.open', mock_open(read_data='[ ]')):
+            self.assertIsNone(peek_orders(iter_orders_from_file('test.json')))
+
+    def test_array_decoded_in_batches(self):
+        # Commas, brackets and quotes inside strings must not be taken for element boundaries
+        orders = ORDERS + [{"name": 'A, {"b": [1]}', "notes": '"], [{', "items": []}, [1, [2, 3]], 4.5, None] * 3
+        for data in (json.dumps(orders), json.dumps(orders, indent=4) + '\n'):
+            for chunk_size in (7, 64, 1 << 16):
+                for backend in (utils.orjson, None):
+                    with patch.object(utils, 'STREAM_CHUNK_SIZE', chunk_size), patch.object(utils, 'orjson', backend), \
+                            patch('builtins.open', mock_open(read_data=data)):
+                        self.assertEqual(list(iter_orders_from_file('test.json')), orders)
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_malformed_and_nan_elements(self, mock_stdout):
+        with patch('builtins.open', mock_open(read_data='[{"price": NaN}, {"price": 1}]')):
+            self.assertEqual(len(list(iter_orders_from_file('test.json'))), 2)  # Rejected by orjson, read by the stdlib
+        for data in ('[{"a": 1}, {"a": 2,}, {"a": 3}]', '[{"a": 1} {"a": 2}]', '[{"a": 1},, {"a": 2}]', '[{"a": 1}], {"a": 2}]'):
+            with patch('builtins.open', mock_open(read_data=data)):
+                with self.assertRaises(json.JSONDecodeError):
+                    list(iter_orders_from_file('test.json'))
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_truncated_array(self, mock_stdout):
+        data = json.dumps(ORDERS)[:-10]
+        with patch('builtins.open', mock_open(read_data=data)):
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_orders_from_file('test.json'))
+            self.assertIsNone(read_order_batch('test.json'))  # No partial batch either
+        self.assertIn("Error decoding JSON from file 'test.json'", mock_stdout.getvalue())
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_file_not_found(self, mock_stdout):
+        with patch('builtins.open', side_effect=FileNotFoundError):
+            self.assertEqual(list(iter_orders_from_file('non_existent_file.json')), [])
+        self.assertEqual(mock_stdout.getvalue(), "Error: The file 'non_existent_file.json' was not found.\n")
+
+    def test_peek_orders_keeps_first_order(self):
+        self.assertEqual(list(peek_orders(iter(ORDERS))), ORDERS)
+
+class TestJsonCodec(unittest.TestCase):
+
+    REPORT = {'Dosa': {'price': 9.5, 'orders': 3}, 'Café au lait': {'price': 1 << 70, 'orders': 1}, 1: [], 'Empty': {}}
+
+    @patch.object(utils, 'JSON_STREAM_BATCH_SIZE', 2)  # Force several batches
+    def test_stream_matches_stdlib(self):
+        for data in (self.REPORT, ORDERS, [], {}):
+            self.assertEqual(''.join(iter_json_chunks(data)), json.dumps(data, indent=4))
+            self.assertEqual(json.loads(''.join(iter_json_chunks(data, compact=True))), json.loads(json.dumps(data)))
+        self.assertEqual(''.join(iter_json_chunks(iter(ORDERS))), json.dumps(ORDERS, indent=4))
+
+    def test_compact(self):
+        self.assertEqual(json_dumps(ORDERS, compact=True), json.dumps(ORDERS, separators=(',', ':')))
+        self.assertEqual(json_loads(json_dumps(self.REPORT, compact=True)), json.loads(json.dumps(self.REPORT)))
+
+    def test_loads_falls_back_to_stdlib(self):
+        self.assertTrue(json_loads('[NaN]')[0] != json_loads('[NaN]')[0])
+        self.assertEqual(json_loads(b'{"caf\xc3\xa9": 1}'), {'café': 1})
+        with self.assertRaises(json.JSONDecodeError):
+            json_loads('[1,')
+
+    def test_without_orjson(self):
+        with patch.object(utils, 'orjson', None):
+            self.assertEqual(json_loads(json_dumps(ORDERS, compact=True)), ORDERS)
+            self.assertEqual(json_dumps(self.REPORT), json.dumps(self.REPORT, indent=4))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import json
+from unittest.mock import patch
+from scripts import vectorized
+from scripts.items_price_num_order import process_orders
+from scripts.order_batch import OrderBatch
+from scripts.pipeline import CustomerAggregator, CustomerTotalAggregator, RevenueAggregator, run_pipeline
+from scripts.vectorized import (customer_totals_vectorized, extract_customers_vectorized, item_revenue_vectorized,
+                                process_orders_vectorized)
+
+ORDERS = [
+    {'name': f'Customer{i % 11}', 'phone': f'{i % 13:03d}-555-0000' if i % 5 else '12345',
+     'items': [{'name': f'Item{i % 7}', 'price': i % 5}, {'name': 'Item1', 'price': float(i)}, {'name': '', 'price': 1.0}]}
+    for i in range(1000)
+] + [{'name': '', 'phone': '001-555-0000'}, {'phone': '002-555-0000', 'name': 'Last'}]
+
+def extract_customers(orders):
+    return run_pipeline(orders, {'customers': CustomerAggregator()})['customers']
+
+class TestVectorized(unittest.TestCase):
+
+    def test_items_match_process_orders(self):
+        expected = json.dumps(process_orders(ORDERS))
+        for chunk_size in (37, 100000):
+            self.assertEqual(json.dumps(process_orders_vectorized(iter(ORDERS), chunk_size)), expected)  # Same values, types and key order
+
+    def test_customers_match_extract_customers(self):
+        expected = json.dumps(extract_customers(ORDERS))
+        for chunk_size in (37, 100000):
+            self.assertEqual(json.dumps(extract_customers_vectorized(iter(ORDERS), chunk_size)), expected)
+
+    def test_revenue_and_totals_match_aggregators(self):
+        orders = ORDERS + [{'name': 'Odd', 'phone': '999-555-0000', 'items': [{'name': 'Item1', 'price': '9.95'}, {'name': 'Item2', 'price': True}]}]
+        reports = run_pipeline(orders, {'revenue': RevenueAggregator(), 'totals': CustomerTotalAggregator()})
+        self.assertEqual(reports['totals']['999-555-0000'], {'orders': 1, 'spent': 0.0})  # Neither price is a number
+        for source in (iter(orders), OrderBatch.from_orders(orders)):
+            self.assertEqual(json.dumps(item_revenue_vectorized(source)), json.dumps(reports['revenue']))
+        for source in (iter(orders), OrderBatch.from_orders(orders)):
+            self.assertEqual(json.dumps(customer_totals_vectorized(source)), json.dumps(reports['totals']))
+
+    def test_empty(self):
+        self.assertEqual(process_orders_vectorized([]), {})
+        self.assertEqual(extract_customers_vectorized([]), {})
+        self.assertEqual(item_revenue_vectorized([]), {})
+        self.assertEqual(customer_totals_vectorized([]), {})
+
+    def test_fallback_without_numpy(self):
+        with patch.object(vectorized, 'np', None):
+            self.assertEqual(json.dumps(process_orders_vectorized(iter(ORDERS))), json.dumps(process_orders(ORDERS)))
+            self.assertEqual(extract_customers_vectorized(iter(ORDERS)), extract_customers(ORDERS))
+            self.assertEqual(item_revenue_vectorized(iter(ORDERS)), run_pipeline(ORDERS, {'r': RevenueAggregator()})['r'])
+            self.assertEqual(customer_totals_vectorized(iter(ORDERS)), run_pipeline(ORDERS, {'t': CustomerTotalAggregator()})['t'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,129 @@
 # utils.py
 
+import io
+import itertools
 import json
+import re
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the codec falls back to the stdlib json module
+    orjson = None
+
+try:
+    from scripts.order_batch import OrderBatch
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from order_batch import OrderBatch
+
+# Number of characters read from the input file per chunk by the streaming readers
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Indentation of the human-readable JSON files (compact files have none)
+JSON_INDENT = 4
+
+# Number of entries encoded before each write by write_json_stream
+JSON_STREAM_BATCH_SIZE = 1000
+
+# Cuts of a piece of a JSON array decoded before its elements are read one at a time
+ARRAY_CUT_ATTEMPTS = 8
+
+# Brackets and braces, used to rule out commas that are not between two array elements
+BRACKET_PATTERN = re.compile(r'[][{}]')
+
+def json_loads(data, fallback=True):
+    """Decodes JSON text with the fastest available backend.
+
+    orjson is used when it is installed; it decodes integers beyond 64 bits as
+    floats. Input it rejects (e.g. NaN) is decoded again with the stdlib json
+    module, which either accepts it or raises the usual json.JSONDecodeError.
+
+    Args:
+        data (str or bytes): JSON text.
+        fallback (bool): Decode input orjson rejects again with the stdlib json module. Without it,
+            a rejection is a cheap json.JSONDecodeError, for callers that only guess data is valid JSON.
+
+    Returns:
+        The decoded value.
+
+    Raises:
+        json.JSONDecodeError: If data is not valid JSON.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            if not fallback:
+                raise
+    return json.loads(data)
+
+def json_dumps(data, compact=False):
+    """Encodes a value as JSON text.
+
+    Compact output has no whitespace and keeps non-ASCII characters as they
+    are; it is encoded with orjson when installed, which writes NaN and
+    infinities (not valid JSON) as null. Otherwise the output matches
+    json.dumps(data, indent=4).
+
+    Args:
+        data: Value to encode.
+        compact (bool): Encode for machine consumers instead of people.
+
+    Returns:
+        str: The JSON text.
+    """
+    if not compact:
+        return json.dumps(data, indent=JSON_INDENT)
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:  # Not supported by orjson (e.g. integers beyond 64 bits)
+            pass
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+def iter_json_chunks(data, compact=False):
+    """Encodes a value as JSON text, one batch of top-level entries at a time.
+
+    Joining the chunks gives the same text as json_dumps(data, compact), but a
+    large dict or list is never encoded as a whole: each batch of its entries
+    is encoded as a container of its own, whose brackets are dropped. Any other
+    iterable (e.g. a generator) is written as a list without being materialized.
+
+    Args:
+        data: Dict, list or other iterable to encode.
+        compact (bool): Encode for machine consumers instead of people.
+
+    Yields:
+        str: Consecutive pieces of the JSON text.
+    """
+    if isinstance(data, dict):
+        opening, closing, container, entries = '{', '}', dict, iter(data.items())
+    elif isinstance(data, (str, bytes)) or not hasattr(data, '__iter__'):
+        yield json_dumps(data, compact)
+        return
+    else:
+        opening, closing, container, entries = '[', ']', list, iter(data)
+
+    yield opening
+    separator = ''
+    while True:
+        batch = container(itertools.islice(entries, JSON_STREAM_BATCH_SIZE))
+        if not batch:
+            break
+        text = json_dumps(batch, compact)
+        yield separator + (text[1:-1] if compact else text[1:-2])  # Indented text ends with '\n' before the bracket
+        separator = ','
+    yield ('' if compact or not separator else '\n') + closing
+
+def write_json_stream(data, file, compact=False):
+    """Writes a value as JSON to an open text file, one batch of entries at a time.
+
+    Args:
+        data: Dict, list or other iterable to write.
+        file (file object): Text stream to write to.
+        compact (bool): Write for machine consumers instead of people.
+    """
+    for chunk in iter_json_chunks(data, compact):
+        file.write(chunk)
 
 def read_json_file(file_path):
     """Reads JSON data from a file.
@@ -12,8 +135,8 @@ def read_json_file(file_path):
         dict or None: JSON data if successful, None otherwise.
     """
     try:
-        with open(file_path, 'r') as file:
-            data = json.load(file)
+        with open(file_path, 'rb') as file:
+            data = json_loads(file.read())
             return data
     except FileNotFoundError:
         print(f"Error: The file '{file_path}' was not found.")
@@ -22,16 +145,267 @@ def read_json_file(file_path):
         print(f"Error decoding JSON from file '{file_path}': {e}")
         return None
 
-def write_json_file(data, file_path):
+def read_orders_from_file(file_path):
+    """Reads JSON orders from a specified file.
+
+    Args:
+        file_path (str): Path to the JSON file containing orders.
+
+    Returns:
+        list or None: List of orders (dicts) if successful, None otherwise.
+    """
+    return read_json_file(file_path)
+
+def write_json_file(data, file_path, compact=False, message="Data successfully written to '{}'"):
     """Writes data to a JSON file.
 
     Args:
         data (dict): Data to write to the JSON file.
         file_path (str): Path to the output JSON file.
+        compact (bool): Write compact JSON for machine consumers instead of indented JSON.
+        message (str): Success message, formatted with the file path.
     """
     try:
         with open(file_path, 'w') as file:
-            json.dump(data, file, indent=4)
-        print(f"Data successfully written to '{file_path}'")
+            write_json_stream(data, file, compact)
+        print(message.format(file_path))
     except IOError as e:
         print(f"Error writing to file '{file_path}': {e}")
+
+def iter_orders_from_file(file_path):
+    """Yields orders one at a time from a JSON array file or an NDJSON file.
+
+    Unlike read_json_file, the whole file is never loaded at once: the input is
+    read in chunks and each order is decoded as soon as it is complete, so peak
+    memory stays flat however large the input is. A file whose first
+    non-whitespace character is '[' is treated as a top-level JSON array,
+    anything else as NDJSON (one order object per line).
+
+    Args:
+        file_path (str): Path to the JSON or NDJSON file containing orders.
+
+    Yields:
+        dict: One order at a time. A missing file is reported and yields nothing.
+
+    Raises:
+        json.JSONDecodeError: After printing it, if the file is malformed or truncated. The
+            orders before the error have already been yielded, so callers must discard them.
+    """
+    try:
+        with open(file_path, 'r') as file:
+            head = file.read(STREAM_CHUNK_SIZE)
+            stripped = head.lstrip()
+            if stripped.startswith('['):
+                yield from iter_json_array(file, stripped[1:])
+            else:
+                yield from iter_ndjson(file, head)
+    except FileNotFoundError:
+        print(f"Error: The file '{file_path}' was not found.")
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON from file '{file_path}': {e}")
+        raise
+
+def skip_whitespace(text, pos):
+    """Returns the position of the first non-whitespace character at or after pos."""
+    while pos < len(text) and text[pos] in ' \t\r\n':
+        pos += 1
+    return pos
+
+def bracket_depth(text, start, end):
+    """Measures how text[start:end] opens and closes brackets and braces.
+
+    Strings are not skipped, so the result is only a hint; decoding decides.
+
+    Returns:
+        tuple: The change in depth over the range, and the lowest depth reached in it (0 or less).
+    """
+    depth = lowest = 0
+    for match in BRACKET_PATTERN.finditer(text, start, end):
+        depth += 1 if match.group() in '[{' else -1
+        lowest = min(lowest, depth)
+    return depth, lowest
+
+def decode_array_elements(text, started, final=True):
+    """Decodes the complete elements at the start of a piece of a top-level JSON array.
+
+    With orjson installed, the elements are decoded many at a time by
+    json_loads: the text up to the closing ']' or, failing that, up to one of
+    the last commas is decoded as an array of its own. A cut that is not
+    between two elements leaves an unterminated string or bracket, so it fails
+    to decode and the comma before it is tried. Otherwise, and for the elements
+    after the last cut, the stdlib decoder reads one element at a time, since it
+    finds where each one ends.
+
+    Args:
+        text (str): Array text from just after the opening '[' or, when started, just after an element.
+        started (bool): Whether text starts after an element rather than after the '['.
+        final (bool): Whether text runs to the end of the input. Otherwise an element that
+            fails to decode is taken as cut off by the end of the piece.
+
+    Returns:
+        tuple: The decoded elements, the length of text they were read from (which ends just
+        after an element), and whether the closing ']' follows them.
+
+    Raises:
+        json.JSONDecodeError: If the array is malformed, or it ends with ']' and an element is cut off.
+    """
+    pos = skip_whitespace(text, 0)
+    if pos < len(text) and text[pos] == ']':
+        return [], 0, True
+    if started:
+        if pos == len(text):
+            return [], 0, False
+        if text[pos] != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+        pos = skip_whitespace(text, pos + 1)
+
+    if orjson is not None and pos < len(text):
+        body = text[pos:]
+
+        # Every remaining element, when the piece ends with the closing ']'
+        stripped = body.rstrip()
+        if stripped.endswith(']'):
+            try:
+                return json_loads('[' + stripped, fallback=False), pos + len(stripped[:-1].rstrip()), True
+            except json.JSONDecodeError:
+                pass
+
+        # The elements before one of the last commas that is followed by an element like the first one
+        end = len(body)
+        lowest = 0  # Lowest depth reached after the comma, which is negative inside the last element
+        attempts = 0
+        while attempts < ARRAY_CUT_ATTEMPTS:
+            cut = body.rfind(',', 0, end)
+            if cut <= 0:
+                break
+            depth, low = bracket_depth(body, cut + 1, end)
+            lowest = min(low, depth + lowest)
+            end = cut
+            following = skip_whitespace(body, cut + 1)
+            if lowest < 0 or body[0] in '[{' and body[following:following + 1] != body[0]:
+                continue
+            attempts += 1
+            try:
+                return json_loads('[' + body[:cut] + ']', fallback=False), pos + len(body[:cut].rstrip()), False
+            except json.JSONDecodeError:
+                continue
+
+    # One element at a time
+    decoder = json.JSONDecoder()
+    values = []
+    consumed = 0
+    while pos < len(text):
+        try:
+            value, end = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            if final and text.rstrip().endswith(']'):
+                raise  # The array is complete, so the element is malformed, not cut off
+            break
+        if end == len(text) and not final:
+            break  # A number at the end of the piece may continue in the next one
+        values.append(value)
+        consumed = end
+        pos = skip_whitespace(text, end)
+        if pos < len(text) and text[pos] == ']':
+            return values, consumed, True
+        if pos < len(text):
+            if text[pos] != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+            pos = skip_whitespace(text, pos + 1)
+    return values, consumed, False
+
+def iter_json_array(file, buffer=''):
+    """Yields the elements of a top-level JSON array from an open file.
+
+    The input is read STREAM_CHUNK_SIZE characters at a time and the complete
+    elements of each chunk are decoded together by decode_array_elements.
+
+    Args:
+        file (file object): File positioned just after the opening '['.
+        buffer (str): Already-read text that follows the opening '['.
+
+    Yields:
+        The decoded array elements, in order.
+
+    Raises:
+        json.JSONDecodeError: If the array is malformed or truncated, or followed by anything but whitespace.
+    """
+    started = False  # True once an element has been read
+    final = False
+    while True:
+        values, consumed, closed = decode_array_elements(buffer, started, final)
+        yield from values
+        if closed:
+            pos = skip_whitespace(buffer, consumed) + 1  # Just after the ']'
+            while buffer[pos:].strip() == '':
+                buffer, pos = file.read(STREAM_CHUNK_SIZE), 0
+                if not buffer:
+                    return
+            raise json.JSONDecodeError("Extra data", buffer, skip_whitespace(buffer, pos))
+        if values:
+            buffer = buffer[consumed:]  # The buffer never holds more than a chunk and one element
+            started = True
+        elif final:
+            raise json.JSONDecodeError("Unterminated array", buffer, len(buffer))
+        chunk = file.read(max(STREAM_CHUNK_SIZE, len(buffer)))  # An element longer than a chunk doubles the read
+        final = not chunk
+        buffer += chunk
+
+def iter_ndjson(file, buffer=''):
+    """Yields one decoded JSON value per non-blank line of an open NDJSON file.
+
+    Args:
+        file (file object): Open NDJSON file.
+        buffer (str): Already-read text from the start of the file.
+
+    Yields:
+        The decoded value of each line, in order.
+
+    Raises:
+        json.JSONDecodeError: If a line is not valid JSON.
+    """
+    lines = list(io.StringIO(buffer))  # Split on '\n' only, like iterating the file itself
+    if lines and not lines[-1].endswith('\n'):
+        lines[-1] += file.readline()  # Complete the line cut off by the initial read
+    for line in itertools.chain(lines, file):
+        if line.strip():
+            yield json_loads(line)
+
+def peek_orders(orders):
+    """Checks whether an iterable of orders is empty without consuming it.
+
+    Args:
+        orders (iterable): Orders, e.g. from iter_orders_from_file.
+
+    Returns:
+        iterator or None: Iterator over all the orders, None if there are none.
+    """
+    orders = iter(orders)
+    first = next(orders, None)
+    if first is None:
+        return None
+    return itertools.chain([first], orders)
+
+def read_order_batch(file_path, raise_errors=False):
+    """Reads a JSON or NDJSON orders file into a compact OrderBatch.
+
+    The file is streamed with iter_orders_from_file, so the orders never exist
+    as a list of dicts.
+
+    Args:
+        file_path (str): Path to the JSON or NDJSON file containing orders.
+        raise_errors (bool): Raise the decoding error of a malformed file instead of returning None.
+
+    Returns:
+        OrderBatch or None: The orders, None if there are none or the file is malformed or truncated.
+
+    Raises:
+        json.JSONDecodeError: If raise_errors is set and the file is malformed or truncated.
+    """
+    try:
+        batch = OrderBatch.from_orders(iter_orders_from_file(file_path))
+    except json.JSONDecodeError:
+        if raise_errors:
+            raise
+        return None  # Already reported; never return the orders before the error
+    return batch if len(batch) else None
@@ -0,0 +1,359 @@
+# vectorized.py
+
+import itertools
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the functions below fall back to the pure Python aggregators
+    np = None
+
+try:
+    from scripts.order_batch import OrderBatch
+    from scripts.pipeline import (PHONE_PATTERN, CustomerAggregator, CustomerTotalAggregator, ItemAggregator,
+                                  RevenueAggregator, run_pipeline, sale_amount)
+except ImportError:  # Run directly as a script from the scripts/ directory
+    from order_batch import OrderBatch
+    from pipeline import (PHONE_PATTERN, CustomerAggregator, CustomerTotalAggregator, ItemAggregator,
+                          RevenueAggregator, run_pipeline, sale_amount)
+
+# Number of orders encoded into flat arrays before they are aggregated
+VECTOR_CHUNK_SIZE = 100000
+
+def last_positions(codes, size):
+    """Finds the position of the last occurrence of every code.
+
+    Args:
+        codes (numpy.ndarray): Integer codes in [0, size).
+        size (int): Number of distinct codes.
+
+    Returns:
+        numpy.ndarray: For each code, the index of its last occurrence in codes, or -1.
+    """
+    last = np.full(size, -1, dtype=np.int64)
+    np.maximum.at(last, codes, np.arange(len(codes), dtype=np.int64))
+    return last
+
+def intern(values, codes):
+    """Maps values to integer codes, adding unseen values in first-seen order.
+
+    Args:
+        values (list): Values to encode.
+        codes (dict): Value -> code table, updated in place.
+
+    Returns:
+        numpy.ndarray: The code of every value.
+    """
+    for value in dict.fromkeys(values):
+        if value not in codes:
+            codes[value] = len(codes)
+    return np.fromiter(map(codes.__getitem__, values), dtype=np.int64, count=len(values))
+
+def value_mask(batch, test):
+    """Applies a test to every value of a batch.
+
+    The result has one extra False entry at the end, so indexing it with the
+    MISSING code (-1) of an absent field gives False.
+
+    Args:
+        batch (OrderBatch): The batch whose value table is tested.
+        test (callable): Function of one value returning a truth value.
+
+    Returns:
+        numpy.ndarray: Boolean mask indexed by value code.
+    """
+    return np.fromiter(itertools.chain(map(test, batch.values), [False]), dtype=bool, count=len(batch.values) + 1)
+
+def amount_table(batch):
+    """Converts every value of a batch to the amount it adds to the revenue.
+
+    Like value_mask, the result has one extra entry at the end for the MISSING code.
+
+    Args:
+        batch (OrderBatch): The batch whose value table is converted.
+
+    Returns:
+        numpy.ndarray: float64 amount indexed by value code, 0 for a value that is not a number.
+    """
+    amounts = (sale_amount({'name': True, 'price': value}) or 0.0 for value in batch.values)
+    return np.fromiter(itertools.chain(amounts, [0.0]), dtype=np.float64, count=len(batch.values) + 1)
+
+def sale_positions(batch):
+    """Finds the line items of a batch that count toward the revenue.
+
+    Args:
+        batch (OrderBatch): The orders.
+
+    Returns:
+        tuple: The positions of those items in the item columns, and the amount of each.
+    """
+    names = np.frombuffer(batch.item_columns['name'], dtype=np.intc)
+    prices = np.frombuffer(batch.item_columns['price'], dtype=np.intc)
+    amounts = amount_table(batch)[prices]
+    positions = np.flatnonzero(value_mask(batch, bool)[names] & (amounts != 0))
+    return positions, amounts[positions]
+
+def first_seen_order(codes, positions, size):
+    """Sorts the distinct codes by the position of their first occurrence.
+
+    Args:
+        codes (numpy.ndarray): Integer codes in [0, size).
+        positions (numpy.ndarray): Increasing position of each code.
+        size (int): Number of distinct codes.
+
+    Returns:
+        tuple: The distinct codes in first-seen order, and the index in codes of the last occurrence of each.
+    """
+    first = np.full(size, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, codes, positions)
+    last = last_positions(codes, size)
+    seen = np.flatnonzero(last >= 0)
+    seen = seen[np.argsort(first[seen], kind='stable')]
+    return seen, last[seen]
+
+def process_order_batch(batch):
+    """Computes the item table of process_orders straight from the columns of an OrderBatch.
+
+    Args:
+        batch (OrderBatch): The orders.
+
+    Returns:
+        dict: Dictionary with item names as keys and nested dictionaries with 'price' and 'orders' as values.
+    """
+    values = batch.values
+    names = np.frombuffer(batch.item_columns['name'], dtype=np.intc)
+    prices = np.frombuffer(batch.item_columns['price'], dtype=np.intc)
+    truthy = value_mask(batch, bool)
+
+    positions = np.flatnonzero(truthy[names] & truthy[prices])  # Items with a name and a price
+    codes = names[positions].astype(np.int64)
+    counts = np.bincount(codes, minlength=len(values))
+    seen, last = first_seen_order(codes, positions, len(values))
+
+    items = defaultdict(lambda: {'price': 0, 'orders': 0})
+    for code, price_code, orders_count in zip(seen.tolist(), prices[positions[last]].tolist(), counts[seen].tolist()):
+        items[values[code]] = {'price': values[price_code], 'orders': orders_count}
+    return items
+
+def extract_customers_batch(batch):
+    """Computes the customer map of extract_customers straight from the columns of an OrderBatch.
+
+    Args:
+        batch (OrderBatch): The orders.
+
+    Returns:
+        dict: Dictionary with phone numbers as keys and customer names as values.
+    """
+    values = batch.values
+    phones = np.frombuffer(batch.order_columns['phone'], dtype=np.intc)
+    names = np.frombuffer(batch.order_columns['name'], dtype=np.intc)
+    valid_phones = value_mask(batch, lambda value: bool(value and isinstance(value, str) and PHONE_PATTERN.match(value)))
+
+    positions = np.flatnonzero(valid_phones[phones] & value_mask(batch, bool)[names])
+    codes = phones[positions].astype(np.int64)
+    seen, last = first_seen_order(codes, positions, len(values))
+    return {values[code]: values[name_code] for code, name_code in zip(seen.tolist(), names[positions[last]].tolist())}
+
+def process_orders_vectorized(orders, chunk_size=VECTOR_CHUNK_SIZE):
+    """Computes the same item table as process_orders with NumPy array operations.
+
+    Item names are interned into integer codes in first-seen order, which is also
+    the key order of process_orders. Each chunk of orders becomes flat columns of
+    item codes and prices; order counts are then a bincount and the last price of
+    an item is the price at its last code position. Without NumPy the orders go
+    through the pure Python ItemAggregator instead.
+
+    Args:
+        orders (iterable): Orders (dicts), e.g. a list or a stream from iter_orders_from_file,
+            or an OrderBatch, which is aggregated straight from its columns.
+        chunk_size (int): Number of orders encoded per chunk.
+
+    Returns:
+        dict: Dictionary with item names as keys and nested dictionaries with 'price' and 'orders' as values.
+    """
+    if np is None:
+        return run_pipeline(orders, {'items': ItemAggregator()})['items']
+    if isinstance(orders, OrderBatch):
+        return process_order_batch(orders)
+
+    codes = {}  # Item name -> code, in first-seen order
+    counts = np.zeros(0, dtype=np.int64)  # Order count per code
+    prices = []  # Last price per code, the original objects so ints stay ints
+
+    orders = iter(orders)
+    while True:
+        chunk = list(itertools.islice(orders, chunk_size))
+        if not chunk:
+            break
+
+        # Encode the chunk into flat item name and price columns, dropping items without either
+        chunk_items = [item for order in chunk for item in order.get('items', [])]
+        names = [item.get('name') for item in chunk_items]
+        chunk_prices = [item.get('price') for item in chunk_items]
+        if not (all(names) and all(chunk_prices)):
+            valid = list(map(all, zip(names, chunk_prices)))
+            names = list(itertools.compress(names, valid))
+            chunk_prices = list(itertools.compress(chunk_prices, valid))
+        if not names:
+            continue
+        chunk_codes = intern(names, codes)
+
+        # Aggregate the chunk and merge it into the running totals
+        counts = np.concatenate([counts, np.zeros(len(codes) - len(counts), dtype=np.int64)])
+        counts += np.bincount(chunk_codes, minlength=len(codes))
+        prices.extend([0] * (len(codes) - len(prices)))
+        last = last_positions(chunk_codes, len(codes))
+        seen = np.flatnonzero(last >= 0)
+        for code, position in zip(seen.tolist(), last[seen].tolist()):
+            prices[code] = chunk_prices[position]
+
+    items = defaultdict(lambda: {'price': 0, 'orders': 0})
+    for (item_name, code), orders_count in zip(codes.items(), counts.tolist()):
+        items[item_name] = {'price': prices[code], 'orders': orders_count}
+    return items
+
+def extract_customers_vectorized(orders, chunk_size=VECTOR_CHUNK_SIZE):
+    """Computes the same customer map as extract_customers with NumPy array operations.
+
+    Phones are interned into integer codes, so the phone pattern is matched once
+    per distinct phone instead of once per order. The name kept for a phone is the
+    one at its last valid position, and new phones are added in the order of their
+    first valid position, which is the key order of extract_customers. Without
+    NumPy the orders go through the pure Python CustomerAggregator instead.
+
+    Args:
+        orders (iterable): Orders (dicts), e.g. a list or a stream from iter_orders_from_file,
+            or an OrderBatch, which is aggregated straight from its columns.
+        chunk_size (int): Number of orders encoded per chunk.
+
+    Returns:
+        dict: Dictionary with phone numbers as keys and customer names as values.
+    """
+    if np is None:
+        return run_pipeline(orders, {'customers': CustomerAggregator()})['customers']
+    if isinstance(orders, OrderBatch):
+        return extract_customers_batch(orders)
+
+    customers = {}
+    codes = {}  # Phone -> code, in first-seen order
+    phones_by_code = []  # Phone of each code
+    valid_codes = []  # Whether each phone matches the pattern
+
+    orders = iter(orders)
+    while True:
+        chunk = list(itertools.islice(orders, chunk_size))
+        if not chunk:
+            break
+
+        # Encode the chunk into flat phone code and name columns
+        phones = [order.get('phone') for order in chunk]
+        names = [order.get('name') for order in chunk]
+        chunk_codes = intern(phones, codes)
+        new_phones = list(itertools.islice(codes, len(phones_by_code), None))
+        phones_by_code.extend(new_phones)
+        valid_codes.extend(bool(phone and PHONE_PATTERN.match(phone)) for phone in new_phones)
+
+        # Keep the orders with a valid phone and a name
+        keep = np.array(valid_codes, dtype=bool)[chunk_codes] & np.fromiter(map(bool, names), dtype=bool, count=len(names))
+        positions = np.flatnonzero(keep)
+        if not len(positions):
+            continue
+
+        # New phones go in by first position, and every phone gets the name at its last position
+        kept_codes = chunk_codes[positions]
+        first = np.full(len(codes), len(chunk), dtype=np.int64)
+        np.minimum.at(first, kept_codes, positions)
+        last = last_positions(kept_codes, len(codes))
+        seen = np.flatnonzero(last >= 0)
+        seen = seen[np.argsort(first[seen], kind='stable')]
+        for code, position in zip(seen.tolist(), positions[last[seen]].tolist()):
+            customers[phones_by_code[code]] = names[position]
+
+    return customers
+
+def item_revenue_batch(batch):
+    """Computes the revenue table of RevenueAggregator straight from the columns of an OrderBatch.
+
+    Args:
+        batch (OrderBatch): The orders.
+
+    Returns:
+        dict: Dictionary with item names as keys and revenues, rounded to cents, as values.
+    """
+    positions, amounts = sale_positions(batch)
+    codes = np.frombuffer(batch.item_columns['name'], dtype=np.intc)[positions].astype(np.int64)
+    revenue = np.bincount(codes, weights=amounts, minlength=len(batch.values))  # Added in item order, like the loop
+    seen, last = first_seen_order(codes, positions, len(batch.values))
+    return {batch.values[code]: round(total, 2) for code, total in zip(seen.tolist(), revenue[seen].tolist())}
+
+def customer_totals_batch(batch):
+    """Computes the customer totals of CustomerTotalAggregator straight from the columns of an OrderBatch.
+
+    Args:
+        batch (OrderBatch): The orders.
+
+    Returns:
+        dict: Dictionary with phone numbers as keys and nested dictionaries with 'orders' and
+        'spent' (rounded to cents) as values.
+    """
+    values = batch.values
+    phones = np.frombuffer(batch.order_columns['phone'], dtype=np.intc)
+    names = np.frombuffer(batch.order_columns['name'], dtype=np.intc)
+    valid_phones = value_mask(batch, lambda value: bool(value and isinstance(value, str) and PHONE_PATTERN.match(value)))
+
+    # Order counts, over the orders with a valid phone and a name
+    counted = valid_phones[phones] & value_mask(batch, bool)[names]
+    order_positions = np.flatnonzero(counted)
+    codes = phones[order_positions].astype(np.int64)
+    orders_count = np.bincount(codes, minlength=len(values))
+    seen, last = first_seen_order(codes, order_positions, len(values))
+
+    # Spending, over the line items of those orders, added in item order like the loop
+    item_orders = np.repeat(np.arange(len(batch), dtype=np.int64), np.diff(np.frombuffer(batch.item_offsets, dtype=np.int64)))
+    positions, amounts = sale_positions(batch)
+    item_orders = item_orders[positions]
+    keep = counted[item_orders]
+    spent = np.bincount(phones[item_orders[keep]].astype(np.int64), weights=amounts[keep], minlength=len(values))
+
+    return {values[code]: {'orders': count, 'spent': round(total, 2)}
+            for code, count, total in zip(seen.tolist(), orders_count[seen].tolist(), spent[seen].tolist())}
+
+def item_revenue_vectorized(orders):
+    """Computes the same revenue table as RevenueAggregator with NumPy array operations.
+
+    The revenue of an item is a bincount of its name codes weighted by price.
+    Orders that are not an OrderBatch are packed into one first. Without NumPy
+    the orders go through the pure Python RevenueAggregator instead.
+
+    Args:
+        orders (iterable): Orders (dicts), e.g. a list or a stream from iter_orders_from_file, or an OrderBatch.
+
+    Returns:
+        dict: Dictionary with item names as keys and revenues, rounded to cents, as values.
+    """
+    if np is None:
+        return run_pipeline(orders, {'revenue': RevenueAggregator()})['revenue']
+    if not isinstance(orders, OrderBatch):
+        orders = OrderBatch.from_orders(orders)
+    return item_revenue_batch(orders)
+
+def customer_totals_vectorized(orders):
+    """Computes the same customer totals as CustomerTotalAggregator with NumPy array operations.
+
+    Order counts are a bincount of the phone codes of the orders, and spending a
+    bincount of the phone code of every line item weighted by its price. Orders
+    that are not an OrderBatch are packed into one first. Without NumPy the
+    orders go through the pure Python CustomerTotalAggregator instead.
+
+    Args:
+        orders (iterable): Orders (dicts), e.g. a list or a stream from iter_orders_from_file, or an OrderBatch.
+
+    Returns:
+        dict: Dictionary with phone numbers as keys and nested dictionaries with 'orders' and
+        'spent' (rounded to cents) as values.
+    """
+    if np is None:
+        return run_pipeline(orders, {'totals': CustomerTotalAggregator()})['totals']
+    if not isinstance(orders, OrderBatch):
+        orders = OrderBatch.from_orders(orders)
+    return customer_totals_batch(orders)